@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# Stand-ins for the external programs Mounty runs, used by the benchmark
+# harness. benchmarks/harness.py puts one small wrapper per command on
+# PATH that runs
+#
+#   python fake_commands.py <command> [args...]
+#
+# Behaviour is configured through the environment:
+#
+#   MOUNTY_FAKE_LATENCY     JSON object, command -> seconds to sleep first
+#   MOUNTY_FAKE_FAIL_RATE   JSON object, command -> probability of failing
+#   MOUNTY_FAKE_MOUNTINFO   mountinfo file that mount/umount/findmnt use
+#   MOUNTY_FAKE_FSTAB       fstab consulted by "mount TARGET"
+#   MOUNTY_FAKE_SERVERS     number of servers avahi-browse reports
+#   MOUNTY_FAKE_SHARES_PER_SERVER  number of shares smbclient -L lists
+
+import fcntl
+import json
+import os
+import random
+import sys
+import time
+
+
+def _setting(name: str, command: str, default: float = 0.0) -> float:
+    try:
+        return float(json.loads(os.environ.get(name, "{}")).get(command, default))
+    except (ValueError, AttributeError):
+        return default
+
+
+def _should_fail(command: str) -> bool:
+    return random.random() < _setting("MOUNTY_FAKE_FAIL_RATE", command)
+
+
+class _MountInfo:
+    # The fake mount table, locked so concurrent mount/umount processes
+    # do not lose each other's updates
+    def __init__(self):
+        self.path = os.environ["MOUNTY_FAKE_MOUNTINFO"]
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        self._file.seek(0)
+        self.lines = self._file.read().splitlines()
+        return self
+
+    def __exit__(self, *exc):
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write("".join(line + "\n" for line in self.lines))
+        self._file.close()
+
+    @staticmethod
+    def target(line: str) -> str:
+        return line.split(" ")[4]
+
+
+def _fstab_source(target: str) -> str:
+    path = os.environ.get("MOUNTY_FAKE_FSTAB")
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3 and fields[1] == target and not fields[0].startswith("#"):
+                    return fields[0]
+    return ""
+
+
+def fake_mount(args: list[str]) -> int:
+    if len(args) == 1:
+        target = args[0]
+        source = _fstab_source(target)
+        if not source:
+            print(f"mount: {target}: can't find in /etc/fstab.", file=sys.stderr)
+            return 1
+    elif len(args) >= 4 and args[0] == "-t":
+        source, target = args[2], args[3]
+    else:
+        print("mount: bad usage", file=sys.stderr)
+        return 1
+
+    if _should_fail("mount"):
+        print("mount error(112): Host is down", file=sys.stderr)
+        return 32
+    with _MountInfo() as table:
+        if any(table.target(line) == target for line in table.lines):
+            print(f"mount: {target}: already mounted", file=sys.stderr)
+            return 32
+        mount_id = 100 + len(table.lines)
+        table.lines.append(
+            f"{mount_id} 1 0:{mount_id} / {target} rw,relatime shared:1 - cifs {source} rw,vers=3.1.1"
+        )
+    return 0
+
+
+def fake_umount(args: list[str]) -> int:
+    target = args[-1] if args else ""
+    if _should_fail("umount"):
+        print(f"umount: {target}: target is busy.", file=sys.stderr)
+        return 32
+    with _MountInfo() as table:
+        remaining = [line for line in table.lines if table.target(line) != target]
+        if len(remaining) == len(table.lines):
+            print(f"umount: {target}: not mounted.", file=sys.stderr)
+            return 32
+        table.lines = remaining
+    return 0
+
+
+def fake_findmnt(args: list[str]) -> int:
+    with open(os.environ["MOUNTY_FAKE_MOUNTINFO"]) as f:
+        for line in f:
+            fields = line.split(" ")
+            separator = fields.index("-")
+            print(f"{fields[4]} {fields[separator + 2]} {fields[separator + 1]}")
+    return 0
+
+
+def fake_pkexec(args: list[str]) -> int:
+    if _should_fail("pkexec"):
+        # What pkexec returns when the authentication dialog is dismissed
+        print("Error executing command as another user: Not authorized", file=sys.stderr)
+        return 126
+    os.execvp(args[0], args)
+
+
+def fake_avahi_browse(args: list[str]) -> int:
+    if _should_fail("avahi-browse"):
+        print("Failed to create client object: Daemon not running", file=sys.stderr)
+        return 1
+    servers = int(os.environ.get("MOUNTY_FAKE_SERVERS", "10"))
+    for i in range(servers):
+        name = f"bench{i}"
+        # One line per address family, as avahi reports on a dual-stack LAN
+        print(f"=;eth0;IPv6;{name};_smb._tcp;local;{name}.local;fe80::{i + 1:x};445;", flush=True)
+        print(f"=;eth0;IPv4;{name};_smb._tcp;local;{name}.local;127.0.{i // 250}.{i % 250 + 1};445;", flush=True)
+    return 0
+
+
+def _list_shares() -> None:
+    count = int(os.environ.get("MOUNTY_FAKE_SHARES_PER_SERVER", "10"))
+    for i in range(count):
+        print(f"Disk|share{i}|Benchmark share {i}")
+    print("IPC|IPC$|IPC Service")
+
+
+def _interactive_session() -> int:
+    # Enough of smbclient's interactive mode for SmbSession: a prompt after
+    # connecting and after every command
+    prompt = "smb: \\> "
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    for line in sys.stdin:
+        command = line.strip()
+        if command in ("exit", "quit"):
+            return 0
+        time.sleep(_setting("MOUNTY_FAKE_LATENCY", "smbclient-command"))
+        if command.startswith("dir") or command.startswith("ls"):
+            sys.stdout.write("  .                                   D        0  Mon Jan  1 00:00:00 2024\n")
+            sys.stdout.write("  ..                                  D        0  Mon Jan  1 00:00:00 2024\n")
+            sys.stdout.write("\n\t\t1000000 blocks of size 1024. 500000 blocks available\n")
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+    return 0
+
+
+def fake_smbclient(args: list[str]) -> int:
+    if _should_fail("smbclient"):
+        print("session setup failed: NT_STATUS_LOGON_FAILURE")
+        return 1
+    if "-A" in args:
+        # smbclient reads the authentication file before connecting
+        try:
+            with open(args[args.index("-A") + 1]) as f:
+                if "username=" not in f.read():
+                    raise OSError("no username")
+        except OSError as e:
+            print(f"ERROR: Unable to open credentials file! ({e})", file=sys.stderr)
+            return 1
+    if "-L" in args:
+        _list_shares()
+        return 0
+    return _interactive_session()
+
+
+COMMANDS = {
+    "mount": fake_mount,
+    "umount": fake_umount,
+    "findmnt": fake_findmnt,
+    "pkexec": fake_pkexec,
+    "avahi-browse": fake_avahi_browse,
+    "smbclient": fake_smbclient,
+}
+
+
+def main() -> int:
+    command, args = sys.argv[1], sys.argv[2:]
+    time.sleep(_setting("MOUNTY_FAKE_LATENCY", command))
+    return COMMANDS[command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
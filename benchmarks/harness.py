@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+#
+# Backend benchmark: runs ShareManager against fake smbclient, pkexec,
+# findmnt, mount, umount and avahi-browse executables (see
+# fake_commands.py) and a local SMB2 negotiate responder, with a throwaway
+# HOME, fstab and mount table. Nothing outside the temporary directory is
+# touched and no privileges are needed.
+#
+#   python benchmarks/harness.py --shares 500 --runs 5 --output before.json
+#   python benchmarks/harness.py --latency pkexec=0.3 --latency smbclient=0.05 \
+#       --fail-rate mount=0.1 --output after.json
+#
+# Reports median/min/max milliseconds and failure counts for refreshing N
+# shares, batch automount on/off, batch mount/unmount, connection tests,
+# discovery and share scans, as JSON so runs can be compared. The share
+# benchmark itself runs against a local directory standing in for a mount.
+
+import argparse
+import json
+import os
+import shutil
+import socketserver
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_COMMANDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_commands.py")
+
+COMMANDS = ("smbclient", "pkexec", "findmnt", "mount", "umount", "avahi-browse")
+# Latency keys that are not commands: each command sent to an interactive
+# smbclient, and each SMB2 negotiate answered by the fake server
+EXTRA_LATENCY_KEYS = ("smbclient-command", "smb")
+
+
+class FakeSmbServer(socketserver.ThreadingTCPServer):
+    # Answers the SMB2 NEGOTIATE that smb_probe sends, on every loopback
+    # address, so 127.0.0.x servers all look like SMB 3.1.1 hosts
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        super().__init__(("", 0), _NegotiateHandler)
+        self.port = self.server_address[1]
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self.serve_forever, name="fake-smb")
+        thread.daemon = True
+        thread.start()
+
+
+class _NegotiateHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        try:
+            length = struct.unpack(">I", self._recv(4))[0] & 0xFFFFFF
+            self._recv(length)
+        except (OSError, struct.error):
+            return
+        time.sleep(self.server.latency)
+        header = b"\xfeSMB" + struct.pack("<H", 64) + b"\0" * 58
+        body = struct.pack("<HHH", 65, 1, 0x0311) + b"\0" * 59
+        message = header + body
+        self.request.sendall(struct.pack(">I", len(message)) + message)
+
+    def _recv(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError()
+            data += chunk
+        return data
+
+
+def server_address(index: int) -> str:
+    return f"127.0.{index // 250}.{index % 250 + 1}"
+
+
+def make_shares(root: str, count: int, servers: int) -> list[dict]:
+    return [
+        {
+            "id": f"{i:08x}",
+            "server": server_address(i % servers),
+            "share_name": f"share{i}",
+            "username": "bench",
+            "password": "bench",
+            "mount_point": os.path.join(root, "mnt", f"share{i}"),
+            "automounted": False,
+        }
+        for i in range(count)
+    ]
+
+
+def mountinfo_fixture(shares: list[dict]) -> str:
+    # Every other share starts out mounted
+    lines = [
+        f"{100 + i} 1 0:{100 + i} / {share['mount_point']} rw,relatime shared:1 - cifs "
+        f"//{share['server']}/{share['share_name']} rw,vers=3.1.1\n"
+        for i, share in enumerate(shares) if i % 2 == 0
+    ]
+    return "".join(lines)
+
+
+class Environment:
+    def __init__(self, root: str, args):
+        self.root = root
+        self.home = os.path.join(root, "home")
+        self.bin_dir = os.path.join(root, "bin")
+        self.fstab_path = os.path.join(root, "fstab")
+        self.mountinfo_path = os.path.join(root, "mountinfo")
+        self.shares = make_shares(root, args.shares, args.servers)
+        os.makedirs(os.path.join(self.home, ".config", "mounty"))
+        os.makedirs(self.bin_dir)
+
+        for command in COMMANDS:
+            path = os.path.join(self.bin_dir, command)
+            with open(path, 'w') as f:
+                f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_COMMANDS}" {command} "$@"\n')
+            os.chmod(path, 0o755)
+
+        with open(self.fstab_path, 'w') as f:
+            f.write("UUID=bench / ext4 defaults 0 1\n")
+        with open(os.path.join(self.home, ".config", "mounty", "shares.json"), 'w') as f:
+            json.dump(self.shares, f)
+        self.reset_mounts()
+
+        os.environ.update({
+            "HOME": self.home,
+            "PATH": self.bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "MOUNTY_NO_DAEMON": "1",
+            "MOUNTY_FAKE_LATENCY": json.dumps(args.latency),
+            "MOUNTY_FAKE_FAIL_RATE": json.dumps(args.fail_rate),
+            "MOUNTY_FAKE_MOUNTINFO": self.mountinfo_path,
+            "MOUNTY_FAKE_FSTAB": self.fstab_path,
+            "MOUNTY_FAKE_SERVERS": str(args.servers),
+            "MOUNTY_FAKE_SHARES_PER_SERVER": str(args.shares_per_server),
+        })
+        # Refuse to run if a real mount or pkexec would be picked up
+        for command in COMMANDS:
+            if os.path.dirname(shutil.which(command) or "") != self.bin_dir:
+                raise RuntimeError(f"fake {command} is not first on PATH")
+
+    def reset_mounts(self) -> None:
+        with open(self.mountinfo_path, 'w') as f:
+            f.write(mountinfo_fixture(self.shares))
+
+
+def measure(fn, runs: int, setup=None) -> dict:
+    # fn returns the number of failed operations in that run
+    samples, failures = [], 0
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        failures += fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+        "runs_ms": [round(s, 2) for s in samples],
+        "failures": failures,
+    }
+
+
+def _failed(results: dict) -> int:
+    return sum(1 for ok, _ in results.values() if not ok)
+
+
+def run_benchmarks(env: Environment, args) -> dict:
+    from share_benchmark import BenchmarkSettings, run_benchmark
+    from share_manager import ShareManager
+    from share_store import ShareStore
+
+    manager = ShareManager()
+    batch = manager.shares[:args.batch]
+    servers = sorted({share.server for share in manager.shares})
+    results = {}
+
+    def cold_start():
+        ShareManager().close()
+        return 0
+    results["load_manager"] = measure(cold_start, args.runs)
+
+    # What the window does when another process changed the shares: reload
+    # the store, read the mount table and derive every row's status
+    other = ShareStore(manager.shares_file)
+
+    def touch_store():
+        other.put([env.shares[0]])
+
+    def refresh():
+        manager.load_shares()
+        snapshot = manager.get_mount_snapshot()
+        for share in manager.shares:
+            manager.get_share_status(share, snapshot)
+        return 0
+    results["refresh"] = measure(refresh, args.runs, setup=touch_store)
+    other.close()
+
+    def automount(enabled):
+        def run():
+            success, _ = manager.set_automount(batch, enabled)
+            return 0 if success else len(batch)
+        return run
+    results["automount_on"] = measure(automount(True), args.runs, setup=env.reset_mounts)
+    results["automount_off"] = measure(automount(False), args.runs, setup=env.reset_mounts)
+
+    results["mount_batch"] = measure(
+        lambda: _failed(manager.mount_shares(batch)), args.runs, setup=env.reset_mounts
+    )
+    results["unmount_batch"] = measure(
+        lambda: _failed(manager.unmount_shares(batch)), args.runs, setup=env.reset_mounts
+    )
+
+    def test_batch():
+        # Sessions from the previous run would turn this into a cache test
+        manager.smb_sessions.close_all()
+        return _failed(manager.test_shares(batch))
+    results["test_batch"] = measure(test_batch, args.runs)
+
+    def discover():
+        success, _ = manager.discover_servers()
+        return 0 if success else 1
+    results["discovery"] = measure(discover, args.runs)
+
+    def scan(use_cache):
+        def run():
+            if not use_cache:
+                manager.invalidate_scan_cache()
+            return sum(1 for ok, _ in manager.scan_servers(servers).values() if not ok)
+        return run
+    results["scan_servers"] = measure(scan(False), args.runs)
+    results["scan_servers_cached"] = measure(scan(True), args.runs)
+
+    scratch = os.path.join(env.root, "local-share")
+    os.mkdir(scratch)
+    settings = BenchmarkSettings(file_size_mb=8, small_files=100)
+
+    def share_benchmark():
+        run_benchmark(scratch, settings)
+        # Anything left behind counts as a failure
+        return len(os.listdir(scratch))
+    results["share_benchmark"] = measure(share_benchmark, args.runs)
+
+    manager.close()
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True)
+    except OSError:
+        return ""
+    return result.stdout.strip()
+
+
+def _parse_settings(values: list[str], option: str) -> dict:
+    settings = {}
+    for value in values:
+        key, sep, number = value.partition("=")
+        if not sep or key not in COMMANDS + EXTRA_LATENCY_KEYS:
+            raise argparse.ArgumentTypeError(f"{option}: expected COMMAND=NUMBER, got {value!r}")
+        settings[key] = float(number)
+    return settings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mounty backend benchmark with fake system commands")
+    parser.add_argument("--shares", type=int, default=200, help="saved shares (default 200)")
+    parser.add_argument("--servers", type=int, default=10, help="distinct servers (default 10)")
+    parser.add_argument("--shares-per-server", type=int, default=20,
+                        help="shares each server lists when scanned (default 20)")
+    parser.add_argument("--batch", type=int, default=50,
+                        help="shares per automount/mount/test batch (default 50)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", action="append", default=[], metavar="COMMAND=SECONDS",
+                        help="delay before a fake command responds; also smbclient-command and smb")
+    parser.add_argument("--fail-rate", action="append", default=[], metavar="COMMAND=P",
+                        help="probability that a fake command fails")
+    parser.add_argument("--output", "-o", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        args.latency = _parse_settings(args.latency, "--latency")
+        args.fail_rate = _parse_settings(args.fail_rate, "--fail-rate")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    sys.path.insert(0, ROOT)
+    from share_manager import ShareManager
+
+    smb_server = FakeSmbServer(args.latency.get("smb", 0.0))
+    smb_server.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="mounty-bench-") as root:
+            env = Environment(root, args)
+            ShareManager.FSTAB_PATH = env.fstab_path
+            ShareManager.MOUNTINFO_PATH = env.mountinfo_path
+            ShareManager.SMB_PORT = smb_server.port
+            results = run_benchmarks(env, args)
+    finally:
+        smb_server.shutdown()
+        smb_server.server_close()
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": {
+            "shares": args.shares,
+            "servers": args.servers,
+            "shares_per_server": args.shares_per_server,
+            "batch": args.batch,
+            "runs": args.runs,
+            "latency": args.latency,
+            "fail_rate": args.fail_rate,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#
+# Startup benchmark: launches the GUI against a throwaway config with N
+# shares and reports time to first frame and time until the list has its
+# mount status and fstab state filled in. Each run is a fresh process;
+# the median of all runs is compared against the thresholds.
+#
+#   python benchmarks/startup.py --shares 500 --runs 5
+#
+# Exits with status 1 when a median exceeds its threshold.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MAX_FIRST_FRAME_MS = 400
+DEFAULT_MAX_POPULATED_MS = 1200
+
+
+def write_fixture(home: str, count: int) -> str:
+    config_dir = os.path.join(home, ".config", "mounty")
+    os.makedirs(config_dir)
+    shares = [
+        {
+            "id": f"{i:08x}",
+            "server": f"nas{i % 20}",
+            "share_name": f"share{i}",
+            "username": "bench",
+            "password": "bench",
+            "mount_point": f"/mnt/bench/share{i}",
+            "automounted": i % 4 == 0,
+        }
+        for i in range(count)
+    ]
+    with open(os.path.join(config_dir, "shares.json"), 'w') as f:
+        json.dump(shares, f)
+
+    fstab_path = os.path.join(home, "fstab")
+    with open(fstab_path, 'w') as f:
+        f.write("### Mounty-Start\n")
+        for share in shares:
+            if share["automounted"]:
+                f.write(f"//{share['server']}/{share['share_name']} {share['mount_point']} cifs defaults 0 0\n")
+        f.write("### Mounty-End\n")
+    return fstab_path
+
+
+def run_child(fstab_path: str) -> None:
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+
+    import gi
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+    from gi.repository import Adw, GLib
+
+    from share_manager import ShareManager
+    ShareManager.FSTAB_PATH = fstab_path
+    from ui.main_window import MainWindow
+
+    timings = {}
+    app = Adw.Application(application_id="com.mounty.StartupBenchmark")
+
+    def finish():
+        if "first_frame_ms" in timings and "populated_ms" in timings:
+            print(json.dumps(timings), flush=True)
+            app.quit()
+
+    def on_after_paint(clock, handler):
+        if "first_frame_ms" not in timings:
+            timings["first_frame_ms"] = (time.perf_counter() - start) * 1000
+            clock.disconnect(handler[0])
+            finish()
+
+    def on_map(window):
+        clock = window.get_frame_clock()
+        handler = []
+        handler.append(clock.connect("after-paint", on_after_paint, handler))
+
+    def on_populated(window):
+        timings["populated_ms"] = (time.perf_counter() - start) * 1000
+        finish()
+
+    def on_activate(app):
+        window = MainWindow(app)
+        window.connect("map", on_map)
+        window.connect("populated", on_populated)
+        window.present()
+
+    app.connect("activate", on_activate)
+    GLib.timeout_add_seconds(30, lambda: app.quit())
+    app.run([])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mounty startup benchmark")
+    parser.add_argument("--shares", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-first-frame-ms", type=float, default=DEFAULT_MAX_FIRST_FRAME_MS)
+    parser.add_argument("--max-populated-ms", type=float, default=DEFAULT_MAX_POPULATED_MS)
+    parser.add_argument("--child", metavar="FSTAB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return 0
+
+    runs = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as home:
+            fstab_path = write_fixture(home, args.shares)
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", fstab_path],
+                capture_output=True, text=True, env=dict(os.environ, HOME=home, MOUNTY_NO_DAEMON="1")
+            )
+        lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+        if result.returncode != 0 or not lines:
+            print(result.stderr, file=sys.stderr)
+            return 2
+        runs.append(json.loads(lines[-1]))
+
+    first_frame = statistics.median(r["first_frame_ms"] for r in runs)
+    populated = statistics.median(r["populated_ms"] for r in runs)
+    report = {
+        "shares": args.shares,
+        "runs": runs,
+        "first_frame_ms": round(first_frame, 1),
+        "populated_ms": round(populated, 1),
+        "max_first_frame_ms": args.max_first_frame_ms,
+        "max_populated_ms": args.max_populated_ms,
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = first_frame > args.max_first_frame_ms or populated > args.max_populated_ms
+    if failed:
+        print("Startup regression: threshold exceeded", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import functools
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from job_scheduler import JobCancelled, current_job
+from share_manager import Share, ShareManager
+from smb_probe import ProbeResult
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "mounty.sock")
+    return str(Path.home() / ".config" / "mounty" / "mounty.sock")
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonUnavailable(DaemonError):
+    # The connection is gone, as opposed to an error the daemon reported
+    pass
+
+
+class DaemonClient:
+    # One connection to mountyd shared by all threads. Requests carry an id;
+    # the daemon may send {"id": n, "callback": [...]} messages before the
+    # final {"id": n, "result": ...} or {"id": n, "error": "..."}.
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._file = sock.makefile('r', encoding='utf-8')
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: dict[int, dict] = {}
+        self._next_id = 1
+        self.event_callback: Optional[Callable[[dict], None]] = None
+        self.connected = True
+
+        reader = threading.Thread(target=self._read_messages, name="mountyd-client")
+        reader.daemon = True
+        reader.start()
+
+    @classmethod
+    def connect(cls, path: str = None, timeout: float = 0.5) -> Optional["DaemonClient"]:
+        # None when no daemon is listening, so callers can fall back to
+        # doing the work in-process
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path or default_socket_path())
+        except OSError:
+            sock.close()
+            return None
+        sock.settimeout(None)
+        return cls(sock)
+
+    def _send(self, message: dict) -> None:
+        data = (json.dumps(message) + "\n").encode()
+        with self._write_lock:
+            self._sock.sendall(data)
+
+    def _read_messages(self) -> None:
+        try:
+            for line in self._file:
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "event" in message:
+                    if self.event_callback:
+                        self.event_callback(message)
+                    continue
+                with self._lock:
+                    waiter = self._pending.get(message.get("id"))
+                if waiter is None:
+                    continue
+                if "callback" in message:
+                    if waiter["callback"]:
+                        waiter["callback"](*message["callback"])
+                    continue
+                with self._lock:
+                    self._pending.pop(message.get("id"), None)
+                waiter["message"] = message
+                waiter["event"].set()
+        except (OSError, ValueError):
+            pass
+
+        # Daemon went away: fail everything still waiting
+        with self._lock:
+            self.connected = False
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter["event"].set()
+
+    def call(self, method: str, params: dict = None, callback: Callable = None):
+        waiter = {"event": threading.Event(), "message": None, "callback": callback}
+        with self._lock:
+            if not self.connected:
+                raise DaemonUnavailable("Not connected to mountyd")
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = waiter
+
+        try:
+            self._send({"id": request_id, "method": method, "params": params or {}})
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise DaemonUnavailable(f"Lost connection to mountyd: {e}")
+
+        # Cancelling the job we run in cancels the request in the daemon,
+        # which kills whatever process it started for us
+        job = current_job()
+        while not waiter["event"].wait(0.1 if job else None):
+            if job and job.cancelled:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                try:
+                    self._send({"cancel": request_id})
+                except OSError:
+                    pass
+                raise JobCancelled()
+
+        message = waiter["message"]
+        if message is None:
+            raise DaemonUnavailable("mountyd exited unexpectedly")
+        if "error" in message:
+            raise DaemonError(message["error"])
+        return message.get("result")
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        self.event_callback = callback
+        self.call("subscribe")
+
+    def close(self) -> None:
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+def _result(value) -> tuple[bool, str]:
+    return value[0], value[1]
+
+
+def _bulk_error(error: DaemonError, shares: list[Share], *args, **kwargs) -> dict:
+    return {share.id: (False, str(error)) for share in shares}
+
+
+def _via_daemon(on_error: Optional[Callable] = lambda error, *args, **kwargs: (False, str(error))):
+    # Wraps a DaemonShareManager method that calls mountyd. When the daemon
+    # cannot be reached, even after reconnecting, ShareManager does the work
+    # in-process instead; an error the daemon reports is turned into the
+    # method's usual failure by on_error (None: also run it in-process)
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except DaemonError as e:
+                if isinstance(e, DaemonUnavailable) or on_error is None:
+                    return getattr(ShareManager, method.__name__)(self, *args, **kwargs)
+                return on_error(e, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class DaemonShareManager(ShareManager):
+    # ShareManager whose network and privileged work happens in mountyd, so
+    # the daemon's probe, scan and discovery caches and its one authorized
+    # helper are shared by every window and script. The share store is the
+    # same SQLite file, so reads and edits stay local; shares are sent by
+    # id and the daemon looks them up in the store itself.
+    def __init__(self, client: DaemonClient, socket_path: str = None):
+        super().__init__()
+        self.daemon = client
+        self.socket_path = socket_path
+        self._reconnect_lock = threading.Lock()
+        self._event_callback: Optional[Callable[[dict], None]] = None
+
+    def _reconnect(self) -> bool:
+        # After mountyd restarted; False when it is not running
+        with self._reconnect_lock:
+            if self.daemon.connected:
+                # Another thread got here first
+                return True
+            client = DaemonClient.connect(self.socket_path)
+            if client is None:
+                return False
+            self.daemon.close()
+            self.daemon = client
+        if self._event_callback:
+            try:
+                client.subscribe(self._event_callback)
+            except DaemonError:
+                pass
+        return True
+
+    def _call(self, method: str, params: dict = None, callback: Callable = None):
+        try:
+            return self.daemon.call(method, params, callback)
+        except DaemonUnavailable:
+            if not self._reconnect():
+                raise
+            return self.daemon.call(method, params, callback)
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        # Kept across reconnects
+        self._event_callback = callback
+        try:
+            self.daemon.subscribe(callback)
+        except DaemonUnavailable:
+            self._reconnect()
+
+    def _reload(self, shares: list[Share]) -> None:
+        # The daemon may have saved changes (automount flags, dialects);
+        # copy them onto the objects the caller holds
+        self.load_shares()
+        for share in shares:
+            saved = self.get_share(share.id)
+            if saved is not None and saved is not share:
+                share.automounted = saved.automounted
+                share.smb_dialect = saved.smb_dialect
+
+    def _bulk(self, method: str, shares: list[Share], progress_callback=None, **params) -> dict:
+        by_id = {share.id: share for share in shares}
+
+        def on_progress(done, total, share_id, result):
+            if progress_callback:
+                progress_callback(done, total, by_id.get(share_id), _result(result))
+
+        results = self._call(method, {"ids": [s.id for s in shares], **params}, on_progress)
+        return {share_id: _result(result) for share_id, result in results.items()}
+
+    @_via_daemon(on_error=None)
+    def probe_server(self, server: str) -> ProbeResult:
+        return ProbeResult(**self._call("probe_server", {"server": server}))
+
+    def _single(self, method: str, share: Share) -> tuple[bool, str]:
+        # Single-share calls also return the dialect the daemon probed
+        success, message, dialect = self._call(method, {"id": share.id})
+        if dialect:
+            share.smb_dialect = dialect
+        return success, message
+
+    @_via_daemon()
+    def test_share(self, share: Share) -> tuple[bool, str]:
+        # The dialogs test shares before they are saved, or with unsaved
+        # edits, which the daemon cannot look up. Testing needs no
+        # privileges, so those run here.
+        self.load_shares()
+        if self.get_share(share.id) != share:
+            return super().test_share(share)
+        return self._single("test_share", share)
+
+    @_via_daemon()
+    def discover_servers(self, server_callback=None) -> tuple[bool, list[dict] | str]:
+        return _result(self._call("discover_servers", callback=server_callback))
+
+    @_via_daemon()
+    def scan_shares(self, server: str, username: str = "", password: str = "",
+                    use_cache: bool = True) -> tuple[bool, list[dict] | str]:
+        return _result(self._call("scan_shares", {
+            "server": server, "username": username, "password": password, "use_cache": use_cache,
+        }))
+
+    @_via_daemon(on_error=None)
+    def invalidate_scan_cache(self, server: Optional[str] = None) -> None:
+        self._call("invalidate_scan_cache", {"server": server})
+
+    @_via_daemon()
+    def mount_share(self, share: Share) -> tuple[bool, str]:
+        return self._single("mount_share", share)
+
+    @_via_daemon()
+    def unmount_share(self, share: Share) -> tuple[bool, str]:
+        return self._single("unmount_share", share)
+
+    @_via_daemon()
+    def remount_share(self, share: Share) -> tuple[bool, str]:
+        return self._single("remount_share", share)
+
+    @_via_daemon(on_error=_bulk_error)
+    def mount_shares(self, shares: list[Share], progress_callback=None,
+                     max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        return self._bulk("mount_shares", shares, progress_callback, max_workers=max_workers)
+
+    @_via_daemon(on_error=_bulk_error)
+    def unmount_shares(self, shares: list[Share], progress_callback=None,
+                       max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        return self._bulk("unmount_shares", shares, progress_callback, max_workers=max_workers)
+
+    @_via_daemon(on_error=_bulk_error)
+    def test_shares(self, shares: list[Share], progress_callback=None,
+                    max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        results = self._bulk("test_shares", shares, progress_callback, max_workers=max_workers)
+        self._reload(shares)
+        return results
+
+    @_via_daemon()
+    def set_automount(self, shares: list[Share], enabled: bool) -> tuple[bool, str]:
+        result = _result(self._call("set_automount", {
+            "ids": [s.id for s in shares], "enabled": enabled,
+        }))
+        self._reload(shares)
+        return result
+
+    def close(self) -> None:
+        self.daemon.close()
+        super().close()
+
+
+def open_share_manager(socket_path: str = None) -> ShareManager:
+    # Uses mountyd when it is running and falls back to an in-process
+    # ShareManager otherwise. MOUNTY_NO_DAEMON=1 forces the latter.
+    if not os.environ.get("MOUNTY_NO_DAEMON"):
+        client = DaemonClient.connect(socket_path)
+        if client is not None:
+            return DaemonShareManager(client, socket_path)
+    return ShareManager()
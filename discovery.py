@@ -0,0 +1,64 @@
+import ipaddress
+import re
+from typing import Optional
+
+_AVAHI_ESCAPE = re.compile(r'\\(\d{3})')
+
+
+def _unescape(value: str) -> str:
+    # avahi-browse -p escapes non-printable characters and separators as \DDD (decimal)
+    return _AVAHI_ESCAPE.sub(lambda m: chr(int(m.group(1))), value)
+
+
+def parse_avahi_line(line: str) -> Optional[dict]:
+    # =;<interface>;<protocol>;<name>;<type>;<domain>;<hostname>;<address>;<port>;<txt>
+    if not line.startswith("="):
+        return None
+    parts = line.split(";")
+    if len(parts) < 9:
+        return None
+    address = parts[7]
+    if not address:
+        return None
+    return {
+        "name": _unescape(parts[3]),
+        "hostname": _unescape(parts[6]),
+        "address": address,
+        "protocol": parts[2],
+    }
+
+
+def _is_ipv6(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address.split("%")[0]).version == 6
+    except ValueError:
+        return False
+
+
+class ServerDeduper:
+    # Collapses the many '=' lines avahi emits for one box (one per
+    # interface and per address family) into a single server, preferring an
+    # IPv4 address when both families resolve.
+    def __init__(self):
+        self.servers: dict[str, dict] = {}
+        self._addresses: set[str] = set()
+
+    def add(self, info: dict) -> Optional[tuple[str, dict]]:
+        address = info["address"]
+        if address in self._addresses:
+            return None
+        self._addresses.add(address)
+
+        key = (info.get("hostname") or info["name"]).lower()
+        existing = self.servers.get(key)
+        if existing is None:
+            self.servers[key] = info
+            return "added", info
+        if _is_ipv6(existing["address"]) and not _is_ipv6(address):
+            updated = dict(info, previous_address=existing["address"])
+            self.servers[key] = info
+            return "updated", updated
+        return None
+
+    def results(self) -> list[dict]:
+        return list(self.servers.values())
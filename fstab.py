@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from mount_table import is_below, normalize_mount_point, normalize_unc
+
+FSTAB_START_MARKER = "### Mounty-Start"
+FSTAB_END_MARKER = "### Mounty-End"
+
+_ESCAPES = {" ": "\\040", "\t": "\\011", "\n": "\\012", "\\": "\\134"}
+
+
+def escape_field(value: str) -> str:
+    return "".join(_ESCAPES.get(c, c) for c in value)
+
+
+def unescape_field(value: str) -> str:
+    for char, escaped in _ESCAPES.items():
+        value = value.replace(escaped, char)
+    return value
+
+
+@dataclass
+class FstabEntry:
+    source: str
+    mount_point: str
+    fs_type: str
+    options: str = "defaults"
+    dump: int = 0
+    passno: int = 0
+
+    @classmethod
+    def parse(cls, line: str) -> Optional["FstabEntry"]:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            return None
+        fields = stripped.split()
+        if len(fields) < 3:
+            return None
+        try:
+            return cls(
+                source=unescape_field(fields[0]),
+                mount_point=unescape_field(fields[1]),
+                fs_type=fields[2],
+                options=unescape_field(fields[3]) if len(fields) > 3 else "defaults",
+                dump=int(fields[4]) if len(fields) > 4 else 0,
+                passno=int(fields[5]) if len(fields) > 5 else 0,
+            )
+        except ValueError:
+            return None
+
+    def render(self) -> str:
+        return (
+            f"{escape_field(self.source)} {escape_field(self.mount_point)} "
+            f"{self.fs_type} {escape_field(self.options)} {self.dump} {self.passno}"
+        )
+
+
+def splice_block(content: str, lines: list[str]) -> str:
+    # Replaces whatever sits between the Mounty markers with lines, adding
+    # the markers at the end of the file if they are missing
+    all_lines = content.split('\n')
+    if FSTAB_START_MARKER not in (line.strip() for line in all_lines):
+        if all_lines and all_lines[-1] == "":
+            all_lines.pop()
+        all_lines += ["", FSTAB_START_MARKER, FSTAB_END_MARKER, ""]
+
+    new_lines = []
+    in_mounty_section = False
+    for line in all_lines:
+        stripped = line.strip()
+        if stripped == FSTAB_START_MARKER:
+            in_mounty_section = True
+            new_lines.append(line)
+            new_lines.extend(lines)
+            continue
+        elif stripped == FSTAB_END_MARKER:
+            in_mounty_section = False
+        elif in_mounty_section:
+            continue
+        new_lines.append(line)
+    return '\n'.join(new_lines)
+
+
+class Fstab:
+    # Parsed view of the Mounty block in fstab. Lines outside the block are
+    # never touched; comments inside it are kept in place.
+    def __init__(self, block: list):
+        self.block: list[FstabEntry | str] = block
+        self._index()
+
+    @classmethod
+    def parse(cls, content: str) -> "Fstab":
+        block = []
+        in_mounty_section = False
+        for line in content.split('\n'):
+            stripped = line.strip()
+            if stripped == FSTAB_START_MARKER:
+                in_mounty_section = True
+            elif stripped == FSTAB_END_MARKER:
+                in_mounty_section = False
+            elif in_mounty_section and stripped:
+                block.append(FstabEntry.parse(line) or stripped)
+        return cls(block)
+
+    @classmethod
+    def read(cls, path: str) -> "Fstab":
+        with open(path, 'r') as f:
+            return cls.parse(f.read())
+
+    def _index(self) -> None:
+        self.by_mount_point: dict[str, FstabEntry] = {}
+        self.by_source: dict[str, list[FstabEntry]] = {}
+        for entry in self.entries:
+            self.by_mount_point[normalize_mount_point(entry.mount_point)] = entry
+            self.by_source.setdefault(normalize_unc(entry.source), []).append(entry)
+
+    @property
+    def entries(self) -> list[FstabEntry]:
+        return [item for item in self.block if isinstance(item, FstabEntry)]
+
+    def get(self, mount_point: str) -> Optional[FstabEntry]:
+        return self.by_mount_point.get(normalize_mount_point(mount_point))
+
+    def find_source(self, unc_path: str) -> list[FstabEntry]:
+        return self.by_source.get(normalize_unc(unc_path), [])
+
+    def block_lines(self) -> list[str]:
+        return [item.render() if isinstance(item, FstabEntry) else item for item in self.block]
+
+    def transaction(self) -> "FstabTransaction":
+        return FstabTransaction(self)
+
+
+class FstabTransaction:
+    # Stages adds and removes against a parsed Fstab. Nothing is written
+    # here: the caller sends changes to the privileged helper, which
+    # replays them on its own read of fstab under a lock, so concurrent
+    # transactions never drop each other's entries.
+    def __init__(self, fstab: Fstab):
+        self.original = fstab
+        self.fstab = Fstab(list(fstab.block))
+        self.added: list[FstabEntry] = []
+        self.changes: list[dict] = []
+
+    def add(self, entry: FstabEntry) -> None:
+        # mount -a and the boot-time mounts follow file order, so an entry
+        # goes after every entry it is mounted inside and before any entry
+        # mounted inside it; otherwise it keeps its place, or is appended
+        # when new
+        key = normalize_mount_point(entry.mount_point)
+        position = len(self.fstab.block)
+        after_ancestors = 0
+        block = []
+        for item in self.fstab.block:
+            if isinstance(item, FstabEntry):
+                if normalize_mount_point(item.mount_point) == key:
+                    position = min(position, len(block))
+                    continue
+                if is_below(item.mount_point, key):
+                    position = min(position, len(block))
+                elif is_below(key, item.mount_point):
+                    after_ancestors = len(block) + 1
+            block.append(item)
+        block.insert(max(position, after_ancestors), entry)
+        self.fstab.block = block
+        self.fstab._index()
+        self.added.append(entry)
+        self.changes.append({"add": entry.render()})
+
+    def remove(self, mount_point: str) -> None:
+        key = normalize_mount_point(mount_point)
+        self.fstab.block = [
+            item for item in self.fstab.block
+            if not (isinstance(item, FstabEntry) and normalize_mount_point(item.mount_point) == key)
+        ]
+        self.fstab._index()
+        self.added = [e for e in self.added if normalize_mount_point(e.mount_point) != key]
+        self.changes.append({"remove": {"mount_point": mount_point}})
+
+    @property
+    def changed(self) -> bool:
+        return self.fstab.block_lines() != self.original.block_lines()
+
+    def block_lines(self) -> list[str]:
+        return self.fstab.block_lines()
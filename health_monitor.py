@@ -0,0 +1,234 @@
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, Optional
+
+import tracing
+from mount_table import MountTable
+from share_manager import ShareStatus
+
+
+class MountHealth(Enum):
+    UNKNOWN = "unknown"
+    HEALTHY = "healthy"
+    # The kernel answered straight away with an error: the CIFS connection
+    # behind the mount is gone
+    STALE = "stale"
+    # Nothing came back before the deadline
+    HUNG = "hung"
+
+
+# statfs errors that still prove the server answered
+_ANSWERED_ERRORS = ("permission denied",)
+
+
+class HealthMonitor:
+    # Periodically asks the kernel for filesystem info on every mounted
+    # share. A statfs on a dead CIFS mount can block for minutes, so each
+    # check runs in its own `stat -f` process with a hard deadline and is
+    # killed when it overruns. A check that cannot even be killed (stuck in
+    # the kernel) is remembered, and that mount point is not checked again
+    # until the process is gone, so a dead server never piles up processes
+    # or threads. The monitor thread itself only waits on child processes.
+    INTERVAL = 30
+    DEADLINE = 5
+    MAX_CHECKS = 8
+    POLL_INTERVAL = 0.05
+    BACKOFF_BASE = 15
+    BACKOFF_MAX = 600
+    STAT_COMMAND = ["stat", "--file-system", "--format=%T"]
+
+    def __init__(self, share_manager, callback: Callable[[str, MountHealth], None],
+                 auto_recover: bool = False,
+                 recover_callback: Optional[Callable[[str, bool, str], None]] = None):
+        # callback(share_id, health) runs on the monitor thread whenever a
+        # share's health changes; recover_callback(share_id, success, message)
+        # after each recovery attempt
+        self.share_manager = share_manager
+        self.callback = callback
+        self.recover_callback = recover_callback
+        self.auto_recover = auto_recover
+        self.health: dict[str, MountHealth] = {}
+        self._stuck: dict[str, subprocess.Popen] = {}
+        self._attempts: dict[str, int] = {}
+        self._next_attempt: dict[str, float] = {}
+        self._recovering: set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Recovery may wait for authorization; it never runs on the
+        # monitor thread and only one runs at a time
+        self._recovery_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mount-recovery")
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="health-monitor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self._recovery_pool.shutdown(wait=False, cancel_futures=True)
+
+    def check_now(self) -> None:
+        self._wake.set()
+
+    def get(self, share_id: str) -> MountHealth:
+        return self.health.get(share_id, MountHealth.UNKNOWN)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._check_all()
+            except Exception as e:
+                print(f"Health check failed: {e}")
+            self._wake.wait(self.INTERVAL)
+            self._wake.clear()
+
+    def _mounted_shares(self) -> list:
+        # Only our own mounts: a mismatched mount point belongs to someone
+        # else and must never be remounted
+        table = MountTable.read(self.share_manager.MOUNTINFO_PATH)
+        shares = []
+        for share in self.share_manager.shares:
+            entry = self.share_manager.get_mount_entry(share, table)
+            if (entry is not None and entry.is_cifs
+                    and self.share_manager.get_share_status(share, table) == ShareStatus.MOUNTED):
+                shares.append(share)
+        return shares
+
+    def _check_all(self) -> None:
+        shares = self._mounted_shares()
+        mounted_ids = {share.id for share in shares}
+        # Shares that were unmounted (or removed) since the last round
+        for share_id in [s for s in self.health if s not in mounted_ids]:
+            self._forget(share_id)
+
+        pending = []
+        for share in shares:
+            stuck = self._stuck.get(share.mount_point)
+            if stuck is not None:
+                if stuck.poll() is None:
+                    self._set(share.id, MountHealth.HUNG)
+                    continue
+                stuck.stderr.close()
+                del self._stuck[share.mount_point]
+            pending.append(share)
+
+        running: dict = {}
+        while (pending or running) and not self._stopped.is_set():
+            while pending and len(running) < self.MAX_CHECKS:
+                share = pending.pop()
+                running[share.id] = (share, self._start_check(share.mount_point), time.monotonic())
+            for share_id, (share, process, started) in list(running.items()):
+                health = self._poll_check(share, process, started)
+                if health is not None:
+                    del running[share_id]
+                    self._set(share_id, health)
+            if running:
+                time.sleep(self.POLL_INTERVAL)
+        for share, process, _ in running.values():
+            process.kill()
+            self._stuck[share.mount_point] = process
+
+        for share in shares:
+            if self.get(share.id) == MountHealth.HEALTHY:
+                self._attempts.pop(share.id, None)
+                self._next_attempt.pop(share.id, None)
+            elif self.auto_recover and self.get(share.id) in (MountHealth.STALE, MountHealth.HUNG):
+                self._maybe_recover(share)
+
+    def _start_check(self, mount_point: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            self.STAT_COMMAND + [mount_point],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+
+    def _poll_check(self, share, process: subprocess.Popen, started: float) -> Optional[MountHealth]:
+        elapsed = time.monotonic() - started
+        if process.poll() is not None:
+            error = process.stderr.read()
+            process.stderr.close()
+            span = tracing.Span(op="health_check", command=share.mount_point, share_id=share.id,
+                                start=time.time() - elapsed, duration_ms=round(elapsed * 1000, 3),
+                                exit_code=process.returncode)
+            if process.returncode != 0:
+                span.fail(error, process.returncode)
+            tracing.tracer.record(span)
+            if process.returncode == 0 or any(e in error.lower() for e in _ANSWERED_ERRORS):
+                return MountHealth.HEALTHY
+            return MountHealth.STALE
+
+        if elapsed < self.DEADLINE:
+            return None
+        process.kill()
+        try:
+            process.wait(timeout=self.POLL_INTERVAL)
+            process.stderr.close()
+        except subprocess.TimeoutExpired:
+            # Blocked in the kernel; reaped on a later round
+            self._stuck[share.mount_point] = process
+        tracing.tracer.record(tracing.Span(
+            op="health_check", command=share.mount_point, share_id=share.id,
+            start=time.time() - elapsed, duration_ms=round(elapsed * 1000, 3), error="timeout",
+        ))
+        return MountHealth.HUNG
+
+    def _set(self, share_id: str, health: MountHealth) -> None:
+        if self.health.get(share_id) == health:
+            return
+        self.health[share_id] = health
+        self.callback(share_id, health)
+
+    def _forget(self, share_id: str) -> None:
+        del self.health[share_id]
+        self._attempts.pop(share_id, None)
+        self._next_attempt.pop(share_id, None)
+        self.callback(share_id, MountHealth.UNKNOWN)
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.BACKOFF_BASE * 2 ** attempts, self.BACKOFF_MAX)
+
+    def _maybe_recover(self, share) -> None:
+        with self._lock:
+            if share.id in self._recovering or time.monotonic() < self._next_attempt.get(share.id, 0):
+                return
+            self._recovering.add(share.id)
+        self._recovery_pool.submit(self._recover, share)
+
+    def _recover(self, share) -> None:
+        try:
+            # Only detach the dead mount once the server answers again;
+            # until then the share stays marked and we back off
+            if self.share_manager.probe_server(share.server).reachable:
+                success, message = self.share_manager.remount_share(share)
+            else:
+                success, message = False, "Server is not reachable"
+        except Exception as e:
+            success, message = False, f"Error: {str(e)}"
+
+        with self._lock:
+            self._recovering.discard(share.id)
+            if success:
+                self._attempts.pop(share.id, None)
+                self._next_attempt.pop(share.id, None)
+            else:
+                attempts = self._attempts.get(share.id, 0)
+                self._attempts[share.id] = attempts + 1
+                self._next_attempt[share.id] = time.monotonic() + self.backoff(attempts)
+
+        if self.recover_callback:
+            self.recover_callback(share.id, success, message)
+        if success:
+            self.check_now()
@@ -0,0 +1,306 @@
+import itertools
+import logging
+import os
+import selectors
+import subprocess
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Hashable, Optional
+
+import tracing
+
+log = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    USER = 0
+    BACKGROUND = 10
+
+
+class JobCancelled(Exception):
+    pass
+
+
+_local = threading.local()
+
+
+def current_job() -> Optional["Job"]:
+    return getattr(_local, "job", None)
+
+
+class Job:
+    def __init__(self, fn: Callable, args: tuple, key: Optional[Hashable],
+                 host: Optional[str], priority: Priority, seq: int):
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.host = host.lower() if host else None
+        self.priority = priority
+        self.seq = seq
+        # (callback, errback) pairs
+        self.callbacks: list[tuple[Callable, Optional[Callable]]] = []
+        self.running = False
+        self.finished = False
+        self.cancelled = False
+        self._processes: list[subprocess.Popen] = []
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def attach_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._processes.append(process)
+                return
+        process.kill()
+
+    def detach_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+
+class JobScheduler:
+    # Single queue for all background work started from the UI. Limits the
+    # number of concurrent jobs globally and per server, runs user-initiated
+    # jobs before background ones and folds identical in-flight jobs
+    # (same key) into one.
+    def __init__(self, max_workers: int = 6, per_host: int = 2, dispatch: Callable = None):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.dispatch = dispatch
+        self._queue: list[Job] = []
+        self._by_key: dict[Hashable, Job] = {}
+        self._host_running: dict[str, int] = {}
+        self._workers: list[threading.Thread] = []
+        self._idle_workers = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+    def submit(self, fn: Callable, *args, key: Hashable = None, host: str = None,
+               priority: Priority = Priority.USER, callback: Callable = None,
+               errback: Callable = None) -> Job:
+        # Every submitter hears back exactly once: callback(result) when fn
+        # returns, errback(exception) when it raises or the job is cancelled.
+        # Without an errback the callback gets (False, message) instead,
+        # which suits the (success, message) results most jobs return.
+        with self._cond:
+            job = self._by_key.get(key) if key is not None else None
+            if job is None or job.cancelled:
+                job = Job(fn, args, key, host, priority, next(self._seq))
+                if key is not None:
+                    self._by_key[key] = job
+                self._queue.append(job)
+                self._ensure_worker()
+                self._cond.notify()
+            elif priority < job.priority and not job.running:
+                job.priority = priority
+            if callback or errback:
+                job.callbacks.append((callback, errback))
+            return job
+
+    def cancel(self, job: Job) -> None:
+        with self._cond:
+            queued = job in self._queue
+            if queued:
+                self._queue.remove(job)
+                self._forget(job)
+                job.finished = True
+        job.cancel()
+        if queued:
+            # Never started, so no worker will report it
+            self._report(job, JobCancelled())
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._shutdown = True
+            jobs = list(self._by_key.values()) + self._queue
+            self._queue = []
+            self._cond.notify_all()
+        for job in jobs:
+            job.cancel()
+
+    def _forget(self, job: Job) -> None:
+        if job.key is not None and self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+    def _ensure_worker(self) -> None:
+        if len(self._queue) > self._idle_workers and len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers)}")
+            worker.daemon = True
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job(self) -> Optional[Job]:
+        runnable = [
+            job for job in self._queue
+            if job.host is None or self._host_running.get(job.host, 0) < self.per_host
+        ]
+        if not runnable:
+            return None
+        job = min(runnable, key=lambda j: (j.priority, j.seq))
+        self._queue.remove(job)
+        return job
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._idle_workers += 1
+                while not self._shutdown and (job := self._next_job()) is None:
+                    self._cond.wait()
+                self._idle_workers -= 1
+                if self._shutdown:
+                    return
+                job.running = True
+                if job.host:
+                    self._host_running[job.host] = self._host_running.get(job.host, 0) + 1
+
+            _local.job = job
+            error = None
+            try:
+                result = job.fn(*job.args)
+            except JobCancelled as e:
+                error = e
+            except Exception as e:
+                log.exception("Background job %s failed", getattr(job.fn, "__name__", job.fn))
+                error = e
+            finally:
+                _local.job = None
+
+            with self._cond:
+                job.running = False
+                job.finished = True
+                if job.host:
+                    self._host_running[job.host] -= 1
+                self._forget(job)
+                # A finished job may unblock others waiting on the same host
+                self._cond.notify_all()
+
+            if error is None and job.cancelled:
+                error = JobCancelled()
+            if error is not None:
+                self._report(job, error)
+            else:
+                for callback, errback in list(job.callbacks):
+                    if callback:
+                        self._dispatch(callback, result)
+
+    def _report(self, job: Job, error: BaseException) -> None:
+        message = "Cancelled" if isinstance(error, JobCancelled) else f"Error: {error}"
+        for callback, errback in list(job.callbacks):
+            if errback:
+                self._dispatch(errback, error)
+            elif callback:
+                self._dispatch(callback, (False, message))
+
+    def _dispatch(self, callback: Callable, result) -> None:
+        if self.dispatch:
+            self.dispatch(self._invoke, callback, result)
+        else:
+            self._invoke(callback, result)
+
+    @staticmethod
+    def _invoke(callback: Callable, result) -> bool:
+        callback(result)
+        # Returning False keeps GLib.idle_add from re-running the callback
+        return False
+
+
+def run_cancellable(cmd: list[str], timeout: float = None, input: str = None, **kwargs) -> subprocess.CompletedProcess:
+    # Like subprocess.run(capture_output=True, text=True), but the process is
+    # registered with the running job so cancelling the job kills it
+    job = current_job()
+    if job and job.cancelled:
+        raise JobCancelled()
+
+    with tracing.span(os.path.basename(cmd[0]), " ".join(cmd)) as span:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            **kwargs
+        )
+        if job:
+            job.attach_process(process)
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            if job:
+                job.detach_process(process)
+        span.exit_code = process.returncode
+        if process.returncode != 0:
+            span.fail(stderr + stdout, process.returncode)
+
+    if job and job.cancelled:
+        raise JobCancelled()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def iter_lines_cancellable(cmd: list[str], timeout: float = None):
+    # Yields stdout lines as the process produces them. Raises
+    # subprocess.TimeoutExpired once the deadline passes; the process is
+    # killed either way when the generator is closed.
+    job = current_job()
+    if job and job.cancelled:
+        raise JobCancelled()
+
+    with tracing.span(os.path.basename(cmd[0]), " ".join(cmd)) as span:
+        yield from _iter_lines(cmd, timeout, job, span)
+
+
+def _iter_lines(cmd: list[str], timeout: Optional[float], job, span):
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if job:
+        job.attach_process(process)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ)
+    buffer = b""
+    try:
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(process.stdout.fileno(), 65536)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.decode(errors="replace")
+        if buffer:
+            yield buffer.decode(errors="replace")
+        span.exit_code = process.wait()
+        if span.exit_code != 0:
+            span.fail("", span.exit_code)
+    finally:
+        selector.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        if job:
+            job.detach_process(process)
+
+    if job and job.cancelled:
+        raise JobCancelled()
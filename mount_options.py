@@ -0,0 +1,172 @@
+from typing import Optional
+
+from smb_probe import DIALECTS
+
+# Named CIFS tuning profiles. Per-share overrides are applied on top; an
+# override of False drops a flag the profile would set.
+PROFILES = {
+    "default": {},
+    # Large sequential reads and writes (media, backups, disk images)
+    "bulk": {"cache": "loose", "rsize": 4 * 1024 * 1024, "wsize": 4 * 1024 * 1024},
+    # Build and source trees: fewer attribute round trips per file. Loose
+    # caching assumes nobody else writes to the share at the same time.
+    "small_files": {"cache": "loose", "actimeo": 30},
+    # Editing documents shared with others: fresh attributes and a
+    # connection of its own, so copies to other shares on the same server
+    # never queue in front of it
+    "interactive": {"cache": "strict", "actimeo": 1, "nosharesock": True},
+    # Nothing but the share's own overrides
+    "custom": {},
+}
+
+PROFILE_LABELS = {
+    "default": "Default",
+    "bulk": "Bulk Throughput",
+    "small_files": "Many Small Files",
+    "interactive": "Low-Latency Interactive",
+    "custom": "Custom",
+}
+
+CACHE_MODES = ("strict", "loose", "none", "singleclient", "ro")
+# "1.0" is what the probe reports for servers that only answer in SMB1
+VERSIONS = ("1.0",) + tuple(DIALECTS.values()) + ("3", "default")
+# Dialects without multichannel support
+_SINGLE_CHANNEL_VERSIONS = ("1.0", "2.0", "2.1")
+
+BUFFER_MIN = 4096
+BUFFER_MAX = 16 * 1024 * 1024
+ACTIMEO_MAX = 86400
+MAX_CHANNELS = 16
+
+# Every option Mounty lets a share set, in the order they are written;
+# True marks flags that take no value
+OPTIONS = {
+    "vers": False,
+    "cache": False,
+    "rsize": False,
+    "wsize": False,
+    "actimeo": False,
+    "multichannel": True,
+    "max_channels": False,
+    "nosharesock": True,
+}
+
+_SIZE_SUFFIXES = {"k": 1024, "m": 1024 * 1024}
+
+
+class MountOptionError(ValueError):
+    pass
+
+
+def _check_int(name: str, value, lower: int, upper: int) -> None:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise MountOptionError(f"{name} must be a whole number")
+    if not lower <= value <= upper:
+        raise MountOptionError(f"{name} must be between {lower} and {upper}")
+
+
+def validate(options: dict) -> None:
+    # Raises MountOptionError for unknown options, bad values and
+    # combinations the kernel would reject
+    for name, value in options.items():
+        if name not in OPTIONS:
+            raise MountOptionError(f"Unknown mount option: {name}")
+        if OPTIONS[name]:
+            if not isinstance(value, bool):
+                raise MountOptionError(f"{name} is a flag and takes no value")
+        elif name == "vers":
+            if value not in VERSIONS:
+                raise MountOptionError(f"vers must be one of {', '.join(VERSIONS)}")
+        elif name == "cache":
+            if value not in CACHE_MODES:
+                raise MountOptionError(f"cache must be one of {', '.join(CACHE_MODES)}")
+        elif name in ("rsize", "wsize"):
+            _check_int(name, value, BUFFER_MIN, BUFFER_MAX)
+            if value % BUFFER_MIN:
+                raise MountOptionError(f"{name} must be a multiple of {BUFFER_MIN}")
+        elif name == "actimeo":
+            _check_int(name, value, 0, ACTIMEO_MAX)
+        elif name == "max_channels":
+            _check_int(name, value, 1, MAX_CHANNELS)
+
+    if options.get("max_channels") and not options.get("multichannel"):
+        raise MountOptionError("max_channels needs multichannel")
+    if options.get("multichannel") and options.get("vers") in _SINGLE_CHANNEL_VERSIONS:
+        raise MountOptionError(f"multichannel needs SMB 3.0 or newer, not vers={options['vers']}")
+
+
+def resolve(profile: str, overrides: dict, dialect: str = "") -> dict:
+    # Options for a share: the profile, the share's overrides, and the
+    # probed dialect as vers= unless an override pins another one.
+    # Validated, so the result is safe to pass to mount or write to fstab.
+    if profile not in PROFILES:
+        raise MountOptionError(f"Unknown performance profile: {profile}")
+    options = dict(PROFILES[profile])
+    if dialect:
+        options["vers"] = dialect
+    options.update(overrides)
+    options = {name: value for name, value in options.items() if value is not False}
+    validate(options)
+    return options
+
+
+def format_options(options: dict) -> str:
+    parts = []
+    for name, is_flag in OPTIONS.items():
+        if name not in options:
+            continue
+        parts.append(name if is_flag else f"{name}={options[name]}")
+    return ",".join(parts)
+
+
+def _parse_value(name: str, value: str):
+    if name in ("rsize", "wsize", "actimeo", "max_channels"):
+        multiplier = 1
+        if name != "actimeo" and value[-1:].lower() in _SIZE_SUFFIXES:
+            multiplier = _SIZE_SUFFIXES[value[-1].lower()]
+            value = value[:-1]
+        try:
+            return int(value) * multiplier
+        except ValueError:
+            raise MountOptionError(f"{name} must be a whole number") from None
+    return value
+
+
+def parse_overrides(text: str) -> dict:
+    # "cache=loose,rsize=4M,multichannel,no-nosharesock" -> overrides dict.
+    # A "no-" prefix turns a flag off.
+    overrides = {}
+    for item in text.replace(" ", "").split(","):
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        if name.startswith("no-") and OPTIONS.get(name[3:]) and not sep:
+            overrides[name[3:]] = False
+        elif name not in OPTIONS:
+            raise MountOptionError(f"Unknown mount option: {name}")
+        elif OPTIONS[name]:
+            if sep:
+                raise MountOptionError(f"{name} is a flag and takes no value")
+            overrides[name] = True
+        elif not value:
+            raise MountOptionError(f"{name} needs a value")
+        else:
+            overrides[name] = _parse_value(name, value)
+    validate({name: value for name, value in overrides.items() if value is not False})
+    return overrides
+
+
+def format_overrides(overrides: dict) -> str:
+    parts = [f"no-{name}" for name, value in overrides.items() if value is False]
+    options = format_options({name: value for name, value in overrides.items() if value is not False})
+    return ",".join(([options] if options else []) + parts)
+
+
+def describe(profile: str, overrides: Optional[dict] = None) -> str:
+    # Profile label plus the options it adds, for rows and the CLI
+    label = PROFILE_LABELS.get(profile, profile)
+    try:
+        options = format_options(resolve(profile, overrides or {}))
+    except MountOptionError as e:
+        return f"{label} (invalid: {e})"
+    return f"{label} ({options})" if options else label
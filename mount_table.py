@@ -0,0 +1,197 @@
+import os
+import re
+import select
+import threading
+from dataclasses import dataclass, field
+
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(value: str) -> str:
+    # The kernel escapes space, tab, newline and backslash as \ooo
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), value)
+
+
+def normalize_mount_point(path: str) -> str:
+    if not path:
+        return ""
+    normalized = os.path.normpath(path)
+    # normpath keeps a leading double slash, which is meaningless for local paths
+    if normalized.startswith("//"):
+        normalized = "/" + normalized.lstrip("/")
+    return normalized
+
+
+def is_below(path: str, ancestor: str) -> bool:
+    # True when path is strictly inside ancestor
+    path, ancestor = normalize_mount_point(path), normalize_mount_point(ancestor)
+    return path != ancestor and path.startswith(ancestor.rstrip("/") + "/")
+
+
+def normalize_unc(path: str) -> str:
+    # SMB server and share names are case-insensitive; mount.cifs may also
+    # report backslashes or a trailing slash depending on how it was invoked
+    path = path.replace("\\", "/").rstrip("/")
+    if not path.startswith("//"):
+        return path.lower()
+    return "//" + path[2:].lower()
+
+
+@dataclass
+class MountEntry:
+    mount_id: int
+    parent_id: int
+    mount_point: str
+    fs_type: str
+    source: str
+    options: str = ""
+    super_options: str = ""
+
+    @property
+    def is_cifs(self) -> bool:
+        return self.fs_type in ("cifs", "smb3")
+
+
+@dataclass
+class MountTable:
+    entries: list[MountEntry] = field(default_factory=list)
+    by_mount_point: dict[str, MountEntry] = field(default_factory=dict)
+    by_source: dict[str, list[MountEntry]] = field(default_factory=dict)
+    # autofs triggers (systemd automount units) waiting for first access;
+    # kept apart so an armed but idle mount point does not count as mounted
+    automounts: dict[str, MountEntry] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> "MountTable":
+        table = cls()
+        for line in text.splitlines():
+            entry = cls._parse_line(line)
+            if entry:
+                table._add(entry)
+        return table
+
+    @classmethod
+    def read(cls, path: str = MOUNTINFO_PATH) -> "MountTable":
+        try:
+            with open(path, 'r') as f:
+                return cls.parse(f.read())
+        except OSError as e:
+            print(f"Error reading mount table: {e}")
+            return cls()
+
+    @staticmethod
+    def _parse_line(line: str) -> MountEntry | None:
+        # <id> <parent> <major:minor> <root> <mount point> <options> [optional...] - <fstype> <source> <super options>
+        parts = line.split()
+        try:
+            sep = parts.index("-", 6)
+        except ValueError:
+            return None
+        if len(parts) < sep + 3:
+            return None
+        try:
+            return MountEntry(
+                mount_id=int(parts[0]),
+                parent_id=int(parts[1]),
+                mount_point=_unescape(parts[4]),
+                options=parts[5],
+                fs_type=parts[sep + 1],
+                source=_unescape(parts[sep + 2]),
+                super_options=parts[sep + 3] if len(parts) > sep + 3 else "",
+            )
+        except ValueError:
+            return None
+
+    def _add(self, entry: MountEntry) -> None:
+        self.entries.append(entry)
+        if entry.fs_type == "autofs":
+            self.automounts[normalize_mount_point(entry.mount_point)] = entry
+            return
+        # Later entries are stacked on top of earlier ones at the same path
+        self.by_mount_point[normalize_mount_point(entry.mount_point)] = entry
+        if entry.source.startswith("//") or entry.source.startswith("\\\\"):
+            self.by_source.setdefault(normalize_unc(entry.source), []).append(entry)
+
+    def get(self, mount_point: str) -> MountEntry | None:
+        return self.by_mount_point.get(normalize_mount_point(mount_point))
+
+    def find_source(self, unc_path: str) -> list[MountEntry]:
+        return self.by_source.get(normalize_unc(unc_path), [])
+
+    def is_mounted(self, mount_point: str) -> bool:
+        return normalize_mount_point(mount_point) in self.by_mount_point
+
+    def is_armed(self, mount_point: str) -> bool:
+        return normalize_mount_point(mount_point) in self.automounts
+
+    def diff(self, other: "MountTable") -> set[str]:
+        changed = set()
+        for mount_point in self.by_mount_point.keys() | other.by_mount_point.keys():
+            old = self.by_mount_point.get(mount_point)
+            new = other.by_mount_point.get(mount_point)
+            if old is None or new is None or old.mount_id != new.mount_id or old.source != new.source:
+                changed.add(mount_point)
+        changed |= self.automounts.keys() ^ other.automounts.keys()
+        return changed
+
+
+class MountWatcher:
+    # The kernel flags /proc/self/mountinfo with POLLPRI|POLLERR whenever the
+    # mount namespace changes, so we can block until something happens
+    # instead of polling findmnt on a timer.
+    def __init__(self, callback, path: str = MOUNTINFO_PATH):
+        self.callback = callback
+        self.path = path
+        self.table = MountTable()
+        self._thread = None
+        self._wake_r = None
+        self._wake_w = None
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="mount-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self._thread:
+            return
+        os.write(self._wake_w, b"x")
+        self._thread.join(timeout=1)
+        self._thread = None
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r = self._wake_w = None
+
+    def _run(self) -> None:
+        try:
+            f = open(self.path, 'r')
+        except OSError as e:
+            print(f"Mount watcher disabled: {e}")
+            return
+
+        with f:
+            self.table = MountTable.parse(f.read())
+            poller = select.poll()
+            poller.register(f.fileno(), select.POLLPRI | select.POLLERR)
+            poller.register(self._wake_r, select.POLLIN)
+
+            while True:
+                events = poller.poll()
+                if any(fd == self._wake_r for fd, _ in events):
+                    return
+
+                f.seek(0)
+                table = MountTable.parse(f.read())
+                changed = self.table.diff(table)
+                self.table = table
+                if changed:
+                    try:
+                        self.callback(changed, table)
+                    except Exception as e:
+                        print(f"Mount watcher callback failed: {e}")
@@ -0,0 +1,95 @@
+import os
+from typing import Callable, Optional
+
+from mount_table import normalize_mount_point
+
+
+class MountTree:
+    # How the mount points of a set of shares nest: a share's parent is the
+    # nearest other share whose mount point contains it. /mnt/projects is
+    # the parent of /mnt/projects/archive but unrelated to /mnt/media, so
+    # those two subtrees can be worked on at the same time.
+    def __init__(self, items: list, mount_point: Callable = lambda share: share.mount_point):
+        self.items = list(items)
+        self.mount_point = mount_point
+        by_path: dict[str, int] = {}
+        for index, item in enumerate(self.items):
+            by_path.setdefault(normalize_mount_point(mount_point(item)), index)
+
+        self.parent: list[Optional[int]] = [None] * len(self.items)
+        self.children: list[list[int]] = [[] for _ in self.items]
+        for index, item in enumerate(self.items):
+            path = normalize_mount_point(mount_point(item))
+            while path not in ("/", ""):
+                path = os.path.dirname(path)
+                parent = by_path.get(path)
+                if parent is not None and parent != index:
+                    self.parent[index] = parent
+                    self.children[parent].append(index)
+                    break
+
+    def depth(self, index: int) -> int:
+        depth = 0
+        while (index := self.parent[index]) is not None:
+            depth += 1
+        return depth
+
+    def levels(self) -> list[list]:
+        # Items grouped by nesting depth, parents' level first
+        levels: list[list] = []
+        for index, item in enumerate(self.items):
+            depth = self.depth(index)
+            while len(levels) <= depth:
+                levels.append([])
+            levels[depth].append(item)
+        return levels
+
+    def run(self, action: Callable, max_workers: int, callback: Callable,
+            children_first: bool = False) -> None:
+        # Calls action(item) -> (success, message) on a pool of max_workers
+        # threads. An item starts once its parent has finished (or, with
+        # children_first, once all its children have), so independent
+        # subtrees proceed in parallel. Items behind a failure are not
+        # attempted. callback(item, result) runs on the calling thread.
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        if not self.items:
+            return
+        if children_first:
+            blockers = [len(children) for children in self.children]
+            dependents = [[] if parent is None else [parent] for parent in self.parent]
+        else:
+            blockers = [0 if parent is None else 1 for parent in self.parent]
+            dependents = self.children
+        skipped = set()
+
+        def skip(index: int, reason: str) -> None:
+            if index in skipped:
+                return
+            skipped.add(index)
+            callback(self.items[index], (False, reason))
+            for dependent in dependents[index]:
+                skip(dependent, reason)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(self.items))) as pool:
+            running = {
+                pool.submit(action, self.items[index]): index
+                for index in range(len(self.items)) if blockers[index] == 0
+            }
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = (False, f"Error: {str(e)}")
+                    callback(self.items[index], result)
+                    for dependent in dependents[index]:
+                        if not result[0]:
+                            state = "is still mounted" if children_first else "failed to mount"
+                            skip(dependent, f"Skipped: {self.mount_point(self.items[index])} {state}")
+                            continue
+                        blockers[dependent] -= 1
+                        if blockers[dependent] == 0 and dependent not in skipped:
+                            running[pool.submit(action, self.items[dependent])] = dependent
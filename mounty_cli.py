@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+#
+# Headless command line for Mounty. Built directly on ShareManager and
+# never imports gi, so it starts fast enough for login hooks, SSH sessions
+# and shell completion.
+#
+#   mounty-cli list [--ids]
+#   mounty-cli status [ID ...] [--all]
+#   mounty-cli mount|unmount|test ID ... [--all]
+#   mounty-cli automount on|off ID ... [--all]
+#   mounty-cli automount-settings [--backend fstab|systemd] [--idle-timeout S] ...
+#   mounty-cli profile ID ... [--all] [--profile NAME] [--options cache=loose,rsize=4M]
+#   mounty-cli benchmark ID [--size MB] [--small-files N] [--history]
+#   mounty-cli scan SERVER [--username USER] [--password-stdin]
+#   mounty-cli discover
+#
+# --json prints machine-readable output. Exit status is 0 when everything
+# succeeded, 1 when any share or command failed and 2 on usage errors.
+
+import argparse
+import json
+import os
+import sys
+import dataclasses
+from dataclasses import asdict
+
+from daemon_client import open_share_manager
+from mount_options import PROFILES, MountOptionError, format_options, parse_overrides, resolve
+from share_benchmark import BenchmarkSettings
+from share_manager import AUTOMOUNT_BACKENDS, Share, ShareManager
+
+
+def _public(share: Share) -> dict:
+    data = asdict(share)
+    del data["password"]
+    return data
+
+
+def _resolve(manager: ShareManager, args) -> tuple[list[Share], dict]:
+    # Returns the shares named on the command line and an error result for
+    # every id that does not exist
+    if args.all:
+        return manager.shares, {}
+    shares, missing = [], {}
+    for share_id in args.ids:
+        share = manager.get_share(share_id)
+        if share is None:
+            missing[share_id] = (False, "No such share")
+        else:
+            shares.append(share)
+    return shares, missing
+
+
+def _batch_output(results: dict) -> tuple[bool, dict]:
+    return (
+        all(ok for ok, _ in results.values()),
+        {share_id: {"ok": ok, "message": message} for share_id, (ok, message) in results.items()},
+    )
+
+
+def cmd_list(manager: ShareManager, args) -> tuple[bool, object]:
+    if args.ids_only:
+        return True, [share.id for share in manager.shares]
+    return True, [_public(share) for share in manager.shares]
+
+
+def cmd_status(manager: ShareManager, args) -> tuple[bool, object]:
+    shares, missing = _resolve(manager, args) if args.ids else (manager.shares, {})
+    daemon = getattr(manager, "daemon", None)
+    if daemon is not None:
+        # Served from mountyd's in-memory model
+        output = daemon.call("status", {"ids": [share.id for share in shares]})
+        for share_id, (_, message) in missing.items():
+            output[share_id] = {"error": message}
+        return not missing, output
+    
+    snapshot = manager.get_mount_snapshot()
+    output = {}
+    for share in shares:
+        entry = manager.get_mount_entry(share, snapshot)
+        output[share.id] = {
+            "unc_path": share.unc_path,
+            "status": manager.get_share_status(share, snapshot).value,
+            "mount_point": share.mount_point,
+            "mounted_source": entry.source if entry else None,
+            "automounted": share.automounted,
+            "automount_armed": manager.is_automount_armed(share, snapshot),
+        }
+    for share_id, (_, message) in missing.items():
+        output[share_id] = {"error": message}
+    return not missing, output
+
+
+def _cmd_batch(action):
+    def run(manager: ShareManager, args) -> tuple[bool, object]:
+        shares, results = _resolve(manager, args)
+        results.update(action(manager)(shares, max_workers=args.jobs))
+        # Shares that were already in the requested state are not in the
+        # bulk results
+        for share in shares:
+            results.setdefault(share.id, (True, "Nothing to do"))
+        return _batch_output(results)
+    return run
+
+
+cmd_mount = _cmd_batch(lambda manager: manager.mount_shares)
+cmd_unmount = _cmd_batch(lambda manager: manager.unmount_shares)
+cmd_test = _cmd_batch(lambda manager: manager.test_shares)
+
+
+def cmd_automount(manager: ShareManager, args) -> tuple[bool, object]:
+    shares, results = _resolve(manager, args)
+    enabled = args.state == "on"
+    pending = [share for share in shares if share.automounted != enabled]
+    if pending:
+        # One fstab write and one authorization for all of them
+        result = manager.set_automount(pending, enabled)
+        results.update({share.id: result for share in pending})
+    for share in shares:
+        results.setdefault(share.id, (True, "Nothing to do"))
+    return _batch_output(results)
+
+
+def cmd_automount_settings(manager: ShareManager, args) -> tuple[bool, object]:
+    settings = manager.load_automount_settings()
+    changes = {
+        name: value for name in ("backend", "idle_timeout", "mount_timeout", "device_timeout")
+        if (value := getattr(args, name)) is not None
+    }
+    if changes:
+        settings = dataclasses.replace(settings, **changes)
+        success, message = manager.apply_automount_settings(settings)
+        if not success:
+            return False, {"error": message}
+    return True, asdict(settings)
+
+
+def cmd_profile(manager: ShareManager, args) -> tuple[bool, object]:
+    shares, results = _resolve(manager, args)
+    output = {share_id: {"error": message} for share_id, (_, message) in results.items()}
+    try:
+        overrides = parse_overrides(args.options) if args.options is not None else None
+    except MountOptionError as e:
+        return False, {"error": str(e)}
+
+    changed = []
+    for share in shares:
+        updated = dataclasses.replace(
+            share,
+            profile=args.profile or share.profile,
+            mount_options=share.mount_options if overrides is None else overrides,
+        )
+        error = manager.validate_mount_options(updated)
+        if error:
+            output[share.id] = {"error": error}
+            continue
+        if (updated.profile, updated.mount_options) != (share.profile, share.mount_options):
+            share.profile, share.mount_options = updated.profile, updated.mount_options
+            changed.append(share)
+        output[share.id] = {
+            "profile": share.profile,
+            "options": format_options(resolve(share.profile, share.mount_options, share.smb_dialect)),
+        }
+
+    if changed:
+        for share in changed:
+            manager.update_share(share)
+        automounted = [share for share in changed if share.automounted]
+        if automounted:
+            # Rewrite their fstab entries with the new options
+            success, message = manager.set_automount(automounted, True)
+            if not success:
+                for share in automounted:
+                    output[share.id]["error"] = message
+    return all("error" not in value for value in output.values()), output
+
+
+def cmd_benchmark(manager: ShareManager, args) -> tuple[bool, object]:
+    share = manager.get_share(args.id)
+    if share is None:
+        return False, {"error": "No such share"}
+    if args.history:
+        return True, [asdict(result) for result in manager.get_benchmarks(share)]
+
+    def progress(phase: str, fraction: float) -> None:
+        print(f"\r{phase:<8} {fraction:4.0%}", end="", file=sys.stderr, flush=True)
+
+    settings = BenchmarkSettings(file_size_mb=args.size, small_files=args.small_files)
+    success, result = manager.benchmark_share(share, settings, progress)
+    print(file=sys.stderr)
+    if not success:
+        return False, {"error": result}
+    return True, asdict(result)
+
+
+def cmd_scan(manager: ShareManager, args) -> tuple[bool, object]:
+    username, password = args.username, os.environ.get("MOUNTY_PASSWORD", "")
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip("\n")
+    if username is None:
+        username, saved_password = manager.find_credentials(args.server)
+        password = password or saved_password
+
+    success, result = manager.scan_shares(args.server, username, password, use_cache=False)
+    if not success:
+        return False, {"error": "Authentication required" if result == "auth_error" else result}
+    return True, result
+
+
+def cmd_discover(manager: ShareManager, args) -> tuple[bool, object]:
+    success, result = manager.discover_servers()
+    if not success:
+        return False, {"error": result}
+    return True, result
+
+
+def _print_text(data) -> None:
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                print("\t".join(str(v) for v in item.values()))
+            else:
+                print(item)
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                print(f"{key}\t" + "\t".join(str(v) for v in value.values()))
+            else:
+                print(f"{key}\t{value}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="mounty-cli", description="Manage Mounty network shares")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="do the work in this process even if mountyd is running")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list saved shares")
+    list_parser.add_argument("--ids", dest="ids_only", action="store_true", help="print share ids only")
+    list_parser.set_defaults(func=cmd_list)
+
+    def add_targets(sub, jobs=True):
+        sub.add_argument("ids", nargs="*", metavar="ID")
+        sub.add_argument("--all", action="store_true", help="every saved share")
+        if jobs:
+            sub.add_argument("-j", "--jobs", type=int, default=None,
+                             help="parallel operations (default %d)" % ShareManager.BULK_MAX_WORKERS)
+
+    status_parser = commands.add_parser("status", help="show mount status")
+    add_targets(status_parser, jobs=False)
+    status_parser.set_defaults(func=cmd_status)
+
+    for name, func, help_text in (
+        ("mount", cmd_mount, "mount shares"),
+        ("unmount", cmd_unmount, "unmount shares"),
+        ("test", cmd_test, "test connections"),
+    ):
+        sub = commands.add_parser(name, help=help_text)
+        add_targets(sub)
+        sub.set_defaults(func=func, needs_targets=True)
+
+    automount_parser = commands.add_parser("automount", help="turn fstab automount on or off")
+    automount_parser.add_argument("state", choices=("on", "off"))
+    add_targets(automount_parser, jobs=False)
+    automount_parser.set_defaults(func=cmd_automount, needs_targets=True)
+
+    settings_parser = commands.add_parser(
+        "automount-settings", help="show or change how automount shares are mounted"
+    )
+    settings_parser.add_argument("--backend", choices=AUTOMOUNT_BACKENDS,
+                                 help="fstab mounts at boot, systemd mounts on first access")
+    settings_parser.add_argument("--idle-timeout", type=int, help="systemd: unmount after idle seconds")
+    settings_parser.add_argument("--mount-timeout", type=int, help="systemd: seconds to wait for the server")
+    settings_parser.add_argument("--device-timeout", type=int, help="systemd: seconds to wait for the network")
+    settings_parser.set_defaults(func=cmd_automount_settings)
+
+    profile_parser = commands.add_parser(
+        "profile", help="show or change the performance profile of shares"
+    )
+    add_targets(profile_parser, jobs=False)
+    profile_parser.add_argument("--profile", choices=tuple(PROFILES))
+    profile_parser.add_argument("--options", metavar="OPTIONS",
+                                help="overrides on top of the profile, e.g. cache=loose,rsize=4M,"
+                                     "no-nosharesock; an empty string clears them")
+    profile_parser.set_defaults(func=cmd_profile, needs_targets=True)
+
+    defaults = BenchmarkSettings()
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="measure throughput and file operations on a mounted share"
+    )
+    benchmark_parser.add_argument("id", metavar="ID")
+    benchmark_parser.add_argument("--size", type=int, default=defaults.file_size_mb,
+                                  help="sequential file size in MB (default %(default)s)")
+    benchmark_parser.add_argument("--small-files", type=int, default=defaults.small_files,
+                                  help="small files to create, stat and delete (default %(default)s)")
+    benchmark_parser.add_argument("--history", action="store_true",
+                                  help="print earlier results instead of running")
+    benchmark_parser.set_defaults(func=cmd_benchmark)
+
+    scan_parser = commands.add_parser("scan", help="list the shares a server offers")
+    scan_parser.add_argument("server")
+    scan_parser.add_argument("-u", "--username", default=None,
+                             help="defaults to the credentials of a saved share on the server")
+    scan_parser.add_argument("--password-stdin", action="store_true",
+                             help="read the password from stdin (or set MOUNTY_PASSWORD)")
+    scan_parser.set_defaults(func=cmd_scan)
+
+    discover_parser = commands.add_parser("discover", help="find SMB servers on the local network")
+    discover_parser.set_defaults(func=cmd_discover)
+
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "needs_targets", False) and not args.ids and not args.all:
+        parser.error(f"{args.command}: give one or more share ids or --all")
+
+    manager = ShareManager() if args.no_daemon else open_share_manager()
+    try:
+        success, data = args.func(manager, args)
+    finally:
+        manager.close()
+
+    if args.json:
+        json.dump(data, sys.stdout, indent=2)
+        print()
+    else:
+        _print_text(data)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+#
+# Optional per-user Mounty daemon. Owns one ShareManager (and so one
+# authorized privileged helper, one scan cache and one smbclient session
+# pool) and serves the GUI and mounty-cli over a Unix socket, one JSON
+# message per line:
+#
+#   -> {"id": 1, "method": "mount_shares", "params": {"ids": ["a1b2c3d4", ...]}}
+#   <- {"id": 1, "callback": [1, 2, "a1b2c3d4", [true, "Mounted successfully"]]}
+#   <- {"id": 1, "result": {"a1b2c3d4": [true, "Mounted successfully"], ...}}
+#   -> {"cancel": 1}
+#
+# "status" is answered from an in-memory model kept current by a
+# MountWatcher; "subscribe" turns a connection into an event stream
+# ({"event": "mounts-changed", ...}, {"event": "shares-changed"}).
+#
+# Shares are named by id and looked up in the daemon's own store; clients
+# never pass share data (mount points, options) for privileged work.
+
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+from dataclasses import asdict
+
+from daemon_client import DaemonClient, default_socket_path
+from job_scheduler import JobScheduler
+from mount_table import MountWatcher
+from share_manager import Share, ShareManager
+from ttl_cache import TTLCache
+
+
+class Connection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.subscribed = False
+        self.jobs: dict[int, object] = {}
+        self._write_lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        data = (json.dumps(message) + "\n").encode()
+        try:
+            with self._write_lock:
+                self.sock.sendall(data)
+        except OSError:
+            pass
+
+
+class Daemon:
+    PROBE_CACHE_TTL = 30
+    DISCOVERY_CACHE_TTL = 30
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.manager = ShareManager()
+        self.scheduler = JobScheduler(max_workers=ShareManager.BULK_MAX_WORKERS)
+        self._probe_cache = TTLCache(self.PROBE_CACHE_TTL, max_size=256)
+        self._discovery_cache = TTLCache(self.DISCOVERY_CACHE_TTL, max_size=1)
+        self._connections: set[Connection] = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._status: dict[str, dict] = {}
+        self.watcher = MountWatcher(self._on_mounts_changed, self.manager.MOUNTINFO_PATH)
+
+    # In-memory model
+
+    def _rebuild_status(self) -> None:
+        snapshot = self.manager.get_cached_mount_snapshot()
+        status = {}
+        for share in self.manager.shares:
+            entry = self.manager.get_mount_entry(share, snapshot)
+            status[share.id] = {
+                "unc_path": share.unc_path,
+                "status": self.manager.get_share_status(share, snapshot).value,
+                "mount_point": share.mount_point,
+                "mounted_source": entry.source if entry else None,
+                "automounted": share.automounted,
+                "automount_armed": self.manager.is_automount_armed(share, snapshot),
+            }
+        self._status = status
+
+    def _refresh_shares(self) -> None:
+        # Cheap when nothing changed: load_shares only re-reads the store
+        # after another process has committed
+        version = self.manager._store_version
+        self.manager.load_shares()
+        if self.manager._store_version != version:
+            self._rebuild_status()
+            self._broadcast({"event": "shares-changed"})
+
+    def _on_mounts_changed(self, changed: set[str], table) -> None:
+        self.manager.set_mount_snapshot(table)
+        self._rebuild_status()
+        self._broadcast({"event": "mounts-changed", "mount_points": sorted(changed)})
+
+    def _broadcast(self, message: dict) -> None:
+        with self._lock:
+            subscribers = [c for c in self._connections if c.subscribed]
+        for connection in subscribers:
+            connection.send(message)
+
+    # Methods. Each takes (params, callback) and returns a JSON-able value.
+
+    def _share(self, share_id) -> Share:
+        share = self.manager.get_share(share_id) if isinstance(share_id, str) else None
+        if share is None:
+            raise ValueError(f"Unknown share: {share_id!r}")
+        return share
+
+    def _shares(self, params: dict) -> list[Share]:
+        return [self._share(share_id) for share_id in params.get("ids", [])]
+
+    def _status_method(self, params, callback):
+        ids = params.get("ids")
+        if not ids:
+            return self._status
+        return {share_id: self._status.get(share_id) for share_id in ids}
+
+    def _probe_server(self, params, callback):
+        server = params["server"]
+        result = self._probe_cache.get(server.lower())
+        if result is None:
+            result = self.manager.probe_server(server)
+            self._probe_cache.set(server.lower(), result)
+        return asdict(result)
+
+    def _single(self, action):
+        def run(params, callback):
+            share = self._share(params.get("id"))
+            success, message = action(share)
+            return [success, message, share.smb_dialect]
+        return run
+
+    def _bulk(self, action):
+        def run(params, callback):
+            def on_progress(done, total, share, result):
+                callback([done, total, share.id, list(result)])
+            return action(self._shares(params), on_progress, params.get("max_workers"))
+        return run
+
+    def _set_automount(self, params, callback):
+        result = self.manager.set_automount(self._shares(params), params["enabled"])
+        self._rebuild_status()
+        self._broadcast({"event": "shares-changed"})
+        return list(result)
+
+    def _scan_shares(self, params, callback):
+        return list(self.manager.scan_shares(
+            params["server"], params.get("username", ""), params.get("password", ""),
+            params.get("use_cache", True)
+        ))
+
+    def _invalidate_scan_cache(self, params, callback):
+        self.manager.invalidate_scan_cache(params.get("server"))
+        self._discovery_cache.invalidate()
+        return None
+
+    def _discover_servers(self, params, callback):
+        # Results are cached briefly so clients opening the browse page one
+        # after another share a single avahi run
+        cached = self._discovery_cache.get("servers")
+        if cached is not None:
+            success, result = cached
+            if success:
+                for info in result:
+                    callback(["added", info])
+            return list(cached)
+        result = self.manager.discover_servers(lambda event, info: callback([event, info]))
+        self._discovery_cache.set("servers", result)
+        return list(result)
+
+    METHODS = {
+        "probe_server": "_probe_server",
+        "scan_shares": "_scan_shares",
+        "invalidate_scan_cache": "_invalidate_scan_cache",
+        "discover_servers": "_discover_servers",
+        "set_automount": "_set_automount",
+    }
+
+    def _handler(self, method: str):
+        if method in self.METHODS:
+            return getattr(self, self.METHODS[method])
+        single = {
+            "test_share": self.manager.test_share,
+            "mount_share": self.manager.mount_share,
+            "unmount_share": self.manager.unmount_share,
+            "remount_share": self.manager.remount_share,
+        }
+        if method in single:
+            return self._single(single[method])
+        bulk = {
+            "mount_shares": self.manager.mount_shares,
+            "unmount_shares": self.manager.unmount_shares,
+            "test_shares": self.manager.test_shares,
+        }
+        if method in bulk:
+            return self._bulk(bulk[method])
+        return None
+
+    # Connections
+
+    def _handle_request(self, connection: Connection, request: dict) -> None:
+        if "cancel" in request:
+            job = connection.jobs.pop(request["cancel"], None)
+            if job is not None:
+                self.scheduler.cancel(job)
+            return
+
+        request_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        if method == "subscribe":
+            connection.subscribed = True
+            connection.send({"id": request_id, "result": None})
+            return
+        if method == "status":
+            self._refresh_shares()
+            connection.send({"id": request_id, "result": self._status_method(params, None)})
+            return
+
+        handler = self._handler(method)
+        if handler is None:
+            connection.send({"id": request_id, "error": f"Unknown method: {method!r}"})
+            return
+
+        def run():
+            self._refresh_shares()
+            try:
+                result = handler(params, lambda args: connection.send({"id": request_id, "callback": args}))
+            except Exception as e:
+                return {"id": request_id, "error": str(e)}
+            return {"id": request_id, "result": result}
+
+        def done(reply):
+            connection.jobs.pop(request_id, None)
+            connection.send(reply)
+
+        host = params.get("server")
+        if host is None and isinstance(params.get("id"), str):
+            share = self.manager.get_share(params["id"])
+            host = share.server if share else None
+        job = self.scheduler.submit(run, host=host, callback=done)
+        connection.jobs[request_id] = job
+        if job.finished:
+            connection.jobs.pop(request_id, None)
+
+    def _serve_connection(self, connection: Connection) -> None:
+        with connection.sock.makefile('r', encoding='utf-8') as lines:
+            try:
+                for line in lines:
+                    try:
+                        request = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._handle_request(connection, request)
+            except OSError:
+                pass
+
+        with self._lock:
+            self._connections.discard(connection)
+        for job in list(connection.jobs.values()):
+            self.scheduler.cancel(job)
+        connection.sock.close()
+
+    def serve_forever(self) -> None:
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self._server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self._server.listen()
+
+        self._rebuild_status()
+        self.watcher.start()
+
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                break
+            connection = Connection(sock)
+            with self._lock:
+                self._connections.add(connection)
+            thread = threading.Thread(target=self._serve_connection, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def shutdown(self) -> None:
+        if self._server:
+            self._server.close()
+        self.watcher.stop()
+        self.scheduler.shutdown()
+        self.manager.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    socket_path = argv[0] if argv else default_socket_path()
+
+    if os.path.exists(socket_path):
+        client = DaemonClient.connect(socket_path)
+        if client is not None:
+            client.close()
+            print(f"mountyd is already running on {socket_path}", file=sys.stderr)
+            return 1
+        # Left behind by a daemon that did not shut down cleanly
+        os.unlink(socket_path)
+
+    daemon = Daemon(socket_path)
+
+    def stop(signum, frame):
+        daemon.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    daemon.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+#
+# Privileged side of Mounty. Started once per session through pkexec and
+# driven over stdin/stdout with one JSON request per line:
+#
+#   -> {"id": 1, "ops": [{"op": "mkdir", "path": "/mnt/nas"}, {"op": "mount", ...}]}
+#   <- {"id": 1, "results": [{"ok": true, "error": ""}, {"ok": false, "error": "..."}]}
+#
+# Operations in a request run in order and stop at the first failure unless
+# the op sets "check": false. Requests are handled concurrently.
+
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from fstab import FSTAB_END_MARKER, FSTAB_START_MARKER, Fstab, FstabEntry, splice_block
+import tracing
+from mount_table import MountTable
+
+DEFAULT_FSTAB_PATH = "/etc/fstab"
+
+HELPER_PATH = str(Path(__file__).resolve())
+
+# Never mounted over, created or taken down, whatever a client asks for
+SYSTEM_DIRECTORIES = (
+    "/", "/home", "/media", "/mnt", "/opt", "/root", "/run", "/srv", "/tmp", "/var",
+)
+# ... nor anything below these
+SYSTEM_TREES = (
+    "/bin", "/boot", "/dev", "/etc", "/lib", "/lib32", "/lib64", "/proc", "/sbin", "/sys", "/usr",
+)
+
+
+class HelperError(Exception):
+    pass
+
+
+def _check_path(path) -> str:
+    if not isinstance(path, str) or not path.startswith("/") or "\0" in path:
+        raise HelperError(f"Invalid path: {path!r}")
+    return path
+
+
+def _is_system_directory(path: str) -> bool:
+    path = "/" + os.path.normpath(path).lstrip("/")
+    return path in SYSTEM_DIRECTORIES or any(
+        path == tree or path.startswith(tree + "/") for tree in SYSTEM_TREES
+    )
+
+
+def _check_mount_point(path, resolve: bool = False) -> str:
+    # resolve also follows symlinks, so a link to /etc is refused too. Only
+    # for paths about to be accessed anyway: resolving stats every
+    # component, which blocks on a dead CIFS mount.
+    path = _check_path(path)
+    if _is_system_directory(path) or (resolve and _is_system_directory(os.path.realpath(path))):
+        raise HelperError(f"Refusing to use system directory {path} as a mount point")
+    return path
+
+
+def _run(cmd: list[str]) -> dict:
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode == 0:
+        return {"ok": True, "error": "", "exit_code": 0}
+    error = result.stderr.strip() or f"Exit code: {result.returncode}"
+    return {"ok": False, "error": error, "exit_code": result.returncode}
+
+
+def _op_mkdir(op: dict, fstab_path: str) -> dict:
+    path = _check_mount_point(op.get("path"))
+    # A mount point that is mounted exists by definition, and stat-ing a
+    # dead CIFS mount would block this request until the kernel gives up
+    # (an armed automount point would be triggered by it)
+    table = MountTable.read()
+    if not table.is_mounted(path) and not table.is_armed(path):
+        os.makedirs(_check_mount_point(path, resolve=True), exist_ok=True)
+    return {"ok": True, "error": ""}
+
+
+def _op_mount(op: dict, fstab_path: str) -> dict:
+    target = _check_mount_point(op.get("target"), resolve=True)
+    source = op.get("source")
+    if source is None:
+        # Mount an entry that already exists in fstab
+        return _run(["mount", target])
+    if not isinstance(source, str) or not source.startswith("//"):
+        raise HelperError(f"Invalid source: {source!r}")
+    options = op.get("options", "")
+    if not isinstance(options, str) or any(c in options for c in " \n\0"):
+        raise HelperError("Invalid mount options")
+    return _run(["mount", "-t", "cifs", source, target, "-o", options])
+
+
+def _op_activate(op: dict, fstab_path: str) -> dict:
+    # mount -a limited to the given fstab targets, so entries written in the
+    # same batch come up without touching unrelated ones
+    targets = op.get("targets")
+    if not isinstance(targets, list):
+        raise HelperError("Invalid activation targets")
+    mounted = MountTable.read()
+    errors = []
+    for target in targets:
+        if mounted.is_mounted(_check_mount_point(target)):
+            continue
+        result = _run(["mount", target])
+        if not result["ok"]:
+            errors.append(f"{target}: {result['error']}")
+    return {"ok": not errors, "error": "; ".join(errors)}
+
+
+def _op_umount(op: dict, fstab_path: str) -> dict:
+    target = _check_mount_point(op.get("target"))
+    cmd = ["umount", "-l", target] if op.get("lazy") else ["umount", target]
+    return _run(cmd)
+
+
+def unit_name(path: str, suffix: str) -> str:
+    # systemd-escape --path --suffix=SUFFIX PATH
+    parts = [p for p in path.split("/") if p]
+    if not parts:
+        return f"-.{suffix}"
+    chars = []
+    for i, c in enumerate("/".join(parts)):
+        if c == "/":
+            chars.append("-")
+        elif c.isascii() and (c.isalnum() or c in ":_" or (c == "." and i > 0)):
+            chars.append(c)
+        else:
+            chars.extend(f"\\x{b:02x}" for b in c.encode())
+    return "".join(chars) + f".{suffix}"
+
+
+def _systemd_applies(fstab_path: str) -> bool:
+    # systemd only reads /etc/fstab; stand-ins writing elsewhere must not
+    # reload or start units on the real system
+    return fstab_path == DEFAULT_FSTAB_PATH
+
+
+def _op_systemd_reload(op: dict, fstab_path: str) -> dict:
+    # Regenerates mount and automount units from fstab
+    if not _systemd_applies(fstab_path):
+        return {"ok": True, "error": ""}
+    return _run(["systemctl", "daemon-reload"])
+
+
+def _automount_units(op: dict) -> list[str]:
+    targets = op.get("targets")
+    if not isinstance(targets, list):
+        raise HelperError("Invalid automount targets")
+    return [unit_name(_check_mount_point(target), "automount") for target in targets]
+
+
+def _op_start_automount(op: dict, fstab_path: str) -> dict:
+    units = _automount_units(op)
+    if not units or not _systemd_applies(fstab_path):
+        return {"ok": True, "error": ""}
+    return _run(["systemctl", "start"] + units)
+
+
+def _op_stop_automount(op: dict, fstab_path: str) -> dict:
+    units = _automount_units(op)
+    if not units or not _systemd_applies(fstab_path):
+        return {"ok": True, "error": ""}
+    return _run(["systemctl", "stop"] + units)
+
+
+@contextmanager
+def _fstab_lock(fstab_path: str):
+    # Serializes read-modify-replace of fstab between the threads of this
+    # helper and other helper processes (GUI, mountyd, CLI). The lock is
+    # taken on fstab itself so nothing is left behind in /etc; since fstab
+    # is replaced rather than rewritten, a lock won on a file that has been
+    # replaced meanwhile guards nothing and is taken again on the new one.
+    while True:
+        fd = os.open(fstab_path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            locked, current = os.fstat(fd), os.stat(fstab_path)
+        except BaseException:
+            os.close(fd)
+            raise
+        if (locked.st_dev, locked.st_ino) == (current.st_dev, current.st_ino):
+            break
+        os.close(fd)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def _replace_fstab(fstab_path: str, content: str) -> None:
+    # Write a sibling file and rename it over fstab so a crash can never
+    # leave a truncated fstab behind. Callers hold _fstab_lock.
+    import tempfile
+    st = os.stat(fstab_path)
+    directory, name = os.path.split(fstab_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.mounty-")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fchmod(f.fileno(), st.st_mode & 0o7777)
+            if os.geteuid() == 0:
+                os.fchown(f.fileno(), st.st_uid, st.st_gid)
+            os.fsync(f.fileno())
+        os.replace(tmp_path, fstab_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _check_fstab_line(line) -> str:
+    if (not isinstance(line, str) or "\n" in line or "\0" in line
+            or line.strip() in (FSTAB_START_MARKER, FSTAB_END_MARKER)):
+        raise HelperError(f"Invalid fstab entry: {line!r}")
+    return line
+
+
+def _op_update_fstab(op: dict, fstab_path: str) -> dict:
+    # Replays a FstabTransaction's changes on the current fstab rather than
+    # writing the caller's copy of the block, which may be stale by now
+    changes = op.get("changes")
+    if not isinstance(changes, list):
+        raise HelperError("Invalid fstab changes")
+    for change in changes:
+        if not isinstance(change, dict):
+            raise HelperError(f"Invalid fstab change: {change!r}")
+        if "add" in change:
+            entry = FstabEntry.parse(_check_fstab_line(change["add"]))
+            if entry is None:
+                raise HelperError(f"Invalid fstab entry: {change['add']!r}")
+            # Only checked as written: resolving would stat the mount
+            # point, which blocks on a dead CIFS mount
+            _check_mount_point(entry.mount_point)
+        elif isinstance(change.get("remove"), dict):
+            _check_path(change["remove"].get("mount_point"))
+        else:
+            raise HelperError(f"Invalid fstab change: {change!r}")
+
+    with _fstab_lock(fstab_path):
+        with open(fstab_path, 'r') as f:
+            content = f.read()
+        transaction = Fstab.parse(content).transaction()
+        for change in changes:
+            if "add" in change:
+                transaction.add(FstabEntry.parse(change["add"]))
+            else:
+                transaction.remove(change["remove"]["mount_point"])
+        if transaction.changed:
+            _replace_fstab(fstab_path, splice_block(content, transaction.block_lines()))
+    return {"ok": True, "error": ""}
+
+
+OPERATIONS = {
+    "mkdir": _op_mkdir,
+    "mount": _op_mount,
+    "umount": _op_umount,
+    "update_fstab": _op_update_fstab,
+    "activate": _op_activate,
+    "systemd_reload": _op_systemd_reload,
+    "start_automount": _op_start_automount,
+    "stop_automount": _op_stop_automount,
+}
+
+
+def handle_ops(ops: list, fstab_path: str) -> list[dict]:
+    results = []
+    for op in ops:
+        handler = OPERATIONS.get(op.get("op")) if isinstance(op, dict) else None
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise HelperError(f"Unknown operation: {op!r}")
+            result = handler(op, fstab_path)
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        # Lets the caller tell time spent in the kernel from time spent
+        # waiting for authorization
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        results.append(result)
+        if not result["ok"] and op.get("check", True):
+            break
+    return results
+
+
+def serve(stdin, stdout, fstab_path: str = DEFAULT_FSTAB_PATH) -> None:
+    write_lock = threading.Lock()
+
+    def reply(message: dict) -> None:
+        with write_lock:
+            stdout.write(json.dumps(message) + "\n")
+            stdout.flush()
+
+    def handle(request: dict) -> None:
+        results = handle_ops(request.get("ops", []), fstab_path)
+        reply({"id": request.get("id"), "results": results})
+
+    reply({"ready": True})
+    threads = []
+    for line in stdin:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        thread = threading.Thread(target=handle, args=(request,))
+        thread.daemon = True
+        thread.start()
+        threads = [t for t in threads if t.is_alive()] + [thread]
+
+    # Session closed: finish whatever is still in flight before exiting
+    for thread in threads:
+        thread.join()
+
+
+class PrivilegedHelper:
+    # Client side: starts the helper once and multiplexes requests from any
+    # thread over its pipes.
+    def __init__(self, command: list[str]):
+        self.command = command
+        self._process = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: dict[int, dict] = {}
+        self._next_id = 1
+
+    def _start(self) -> subprocess.Popen:
+        # The span covers the polkit dialog as well as starting the helper
+        with tracing.span(os.path.basename(self.command[0]), " ".join(self.command)) as span:
+            process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1
+            )
+            line = process.stdout.readline()
+            try:
+                ready = json.loads(line).get("ready")
+            except (json.JSONDecodeError, AttributeError):
+                ready = False
+            if not ready:
+                span.fail("Authorization failed", process.wait())
+                raise HelperError("Authorization failed or was cancelled")
+
+        reader = threading.Thread(target=self._read_responses, args=(process,))
+        reader.daemon = True
+        reader.start()
+        return process
+
+    def _read_responses(self, process: subprocess.Popen) -> None:
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                waiter = self._pending.pop(response.get("id"), None)
+            if waiter:
+                waiter["results"] = response.get("results", [])
+                waiter["event"].set()
+
+        # Helper exited: fail everything still waiting
+        with self._lock:
+            if self._process is process:
+                self._process = None
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter["event"].set()
+
+    def run(self, ops: list[dict]) -> list[dict]:
+        waiter = {"event": threading.Event(), "results": None}
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._process = self._start()
+            process = self._process
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = waiter
+
+        try:
+            with self._write_lock:
+                process.stdin.write(json.dumps({"id": request_id, "ops": ops}) + "\n")
+                process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise HelperError(f"Privileged helper is not running: {e}")
+
+        waiter["event"].wait()
+        if waiter["results"] is None:
+            raise HelperError("Privileged helper exited unexpectedly")
+        self._trace(ops, waiter["results"])
+        return waiter["results"]
+
+    @staticmethod
+    def _trace(ops: list[dict], results: list[dict]) -> None:
+        # One span per operation, timed by the helper itself. Operations ran
+        # back to back, so their start times are worked out from the end.
+        start = time.time() - sum(r.get("duration_ms", 0.0) for r in results) / 1000
+        for op, result in zip(ops, results):
+            targets = op.get("targets") or []
+            span = tracing.Span(
+                op=op.get("op", ""),
+                command=" ".join([str(op[k]) for k in ("source", "target", "path") if k in op] + targets),
+                share_id=tracing.current_share_id(),
+                start=start,
+                duration_ms=result.get("duration_ms", 0.0),
+                exit_code=result.get("exit_code"),
+            )
+            if not result["ok"]:
+                span.fail(result["error"], result.get("exit_code"))
+            tracing.tracer.record(span)
+            start += span.duration_ms / 1000
+
+    def close(self) -> None:
+        with self._lock:
+            process, self._process = self._process, None
+        if process:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+
+
+def main(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    fstab_path = DEFAULT_FSTAB_PATH
+    if len(argv) == 2 and argv[0] == "--fstab":
+        # Only honoured for stand-ins; when elevated through pkexec the
+        # caller must never be able to point the helper at arbitrary files
+        if "PKEXEC_UID" in os.environ and argv[1] != DEFAULT_FSTAB_PATH:
+            print("--fstab is not allowed under pkexec", file=sys.stderr)
+            return 2
+        fstab_path = argv[1]
+    elif argv:
+        print("Usage: privileged_helper.py [--fstab PATH]", file=sys.stderr)
+        return 2
+
+    serve(sys.stdin, sys.stdout, fstab_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
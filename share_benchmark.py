@@ -0,0 +1,194 @@
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from job_scheduler import JobCancelled, current_job
+
+SCRATCH_PREFIX = ".mounty-benchmark-"
+MB = 1024 * 1024
+
+
+@dataclass
+class BenchmarkSettings:
+    file_size_mb: int = 64
+    block_size_kb: int = 1024
+    small_files: int = 200
+    small_file_size: int = 4096
+    workers: int = 8
+    listing_runs: int = 5
+
+
+@dataclass
+class BenchmarkResult:
+    # Throughput in MB/s, operation rates in files per second, latencies
+    # in milliseconds
+    started: float = 0.0
+    duration_s: float = 0.0
+    profile: str = ""
+    options: str = ""
+    settings: dict = field(default_factory=dict)
+    write_mb_s: float = 0.0
+    read_mb_s: float = 0.0
+    create_per_s: float = 0.0
+    create_p95_ms: float = 0.0
+    stat_per_s: float = 0.0
+    stat_p95_ms: float = 0.0
+    delete_per_s: float = 0.0
+    delete_p95_ms: float = 0.0
+    list_p50_ms: float = 0.0
+    list_p95_ms: float = 0.0
+
+
+# Phases and their share of the progress bar
+PHASES = (
+    ("write", 0.3),
+    ("read", 0.3),
+    ("create", 0.15),
+    ("list", 0.05),
+    ("stat", 0.1),
+    ("delete", 0.1),
+)
+
+
+def _p95(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(round(0.95 * (len(ordered) - 1))), len(ordered) - 1)] if ordered else 0.0
+
+
+class _Run:
+    # One benchmark in a scratch directory below root. Checks the calling
+    # job's cancel flag between blocks and files.
+    def __init__(self, root: str, settings: BenchmarkSettings,
+                 progress_callback: Optional[Callable[[str, float], None]]):
+        self.root = root
+        self.settings = settings
+        self.progress_callback = progress_callback
+        self.job = current_job()
+        self.scratch = os.path.join(root, f"{SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}")
+        self.small_dir = os.path.join(self.scratch, "files")
+        self.done = 0.0
+
+    def check(self) -> None:
+        if self.job is not None and self.job.cancelled:
+            raise JobCancelled()
+
+    def progress(self, phase: str, fraction: float) -> None:
+        if self.progress_callback:
+            weight = dict(PHASES)[phase]
+            self.progress_callback(phase, min(self.done + weight * fraction, 1.0))
+
+    def finish_phase(self, phase: str) -> None:
+        self.done += dict(PHASES)[phase]
+
+    def run(self) -> BenchmarkResult:
+        result = BenchmarkResult(started=time.time())
+        started = time.perf_counter()
+        os.mkdir(self.scratch)
+        try:
+            os.mkdir(self.small_dir)
+            result.write_mb_s = self.sequential_write()
+            result.read_mb_s = self.sequential_read()
+            result.create_per_s, result.create_p95_ms = self.small_files("create", self._create)
+            result.list_p50_ms, result.list_p95_ms = self.listing()
+            result.stat_per_s, result.stat_p95_ms = self.small_files("stat", os.stat)
+            result.delete_per_s, result.delete_p95_ms = self.small_files("delete", os.unlink)
+        finally:
+            shutil.rmtree(self.scratch, ignore_errors=True)
+        result.duration_s = round(time.perf_counter() - started, 3)
+        return result
+
+    def sequential_write(self) -> float:
+        block = os.urandom(self.settings.block_size_kb * 1024)
+        blocks = max(self.settings.file_size_mb * MB // len(block), 1)
+        path = os.path.join(self.scratch, "sequential")
+        started = time.perf_counter()
+        with open(path, 'wb', buffering=0) as f:
+            for i in range(blocks):
+                self.check()
+                f.write(block)
+                self.progress("write", (i + 1) / blocks)
+            # Until the data reaches the server it has not been written
+            os.fsync(f.fileno())
+        elapsed = time.perf_counter() - started
+        self.finish_phase("write")
+        return round(blocks * len(block) / MB / elapsed, 2)
+
+    def sequential_read(self) -> float:
+        path = os.path.join(self.scratch, "sequential")
+        block_size = self.settings.block_size_kb * 1024
+        size = os.path.getsize(path)
+        total = 0
+        with open(path, 'rb', buffering=0) as f:
+            # Read from the server rather than from what the write left in
+            # the page cache; cache=loose may still answer some of it locally
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            started = time.perf_counter()
+            while chunk := f.read(block_size):
+                self.check()
+                total += len(chunk)
+                self.progress("read", total / size)
+            elapsed = time.perf_counter() - started
+        self.finish_phase("read")
+        return round(total / MB / elapsed, 2)
+
+    def _create(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(b"\0" * self.settings.small_file_size)
+
+    def small_files(self, phase: str, action: Callable[[str], None]) -> tuple[float, float]:
+        # Runs action on every small file from a pool of workers; returns
+        # files per second and the p95 latency of a single call
+        count = self.settings.small_files
+        paths = [os.path.join(self.small_dir, f"f{i:05d}") for i in range(count)]
+        latencies = []
+        finished = 0
+
+        def timed(path: str) -> float:
+            self.check()
+            started = time.perf_counter()
+            action(path)
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.settings.workers) as executor:
+            futures = [executor.submit(timed, path) for path in paths]
+            try:
+                for future in futures:
+                    latencies.append(future.result())
+                    finished += 1
+                    self.progress(phase, finished / count)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        elapsed = time.perf_counter() - started
+        self.finish_phase(phase)
+        return round(count / elapsed, 1), round(_p95(latencies), 2)
+
+    def listing(self) -> tuple[float, float]:
+        # Listing plus the per-entry attributes a file manager asks for
+        runs = max(self.settings.listing_runs, 1)
+        samples = []
+        for i in range(runs):
+            self.check()
+            started = time.perf_counter()
+            with os.scandir(self.small_dir) as entries:
+                for entry in entries:
+                    entry.stat()
+            samples.append((time.perf_counter() - started) * 1000)
+            self.progress("list", (i + 1) / runs)
+        self.finish_phase("list")
+        return round(sorted(samples)[len(samples) // 2], 2), round(_p95(samples), 2)
+
+
+def run_benchmark(root: str, settings: Optional[BenchmarkSettings] = None,
+                  progress_callback: Optional[Callable[[str, float], None]] = None) -> BenchmarkResult:
+    # Measures the filesystem below root, which need not be a mount: any
+    # local directory works. progress_callback(phase, fraction) is called
+    # from the running thread. Everything is created in a scratch
+    # directory that is removed again, also when the job is cancelled.
+    return _Run(root, settings or BenchmarkSettings(), progress_callback).run()
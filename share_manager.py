@@ -1,17 +1,35 @@
+import hashlib
 import json
 import os
-import subprocess
 import re
+import subprocess
+import sys
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from enum import Enum
 
+import tracing
+from fstab import FSTAB_END_MARKER, FSTAB_START_MARKER, Fstab, FstabEntry
+from job_scheduler import iter_lines_cancellable, run_cancellable
+from mount_options import OPTIONS, MountOptionError, format_options, resolve
+from mount_table import MOUNTINFO_PATH, MountEntry, MountTable, normalize_mount_point, normalize_unc
+from mount_topology import MountTree
+from privileged_helper import DEFAULT_FSTAB_PATH, HELPER_PATH, HelperError, PrivilegedHelper
+from smb_probe import SMB_PORT, ProbeResult, probe
+from share_store import ShareStore
+from smb_session import SmbSessionError, SmbSessionPool, auth_file
+from ttl_cache import TTLCache
+
+if TYPE_CHECKING:
+    from share_benchmark import BenchmarkResult, BenchmarkSettings
+
 
 class ShareStatus(Enum):
     DISCONNECTED = "disconnected"
     CONNECTED = "connected"
     MOUNTED = "mounted"
+    MISMATCHED = "mismatched"
     ERROR = "error"
 
 
@@ -24,6 +42,12 @@ class Share:
     password: str
     mount_point: str
     automounted: bool = False
+    # Highest SMB dialect the server offered when last probed, used to pin vers=
+    smb_dialect: str = ""
+    # Performance profile (see mount_options.PROFILES) and per-option
+    # overrides on top of it
+    profile: str = "default"
+    mount_options: dict = field(default_factory=dict)
     
     @property
     def unc_path(self) -> str:
@@ -34,55 +58,177 @@ class Share:
         return f"{self.unc_path} → {self.mount_point}"
 
 
+@dataclass
+class AutomountSettings:
+    # "fstab" mounts every automount share at boot (and right away);
+    # "systemd" arms an x-systemd.automount unit instead, so a share is
+    # mounted on first access and released after idle_timeout seconds
+    backend: str = "fstab"
+    idle_timeout: int = 60
+    mount_timeout: int = 30
+    device_timeout: int = 10
+
+
+AUTOMOUNT_BACKENDS = ("fstab", "systemd")
+SYSTEMD_AUTOMOUNT_OPTION = "x-systemd.automount"
+
+
 class ShareManager:
-    FSTAB_PATH = "/etc/fstab"
-    FSTAB_START_MARKER = "### Mounty-Start"
-    FSTAB_END_MARKER = "### Mounty-End"
+    FSTAB_PATH = DEFAULT_FSTAB_PATH
+    FSTAB_START_MARKER = FSTAB_START_MARKER
+    FSTAB_END_MARKER = FSTAB_END_MARKER
+    BULK_MAX_WORKERS = 8
+    AVAHI_BROWSE_COMMAND = ["avahi-browse", "-r", "-t", "_smb._tcp", "-p"]
+    DISCOVERY_TIMEOUT = 10
+    PROBE_TIMEOUT = 2.0
+    SMB_PORT = SMB_PORT
+    SMB_SESSION_IDLE_TIMEOUT = 30
+    SCAN_CACHE_TTL = 300
+    SCAN_CACHE_NEGATIVE_TTL = 30
+    SCAN_CACHE_SIZE = 64
+    # Benchmark results kept per share
+    BENCHMARK_HISTORY = 20
+    # scan_shares errors that mean the host is unreachable rather than the
+    # request being wrong; these are cached for SCAN_CACHE_NEGATIVE_TTL
+    UNREACHABLE_ERRORS = (
+        "Cannot reach server",
+        "Connection refused",
+        "Cannot resolve server",
+        "Connection timed out",
+    )
+    MOUNTINFO_PATH = MOUNTINFO_PATH
+    # Command used to start the privileged helper; stand-ins can replace it
+    # to run the helper unprivileged
+    HELPER_COMMAND: Optional[list[str]] = None
+    
+    PRIVILEGED_ERRORS = {
+        "mkdir": "Failed to create mount point",
+        "mount": "Mount failed",
+        "umount": "Unmount failed",
+        "update_fstab": "Failed to write fstab",
+        "activate": "Failed to mount",
+        "systemd_reload": "Failed to reload systemd",
+        "start_automount": "Failed to start automount",
+        "stop_automount": "Failed to stop automount",
+    }
     
     def __init__(self):
         self.config_dir = Path.home() / ".config" / "mounty"
-        self.shares_file = self.config_dir / "shares.json"
+        self.shares_file = self.config_dir / "shares.db"
+        self.session_file = self.config_dir / "session.json"
         self.credentials_dir = self.config_dir / "credentials"
-        self.shares: list[Share] = []
+        self._by_id: dict[str, Share] = {}
+        self._by_mount_point: dict[str, dict[str, Share]] = {}
+        self._by_server: dict[str, dict[str, Share]] = {}
+        self._mount_snapshot: Optional[MountTable] = None
+        self._store_version = None
+        self._helper = PrivilegedHelper(self._helper_command())
+        self._scan_cache = TTLCache(self.SCAN_CACHE_TTL, self.SCAN_CACHE_SIZE)
+        # sha256 of the credential files this process wrote or checked
+        self._credential_digests: dict[Path, str] = {}
+        self.smb_sessions = SmbSessionPool(self.SMB_SESSION_IDLE_TIMEOUT)
         
         # Ensure directories exist
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.credentials_dir.mkdir(parents=True, exist_ok=True)
         # Secure credentials directory
         os.chmod(self.credentials_dir, 0o700)
+        tracing.tracer.configure(self.config_dir / "trace.jsonl")
         
+        self.store = ShareStore(self.shares_file, legacy_json=self.config_dir / "shares.json")
         self.load_shares()
     
     def load_shares(self) -> None:
-        if self.shares_file.exists():
-            try:
-                with open(self.shares_file, 'r') as f:
-                    data = json.load(f)
-                    self.shares = [Share(**s) for s in data]
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"Error loading shares: {e}")
-                self.shares = []
-        else:
-            self.shares = []
+        # Our own writes keep self.shares current, so only reload when
+        # another process (GUI or CLI) has committed since the last read
+        version = self.store.data_version()
+        if version == self._store_version:
+            return
+        try:
+            with tracing.span("store_load", str(self.shares_file)):
+                shares = [Share(**s) for s in self.store.load()]
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Error loading shares: {e}")
+            shares = []
+        self._by_id = {}
+        self._by_mount_point = {}
+        self._by_server = {}
+        for share in shares:
+            self._index(share)
+        self._store_version = version
+    
+    @property
+    def shares(self) -> list[Share]:
+        return list(self._by_id.values())
+    
+    def _index(self, share: Share) -> None:
+        # _by_id is the source of truth (and keeps the saved order); the
+        # other two map normalized keys to the shares using them
+        old = self._by_id.get(share.id)
+        if old is not None:
+            self._unindex(old)
+        self._by_id[share.id] = share
+        self._by_mount_point.setdefault(normalize_mount_point(share.mount_point), {})[share.id] = share
+        self._by_server.setdefault(share.server.lower(), {})[share.id] = share
+    
+    def _unindex(self, share: Share) -> None:
+        for index, key in ((self._by_mount_point, normalize_mount_point(share.mount_point)),
+                           (self._by_server, share.server.lower())):
+            bucket = index.get(key, {})
+            bucket.pop(share.id, None)
+            if not bucket:
+                index.pop(key, None)
+    
+    def get_share(self, share_id: str) -> Optional[Share]:
+        return self._by_id.get(share_id)
+    
+    def shares_at_mount_point(self, mount_point: str) -> list[Share]:
+        return list(self._by_mount_point.get(normalize_mount_point(mount_point), {}).values())
+    
+    def shares_for_server(self, server: str) -> list[Share]:
+        return list(self._by_server.get(server.lower(), {}).values())
+    
+    def find_credentials(self, server: str) -> tuple[str, str]:
+        # Credentials of the first saved share on this server, for browsing
+        for share in self._by_server.get(server.lower(), {}).values():
+            return share.username, share.password
+        return "", ""
+    
+    def check_mount_conflict(self, mount_point: str, exclude_id: Optional[str] = None) -> tuple[str, str]:
+        # Returns ('ok' | 'warning' | 'error', message) for using mount_point
+        # for a share other than exclude_id
+        others = [s for s in self.shares_at_mount_point(mount_point) if s.id != exclude_id]
+        if not others:
+            return 'ok', ""
+        snapshot = self.get_cached_mount_snapshot()
+        for share in others:
+            if self.is_mounted(share, snapshot):
+                return 'error', f"Mount point already in use and currently mounted ({share.unc_path})"
+        for share in others:
+            if share.automounted:
+                return 'error', f"Mount point has automount enabled ({share.unc_path})"
+        return 'warning', f"Another share uses this mount point ({share.unc_path})"
     
     def save_shares(self) -> None:
-        with open(self.shares_file, 'w') as f:
-            json.dump([asdict(s) for s in self.shares], f, indent=2)
+        self.store.replace_all([asdict(s) for s in self._by_id.values()])
     
     def generate_id(self) -> str:
         import uuid
         return str(uuid.uuid4())[:8]
     
     def add_share(self, share: Share) -> None:
-        self.shares.append(share)
-        self.save_shares()
+        self._index(share)
+        with tracing.span("store_write", str(self.shares_file), share.id):
+            self.store.put([asdict(share)])
     
     def update_share(self, share: Share) -> None:
-        for i, s in enumerate(self.shares):
-            if s.id == share.id:
-                self.shares[i] = share
-                break
-        self.save_shares()
+        self._update_shares([share])
+    
+    def _update_shares(self, shares: list[Share]) -> None:
+        for share in shares:
+            self._index(share)
+        with tracing.span("store_write", str(self.shares_file)):
+            self.store.put([asdict(share) for share in shares])
     
     def remove_share(self, share: Share) -> tuple[bool, str]:
         if share.automounted:
@@ -94,131 +240,150 @@ class ShareManager:
         if cred_file.exists():
             cred_file.unlink()
         
-        self.shares = [s for s in self.shares if s.id != share.id]
-        self.save_shares()
+        stored = self._by_id.pop(share.id, None)
+        if stored is not None:
+            self._unindex(stored)
+        self.store.delete(share.id)
         return True, "Share removed successfully"
     
+    def probe_server(self, server: str) -> ProbeResult:
+        # Covers name resolution, TCP connect and SMB2 negotiation
+        with tracing.span("probe", server) as span:
+            result = probe(server, port=self.SMB_PORT, timeout=self.PROBE_TIMEOUT)
+            if result.error:
+                span.fail(result.error)
+        return result
+    
+    @tracing.for_share
     def test_share(self, share: Share) -> tuple[bool, str]:
-        import tempfile
-        auth_file = None
+        result = self.probe_server(share.server)
+        if not result.reachable:
+            hints = {
+                "Connection refused": "check if server is running",
+                "Connection timed out": "check network",
+            }
+            return False, f"{result.error} - {hints.get(result.error, 'check server address')}"
+        if result.dialect:
+            share.smb_dialect = result.dialect
+        
         try:
-            auth_file = tempfile.NamedTemporaryFile(mode='w', suffix='.auth', delete=False)
-            auth_file.write(f"username={share.username}\n")
-            auth_file.write(f"password={share.password}\n")
-            auth_file.close()
-            os.chmod(auth_file.name, 0o600)
-            
-            cmd = [
-                "smbclient",
-                f"//{share.server}/{share.share_name}",
-                "-A", auth_file.name,
-                "-c", "dir",
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            
-            output = result.stdout + result.stderr
-            
-            if result.returncode == 0:
-                return True, "Connection successful"
+            # Reuses an authenticated smbclient if this share was used recently
+            with self.smb_sessions.session(share.server, share.share_name,
+                                           share.username, share.password) as session:
+                output = session.run("dir")
+                # run() only returns once smbclient is back at its prompt,
+                # so connecting and logging in worked; the listing itself
+                # fails with an NT_STATUS message and smbclient keeps going
+                alive = session.alive
             
-            error_lower = output.lower()
-            if "nt_status_logon_failure" in error_lower:
-                return False, "Authentication failed - check username/password"
-            elif "nt_status_bad_network_name" in error_lower:
-                return False, "Share not found - check share name"
-            elif "nt_status_host_unreachable" in error_lower:
-                return False, "Cannot reach server - check server address"
-            elif "nt_status_connection_refused" in error_lower:
-                return False, "Connection refused - check if server is running"
-            elif "nt_status_access_denied" in error_lower:
-                return False, "Access denied - check permissions"
-            elif "nt_status_" in error_lower:
-                import re
-                match = re.search(r'(NT_STATUS_\w+)', output, re.IGNORECASE)
-                if match:
-                    return False, f"Connection failed: {match.group(1)}"
-            elif "name or service not known" in error_lower or "no route to host" in error_lower:
-                return False, "Cannot resolve server - check server address"
-            elif "connection timed out" in error_lower:
-                return False, "Connection timed out - check network"
-            
-            error_msg = output.strip()[-200:] if output.strip() else f"Exit code: {result.returncode}"
-            return False, f"Connection failed: {error_msg}"
-                
+            if not alive:
+                return False, self._describe_smbclient_error(output)
+            if "nt_status_" in output.lower():
+                return False, self._describe_smbclient_error(output)
+            return True, "Connection successful"
+        
+        except SmbSessionError as e:
+            return False, self._describe_smbclient_error(e.output, e.returncode)
         except subprocess.TimeoutExpired:
             return False, "Connection timed out (15s)"
         except FileNotFoundError:
             return False, "smbclient not installed. Install with: sudo apt install smbclient"
         except Exception as e:
             return False, f"Error: {str(e)}"
-        finally:
-            if auth_file and os.path.exists(auth_file.name):
-                os.unlink(auth_file.name)
     
-    def discover_servers(self) -> tuple[bool, list[dict] | str]:
+    def _describe_smbclient_error(self, output: str, returncode: Optional[int] = None) -> str:
+        error_lower = output.lower()
+        if "nt_status_logon_failure" in error_lower:
+            return "Authentication failed - check username/password"
+        elif "nt_status_bad_network_name" in error_lower:
+            return "Share not found - check share name"
+        elif "nt_status_host_unreachable" in error_lower:
+            return "Cannot reach server - check server address"
+        elif "nt_status_connection_refused" in error_lower:
+            return "Connection refused - check if server is running"
+        elif "nt_status_access_denied" in error_lower:
+            return "Access denied - check permissions"
+        elif "nt_status_" in error_lower:
+            match = re.search(r'(NT_STATUS_\w+)', output, re.IGNORECASE)
+            if match:
+                return f"Connection failed: {match.group(1)}"
+        elif "name or service not known" in error_lower or "no route to host" in error_lower:
+            return "Cannot resolve server - check server address"
+        elif "connection timed out" in error_lower:
+            return "Connection timed out - check network"
+        
+        error_msg = output.strip()[-200:] if output.strip() else f"Exit code: {returncode}"
+        return f"Connection failed: {error_msg}"
+    
+    def discover_servers(self, server_callback=None) -> tuple[bool, list[dict] | str]:
+        # server_callback(event, info) is called as soon as each server
+        # resolves; event is "added", or "updated" when an IPv4 address
+        # replaces an IPv6 one reported earlier (info["previous_address"])
+        from discovery import ServerDeduper, parse_avahi_line
+        deduper = ServerDeduper()
         try:
-            result = subprocess.run(
-                ["avahi-browse", "-r", "-t", "_smb._tcp", "-p"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            servers = {}
-            for line in result.stdout.splitlines():
-                if not line.startswith("="):
-                    continue
-                parts = line.split(";")
-                if len(parts) < 9:
-                    continue
-                name = parts[3]
-                hostname = parts[6]
-                address = parts[7]
-                if address and address not in servers:
-                    servers[address] = {
-                        "name": name,
-                        "hostname": hostname,
-                        "address": address
-                    }
+            try:
+                for line in iter_lines_cancellable(self.AVAHI_BROWSE_COMMAND, timeout=self.DISCOVERY_TIMEOUT):
+                    info = parse_avahi_line(line)
+                    if info is None:
+                        continue
+                    change = deduper.add(info)
+                    if change and server_callback:
+                        server_callback(*change)
+            except subprocess.TimeoutExpired:
+                if not deduper.servers:
+                    return False, "Server discovery timed out"
 
-            if not servers:
+            if not deduper.servers:
                 return False, "No SMB servers found on the network"
 
-            return True, list(servers.values())
+            return True, deduper.results()
 
-        except subprocess.TimeoutExpired:
-            return False, "Server discovery timed out"
         except FileNotFoundError:
             return False, "avahi-browse not installed. Install with: sudo apt install avahi-utils"
         except Exception as e:
             return False, f"Discovery error: {str(e)}"
 
-    def scan_shares(self, server: str, username: str = "", password: str = "") -> tuple[bool, list[dict] | str]:
-        import tempfile
-        auth_file = None
+    def scan_shares(self, server: str, username: str = "", password: str = "",
+                    use_cache: bool = True) -> tuple[bool, list[dict] | str]:
+        key = (server.lower(), username)
+        # The password is not part of the key, but a cached listing must not
+        # be handed out for a different password
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        
+        if use_cache:
+            cached = self._scan_cache.get(key)
+            if cached and cached[0] == digest:
+                return cached[1]
+        
+        result = self._scan_shares(server, username, password)
+        
+        success, value = result
+        if success:
+            self._scan_cache.set(key, (digest, result))
+        elif value in self.UNREACHABLE_ERRORS:
+            self._scan_cache.set(key, (digest, result), ttl=self.SCAN_CACHE_NEGATIVE_TTL)
+        return result
+    
+    def invalidate_scan_cache(self, server: Optional[str] = None) -> None:
+        if server is None:
+            self._scan_cache.invalidate()
+        else:
+            self._scan_cache.invalidate(lambda key: key[0] == server.lower())
+    
+    def _scan_shares(self, server: str, username: str, password: str) -> tuple[bool, list[dict] | str]:
+        result = self.probe_server(server)
+        if not result.reachable:
+            return False, result.error
+        
         try:
             if username:
-                auth_file = tempfile.NamedTemporaryFile(mode='w', suffix='.auth', delete=False)
-                auth_file.write(f"username={username}\n")
-                auth_file.write(f"password={password}\n")
-                auth_file.close()
-                os.chmod(auth_file.name, 0o600)
-                cmd = ["smbclient", "-L", f"//{server}", "-A", auth_file.name, "-g"]
+                with auth_file(username, password) as (path, fd):
+                    cmd = ["smbclient", "-L", f"//{server}", "-A", path, "-g"]
+                    result = run_cancellable(cmd, timeout=15, pass_fds=(fd,))
             else:
                 cmd = ["smbclient", "-L", f"//{server}", "-N", "-g"]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
+                result = run_cancellable(cmd, timeout=15)
 
             output = result.stdout + result.stderr
 
@@ -263,218 +428,491 @@ class ShareManager:
             return False, "smbclient not installed"
         except Exception as e:
             return False, f"Error: {str(e)}"
-        finally:
-            if auth_file and os.path.exists(auth_file.name):
-                os.unlink(auth_file.name)
 
-    def is_mounted(self, share: Share) -> bool:
+    def scan_servers(self, servers: list[str], username: str = "", password: str = "",
+                     progress_callback=None, max_workers: Optional[int] = None) -> dict[str, tuple[bool, list[dict] | str]]:
+        # Results are reported through progress_callback as each server answers
+        return self._run_bulk(
+            lambda server: self.scan_shares(server, username, password),
+            servers, progress_callback, max_workers, key=lambda server: server
+        )
+    
+    def get_mount_snapshot(self) -> MountTable:
+        with tracing.span("read_mountinfo", self.MOUNTINFO_PATH):
+            self._mount_snapshot = MountTable.read(self.MOUNTINFO_PATH)
+        return self._mount_snapshot
+    
+    def get_cached_mount_snapshot(self) -> MountTable:
+        # Last table read or pushed by a MountWatcher; cheap enough to call
+        # on every keystroke
+        if self._mount_snapshot is None:
+            return self.get_mount_snapshot()
+        return self._mount_snapshot
+    
+    def set_mount_snapshot(self, snapshot: MountTable) -> None:
+        self._mount_snapshot = snapshot
+
+    def get_mount_entry(self, share: Share, snapshot: Optional[MountTable] = None) -> Optional[MountEntry]:
+        if snapshot is None:
+            snapshot = self.get_mount_snapshot()
+        return snapshot.get(share.mount_point)
+
+    def get_share_status(self, share: Share, snapshot: Optional[MountTable] = None) -> ShareStatus:
+        entry = self.get_mount_entry(share, snapshot)
+        if entry is None:
+            return ShareStatus.DISCONNECTED
+        if normalize_unc(entry.source) != normalize_unc(share.unc_path):
+            return ShareStatus.MISMATCHED
+        return ShareStatus.MOUNTED
+
+    def is_mounted(self, share: Share, snapshot: Optional[MountTable] = None) -> bool:
+        return self.get_mount_entry(share, snapshot) is not None
+    
+    def is_automount_armed(self, share: Share, snapshot: Optional[MountTable] = None) -> bool:
+        # A systemd automount point is waiting (or mounted) at the share's path
+        if snapshot is None:
+            snapshot = self.get_mount_snapshot()
+        return snapshot.is_armed(share.mount_point)
+    
+    def _helper_command(self) -> list[str]:
+        if self.HELPER_COMMAND:
+            return list(self.HELPER_COMMAND)
+        cmd = ["pkexec", sys.executable, HELPER_PATH]
+        if self.FSTAB_PATH != DEFAULT_FSTAB_PATH:
+            cmd += ["--fstab", self.FSTAB_PATH]
+        return cmd
+    
+    def run_privileged(self, ops: list[dict]) -> tuple[bool, str]:
+        # All privileged steps of an action go to the helper as one batch so
+        # the whole action costs a single authorization
         try:
-            result = subprocess.run(
-                ["findmnt", "-n", share.mount_point],
-                capture_output=True,
-                text=True
-            )
-            return result.returncode == 0
-        except Exception:
-            return False
+            results = self._helper.run(ops)
+        except HelperError as e:
+            return False, str(e)
+        
+        for op, result in zip(ops, results):
+            if not result["ok"] and op.get("check", True):
+                return False, f"{self.PRIVILEGED_ERRORS[op['op']]}: {result['error']}"
+        return True, ""
+    
+    def close(self) -> None:
+        self.smb_sessions.close_all()
+        self._helper.close()
+        self.store.close()
+    
+    def _refresh_dialect(self, share: Share) -> ProbeResult:
+        # The probe is only a hint for mounting: a NAS still waking up or a
+        # server on port 139 alone fails it and may mount fine anyway, with
+        # the dialect seen last time
+        result = self.probe_server(share.server)
+        if result.dialect and result.dialect != share.smb_dialect:
+            share.smb_dialect = result.dialect
+            if share.id in self._by_id:
+                self.update_share(share)
+        return result
+    
+    @staticmethod
+    def _with_probe_hint(message: str, probe_result: ProbeResult) -> str:
+        if probe_result.reachable:
+            return message
+        return f"{message} (server probe: {probe_result.error})"
+    
+    def validate_mount_options(self, share: Share) -> Optional[str]:
+        # Returns an error message when the share's profile or overrides
+        # would produce options mount would reject
+        try:
+            resolve(share.profile, share.mount_options, share.smb_dialect)
+        except MountOptionError as e:
+            return str(e)
+        return None
+    
+    def _mount_options(self, share: Share, cred_file: Path) -> str:
+        # Raises MountOptionError; callers validate before anything privileged
+        options = f"credentials={cred_file},uid={os.getuid()},gid={os.getgid()}"
+        tuning = format_options(resolve(share.profile, share.mount_options, share.smb_dialect))
+        if tuning:
+            options += f",{tuning}"
+        return options
     
+    @tracing.for_share
     def mount_share(self, share: Share) -> tuple[bool, str]:
-        mount_point = Path(share.mount_point)
+        probe_result = self._refresh_dialect(share)
+        error = self.validate_mount_options(share)
+        if error:
+            return False, f"Mount failed: {error}"
         
-        if not mount_point.exists():
-            try:
-                subprocess.run(
-                    ["pkexec", "mkdir", "-p", str(mount_point)],
-                    check=True
-                )
-            except subprocess.CalledProcessError as e:
-                return False, f"Failed to create mount point: {e}"
+        success, message = self.run_privileged(self._mount_ops(share))
         
+        if success:
+            return True, "Mounted successfully"
+        return False, self._with_probe_hint(message, probe_result)
+    
+    def _mount_ops(self, share: Share) -> list[dict]:
         cred_file = self.credentials_dir / f"{share.id}.cred"
+        options = self._mount_options(share, cred_file)
         self._write_credentials_file(share, cred_file)
+        return [
+            {"op": "mkdir", "path": share.mount_point},
+            {
+                "op": "mount",
+                "source": share.unc_path,
+                "target": share.mount_point,
+                "options": options,
+            },
+        ]
+    
+    @tracing.for_share
+    def remount_share(self, share: Share) -> tuple[bool, str]:
+        # Recovers a stale or hung mount. The old mount is detached lazily,
+        # which returns at once even when the server is gone, and the share
+        # is mounted again in the same batch.
+        probe_result = self._refresh_dialect(share)
+        error = self.validate_mount_options(share)
+        if error:
+            return False, f"Reconnect failed: {error}"
         
-        try:
-            uid = os.getuid()
-            gid = os.getgid()
-            cmd = [
-                "pkexec", "mount", "-t", "cifs",
-                share.unc_path,
-                str(mount_point),
-                "-o", f"credentials={cred_file},uid={uid},gid={gid}"
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                return True, "Mounted successfully"
-            else:
-                return False, f"Mount failed: {result.stderr.strip()}"
-                
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+        success, message = self.run_privileged(
+            [{"op": "umount", "target": share.mount_point, "lazy": True, "check": False}]
+            + self._mount_ops(share)
+        )
+        
+        if success:
+            return True, "Reconnected successfully"
+        return False, self._with_probe_hint(message, probe_result)
     
-    def unmount_share(self, share: Share) -> tuple[bool, str]:
-        try:
-            result = subprocess.run(
-                ["pkexec", "umount", share.mount_point],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                return True, "Unmounted successfully"
-            else:
-                return False, f"Unmount failed: {result.stderr.strip()}"
-                
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+    @tracing.for_share
+    def benchmark_share(self, share: Share, settings: Optional["BenchmarkSettings"] = None,
+                        progress_callback=None) -> tuple[bool, "BenchmarkResult | str"]:
+        # Runs share_benchmark in a scratch directory on the mounted share
+        # and stores the result with the options it was mounted with, so
+        # profiles can be compared. Cancellable through the calling job.
+        snapshot = self.get_mount_snapshot()
+        if self.get_share_status(share, snapshot) != ShareStatus.MOUNTED:
+            return False, "Share is not mounted"
+        from share_benchmark import BenchmarkSettings, run_benchmark
+        entry = self.get_mount_entry(share, snapshot)
+        settings = settings or BenchmarkSettings()
+        with tracing.span("benchmark", share.mount_point) as span:
+            try:
+                result = run_benchmark(share.mount_point, settings, progress_callback)
+            except OSError as e:
+                span.fail(str(e))
+                return False, f"Benchmark failed: {e.strerror or e}"
+        result.profile = share.profile
+        result.settings = asdict(settings)
+        # What the kernel actually uses, which may differ from the profile
+        # if it changed since the share was mounted
+        result.options = ",".join(
+            option for option in entry.super_options.split(",") if option.partition("=")[0] in OPTIONS
+        )
+        self.store.add_benchmark(share.id, asdict(result), self.BENCHMARK_HISTORY)
+        return True, result
     
-    def _write_credentials_file(self, share: Share, path: Path) -> None:
-        with open(path, 'w') as f:
-            f.write(f"username={share.username}\n")
-            f.write(f"password={share.password}\n")
-        os.chmod(path, 0o600)
+    def get_benchmarks(self, share: Share) -> list["BenchmarkResult"]:
+        from share_benchmark import BenchmarkResult
+        return [BenchmarkResult(**data) for data in self.store.benchmarks(share.id)]
     
-    def add_to_fstab(self, share: Share) -> tuple[bool, str]:
-        cred_file = self.credentials_dir / f"{share.id}.cred"
-        self._write_credentials_file(share, cred_file)
+    @tracing.for_share
+    def unmount_share(self, share: Share) -> tuple[bool, str]:
+        success, message = self.run_privileged([{"op": "umount", "target": share.mount_point}])
         
-        mount_point = Path(share.mount_point)
-        if not mount_point.exists():
-            try:
-                subprocess.run(
-                    ["pkexec", "mkdir", "-p", str(mount_point)],
-                    check=True
-                )
-            except subprocess.CalledProcessError as e:
-                return False, f"Failed to create mount point: {e}"
+        if success:
+            return True, "Unmounted successfully"
+        return False, message
+    
+    def _run_bulk(self, action, items: list, progress_callback=None,
+                  max_workers: Optional[int] = None, key=lambda share: share.id) -> dict:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
         
-        uid = os.getuid()
-        gid = os.getgid()
-        fstab_entry = (
-            f"{share.unc_path} {share.mount_point} cifs "
-            f"credentials={cred_file},uid={uid},gid={gid},_netdev,nofail 0 0"
-        )
+        results = {}
+        if not items:
+            return results
+        
+        workers = min(max_workers or self.BULK_MAX_WORKERS, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(action, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = (False, f"Error: {str(e)}")
+                results[key(item)] = result
+                if progress_callback:
+                    progress_callback(len(results), len(items), item, result)
         
+        return results
+    
+    def _run_nested(self, action, shares: list[Share], progress_callback=None,
+                    max_workers: Optional[int] = None, children_first: bool = False) -> dict:
+        # Like _run_bulk, but a share whose mount point lies inside another
+        # share's waits for that one: its mount point must be created on the
+        # mounted parent, not in the directory underneath it
+        results = {}
+        
+        def record(share: Share, result: tuple[bool, str]) -> None:
+            results[share.id] = result
+            if progress_callback:
+                progress_callback(len(results), len(shares), share, result)
+        
+        MountTree(shares).run(action, max_workers or self.BULK_MAX_WORKERS, record, children_first)
+        return results
+    
+    def mount_shares(self, shares: list[Share], progress_callback=None,
+                     max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        # A mount point taken by another source (MISMATCHED) is left alone
+        snapshot = self.get_mount_snapshot()
+        pending = [s for s in shares if self.get_share_status(s, snapshot) == ShareStatus.DISCONNECTED]
+        return self._run_nested(self.mount_share, pending, progress_callback, max_workers)
+    
+    def unmount_shares(self, shares: list[Share], progress_callback=None,
+                       max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        # Never unmounts something else that sits at a share's mount point
+        snapshot = self.get_mount_snapshot()
+        pending = [s for s in shares if self.get_share_status(s, snapshot) == ShareStatus.MOUNTED]
+        return self._run_nested(self.unmount_share, pending, progress_callback, max_workers,
+                                children_first=True)
+    
+    def test_shares(self, shares: list[Share], progress_callback=None,
+                    max_workers: Optional[int] = None) -> dict[str, tuple[bool, str]]:
+        return self._run_bulk(self.test_share, shares, progress_callback, max_workers)
+    
+    def mount_all(self, progress_callback=None) -> dict[str, tuple[bool, str]]:
+        return self.mount_shares(self.shares, progress_callback)
+    
+    def unmount_all(self, progress_callback=None) -> dict[str, tuple[bool, str]]:
+        return self.unmount_shares(self.shares, progress_callback)
+    
+    def load_session(self) -> dict:
+        session = {"restore_on_launch": False, "auto_recover": False, "mounted": []}
+        if self.session_file.exists():
+            try:
+                with open(self.session_file, 'r') as f:
+                    session.update(json.load(f))
+            except (json.JSONDecodeError, TypeError) as e:
+                print(f"Error loading session: {e}")
+        return session
+    
+    def save_session(self, session: dict) -> None:
+        with open(self.session_file, 'w') as f:
+            json.dump(session, f, indent=2)
+    
+    def set_restore_on_launch(self, enabled: bool) -> None:
+        session = self.load_session()
+        session["restore_on_launch"] = enabled
+        self.save_session(session)
+    
+    def set_auto_recover(self, enabled: bool) -> None:
+        session = self.load_session()
+        session["auto_recover"] = enabled
+        self.save_session(session)
+    
+    def remember_mounted_shares(self) -> None:
+        snapshot = self.get_mount_snapshot()
+        session = self.load_session()
+        session["mounted"] = [
+            s.id for s in self.shares
+            if self.get_share_status(s, snapshot) == ShareStatus.MOUNTED
+        ]
+        self.save_session(session)
+    
+    def get_session_shares(self) -> list[Share]:
+        session = self.load_session()
+        if not session["restore_on_launch"]:
+            return []
+        # Automounted shares are brought up by fstab, not by us
+        return [
+            share for share_id in session["mounted"]
+            if (share := self._by_id.get(share_id)) and not share.automounted
+        ]
+    
+    def restore_session(self, progress_callback=None) -> dict[str, tuple[bool, str]]:
+        return self.mount_shares(self.get_session_shares(), progress_callback)
+    
+    def _write_credentials_file(self, share: Share, path: Path) -> None:
+        # Only written when the content changed: every mount and automount
+        # change ends up here, and the home directory may be slow
+        content = f"username={share.username}\npassword={share.password}\n".encode()
+        digest = hashlib.sha256(content).hexdigest()
+        if self._credential_digests.get(path) == digest and path.exists():
+            return
         try:
-            with open(self.FSTAB_PATH, 'r') as f:
-                content = f.read()
-            
-            # Check if markers exist
-            if self.FSTAB_START_MARKER not in content:
-                # Add markers at the end
-                if not content.endswith('\n'):
-                    content += '\n'
-                content += f"\n{self.FSTAB_START_MARKER}\n{self.FSTAB_END_MARKER}\n"
-            
-            # Insert entry before end marker
-            lines = content.split('\n')
-            new_lines = []
-            for line in lines:
-                if line.strip() == self.FSTAB_END_MARKER:
-                    new_lines.append(fstab_entry)
-                new_lines.append(line)
-            
-            new_content = '\n'.join(new_lines)
-            
-            process = subprocess.Popen(
-                ["pkexec", "tee", self.FSTAB_PATH],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                text=True
+            if hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+                self._credential_digests[path] = digest
+                return
+        except FileNotFoundError:
+            pass
+        with tracing.span("write_credentials", str(path), share.id):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'wb') as f:
+                f.write(content)
+            os.chmod(path, 0o600)
+        self._credential_digests[path] = digest
+    
+    def read_fstab(self) -> Fstab:
+        with tracing.span("read_fstab", self.FSTAB_PATH):
+            return Fstab.read(self.FSTAB_PATH)
+    
+    def load_automount_settings(self) -> AutomountSettings:
+        saved = self.load_session().get("automount") or {}
+        settings = AutomountSettings()
+        for name in asdict(settings):
+            if name in saved:
+                setattr(settings, name, saved[name])
+        if settings.backend not in AUTOMOUNT_BACKENDS:
+            settings.backend = "fstab"
+        return settings
+    
+    def save_automount_settings(self, settings: AutomountSettings) -> None:
+        session = self.load_session()
+        session["automount"] = asdict(settings)
+        self.save_session(session)
+    
+    def apply_automount_settings(self, settings: AutomountSettings) -> tuple[bool, str]:
+        # Saves the settings and rewrites the entries of every automount
+        # share to match, in one privileged batch
+        self.save_automount_settings(settings)
+        shares = [s for s in self.shares if s.automounted]
+        if not shares:
+            return True, "Automount settings saved"
+        success, message = self.set_automount(shares, True)
+        if success:
+            return True, "Automount settings applied"
+        return False, message
+    
+    def _fstab_entry(self, share: Share, cred_file: Path,
+                     settings: Optional[AutomountSettings] = None) -> FstabEntry:
+        settings = settings or self.load_automount_settings()
+        options = f"{self._mount_options(share, cred_file)},_netdev,nofail"
+        if settings.backend == "systemd":
+            # noauto keeps the share itself out of boot; only the automount
+            # point is set up, so boot time does not grow with the share count
+            options += (
+                f",noauto,{SYSTEMD_AUTOMOUNT_OPTION}"
+                f",x-systemd.idle-timeout={int(settings.idle_timeout)}"
+                f",x-systemd.mount-timeout={int(settings.mount_timeout)}"
+                f",x-systemd.device-timeout={int(settings.device_timeout)}"
             )
-            _, stderr = process.communicate(new_content)
-            
-            if process.returncode != 0:
-                return False, f"Failed to write fstab: {stderr}"
-            
-            share.automounted = True
-            self.update_share(share)
-            
-            subprocess.run(["pkexec", "mount", share.mount_point], capture_output=True)
-            
-            return True, "Added to fstab successfully"
-            
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+        return FstabEntry(
+            source=share.unc_path,
+            mount_point=share.mount_point,
+            fs_type="cifs",
+            options=options,
+        )
     
-    def remove_from_fstab(self, share: Share) -> tuple[bool, str]:
+    @staticmethod
+    def _is_systemd_automount(entry: Optional[FstabEntry]) -> bool:
+        return entry is not None and SYSTEMD_AUTOMOUNT_OPTION in entry.options.split(",")
+    
+    def set_automount(self, shares: list[Share], enabled: bool) -> tuple[bool, str]:
+        # Stages every share's change against one parsed fstab and commits
+        # them as a single privileged update plus one activation per level
+        # of nested mount points
+        if enabled:
+            for share in shares:
+                error = self.validate_mount_options(share)
+                if error:
+                    return False, f"{share.unc_path}: {error}"
         try:
-            if self.is_mounted(share):
-                self.unmount_share(share)
-            
-            with open(self.FSTAB_PATH, 'r') as f:
-                lines = f.readlines()
-            
-            new_lines = []
-            in_mounty_section = False
-            for line in lines:
-                stripped = line.strip()
-                
-                if stripped == self.FSTAB_START_MARKER:
-                    in_mounty_section = True
-                    new_lines.append(line)
-                    continue
-                elif stripped == self.FSTAB_END_MARKER:
-                    in_mounty_section = False
-                    new_lines.append(line)
-                    continue
-                
-                # Skip lines matching this share's UNC path in Mounty section
-                if in_mounty_section and share.unc_path in line:
-                    continue
-                
-                new_lines.append(line)
-            
-            new_content = ''.join(new_lines)
-            
-            process = subprocess.Popen(
-                ["pkexec", "tee", self.FSTAB_PATH],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            _, stderr = process.communicate(new_content)
+            fstab = self.read_fstab()
+            transaction = fstab.transaction()
+            snapshot = self.get_mount_snapshot()
+            settings = self.load_automount_settings()
+            ops = []
+            # Automount units of entries that go away or change backend
+            disarm = []
+            mounted = []
             
-            if process.returncode != 0:
-                return False, f"Failed to write fstab: {stderr}"
+            for share in shares:
+                cred_file = self.credentials_dir / f"{share.id}.cred"
+                old_entry = fstab.get(share.mount_point)
+                if enabled:
+                    self._write_credentials_file(share, cred_file)
+                    entry = self._fstab_entry(share, cred_file, settings)
+                    if self._is_systemd_automount(old_entry) and not self._is_systemd_automount(entry):
+                        disarm.append(share.mount_point)
+                    transaction.add(entry)
+                else:
+                    # Entries for the same source left at a mount point that
+                    # no saved share uses any more go too; another share's
+                    # entry for the same source stays
+                    stale = [
+                        e for e in fstab.find_source(share.unc_path)
+                        if e is not old_entry and not self.shares_at_mount_point(e.mount_point)
+                    ]
+                    for entry in [old_entry] + stale:
+                        if self._is_systemd_automount(entry):
+                            disarm.append(entry.mount_point)
+                    if self.get_share_status(share, snapshot) == ShareStatus.MOUNTED:
+                        mounted.append(share)
+                    transaction.remove(share.mount_point)
+                    for entry in stale:
+                        transaction.remove(entry.mount_point)
             
-            # Update share status
-            share.automounted = False
-            self.update_share(share)
+            # Nested mounts come off before the share they are mounted in
+            for level in reversed(MountTree(mounted).levels()):
+                ops.extend({"op": "umount", "target": share.mount_point, "check": False} for share in level)
+            if disarm:
+                # Must stop before the reload below removes the units
+                ops.insert(0, {"op": "stop_automount", "targets": disarm, "check": False})
+            if transaction.changed:
+                # The helper applies the changes to fstab as it is when the
+                # request runs, not to the copy read above
+                ops.append({"op": "update_fstab", "changes": transaction.changes})
+            if disarm or (transaction.changed and settings.backend == "systemd"):
+                ops.append({"op": "systemd_reload"})
+            if enabled:
+                ops.extend(self._activation_ops(shares, transaction, settings))
             
-            # Remove credentials file
-            cred_file = self.credentials_dir / f"{share.id}.cred"
-            if cred_file.exists():
-                cred_file.unlink()
+            if ops:
+                success, message = self.run_privileged(ops)
+                if not success:
+                    return False, message
             
-            return True, "Removed from fstab successfully"
+            for share in shares:
+                share.automounted = enabled
+                if not enabled:
+                    cred_file = self.credentials_dir / f"{share.id}.cred"
+                    if cred_file.exists():
+                        cred_file.unlink()
+            self._update_shares(shares)
             
         except Exception as e:
             return False, f"Error: {str(e)}"
+        
+        if enabled:
+            return True, "Added to fstab successfully"
+        return True, "Removed from fstab successfully"
+    
+    def _activation_ops(self, shares: list[Share], transaction, settings: AutomountSettings) -> list[dict]:
+        # Creates mount points and brings new entries up one nesting level
+        # at a time, so a nested share's directory is made on its parent
+        # once that is mounted (or armed: creating the directory then
+        # triggers the parent's automount) instead of underneath it
+        added = {normalize_mount_point(e.mount_point) for e in transaction.added}
+        ops = []
+        for level in MountTree(shares).levels():
+            ops.extend({"op": "mkdir", "path": share.mount_point} for share in level)
+            targets = [s.mount_point for s in level if normalize_mount_point(s.mount_point) in added]
+            if not targets:
+                continue
+            if settings.backend == "systemd":
+                # Arms the automount points; nothing is mounted until accessed
+                ops.append({"op": "start_automount", "targets": targets, "check": False})
+            else:
+                # Failing to mount right away is fine, the entries still apply on boot
+                ops.append({"op": "activate", "targets": targets, "check": False})
+        return ops
+    
+    def add_to_fstab(self, share: Share) -> tuple[bool, str]:
+        return self.set_automount([share], True)
+    
+    def remove_from_fstab(self, share: Share) -> tuple[bool, str]:
+        return self.set_automount([share], False)
     
     def get_fstab_entries(self) -> list[str]:
-        entries = []
         try:
-            with open(self.FSTAB_PATH, 'r') as f:
-                lines = f.readlines()
-            
-            in_mounty_section = False
-            for line in lines:
-                stripped = line.strip()
-                
-                if stripped == self.FSTAB_START_MARKER:
-                    in_mounty_section = True
-                    continue
-                elif stripped == self.FSTAB_END_MARKER:
-                    in_mounty_section = False
-                    continue
-                
-                if in_mounty_section and stripped and not stripped.startswith('#'):
-                    entries.append(stripped)
-                    
+            return self.read_fstab().block_lines()
         except Exception as e:
             print(f"Error reading fstab: {e}")
-        
-        return entries
+            return []
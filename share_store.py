@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+SCHEMA_VERSION = 2
+
+
+def _migrate_v1(conn: sqlite3.Connection, legacy_json: Optional[Path]) -> None:
+    conn.execute(
+        "CREATE TABLE shares ("
+        " id TEXT PRIMARY KEY,"
+        " position INTEGER NOT NULL,"
+        " data TEXT NOT NULL)"
+    )
+    # Carry over shares.json from versions that kept everything in one file
+    if legacy_json and legacy_json.exists():
+        try:
+            with open(legacy_json, 'r') as f:
+                shares = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Error importing {legacy_json}: {e}")
+            shares = []
+        conn.executemany(
+            "INSERT OR REPLACE INTO shares (id, position, data) VALUES (?, ?, ?)",
+            [(s["id"], i, json.dumps(s)) for i, s in enumerate(shares) if "id" in s]
+        )
+
+
+def _migrate_v2(conn: sqlite3.Connection, legacy_json: Optional[Path]) -> None:
+    conn.execute(
+        "CREATE TABLE benchmarks ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " share_id TEXT NOT NULL,"
+        " data TEXT NOT NULL)"
+    )
+    conn.execute("CREATE INDEX benchmarks_share ON benchmarks (share_id)")
+
+
+# Index n upgrades a store from schema version n to n + 1
+MIGRATIONS = [_migrate_v1, _migrate_v2]
+
+
+class ShareStore:
+    # Shares persisted one row per share in SQLite (WAL mode), so updating
+    # one share never rewrites the others and a crash mid-write leaves the
+    # previous state intact. Several processes (GUI, CLI) may use the same
+    # file at once; SQLite serializes their writes.
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._create_private_files()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate(legacy_json)
+
+    def _create_private_files(self) -> None:
+        # Shares include passwords, and the WAL holds recent writes in the
+        # clear. The files exist with mode 0600 before SQLite opens them, so
+        # they are never readable by others, not even briefly. The umask is
+        # left alone since other threads may be creating files meanwhile.
+        for path in (self.path, Path(f"{self.path}-wal"), Path(f"{self.path}-shm")):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+            try:
+                # Stores created before this was done may still be readable
+                os.fchmod(fd, 0o600)
+            finally:
+                os.close(fd)
+
+    def _migrate(self, legacy_json: Optional[Path]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+                if version > SCHEMA_VERSION:
+                    raise RuntimeError(
+                        f"{self.path} was written by a newer Mounty (schema {version})"
+                    )
+                imported = version == 0 and legacy_json is not None and legacy_json.exists()
+                for migration in MIGRATIONS[version:]:
+                    migration(self._conn, legacy_json)
+                if version < SCHEMA_VERSION:
+                    self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if imported:
+            legacy_json.rename(legacy_json.with_name(legacy_json.name + ".migrated"))
+
+    def data_version(self) -> int:
+        # Changes whenever another connection commits, so callers can skip
+        # reloading while nothing else has written to the store
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM shares ORDER BY position").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put(self, shares: list[dict]) -> None:
+        # Inserts or updates the given shares in one transaction. Existing
+        # shares keep their position, new ones go to the end.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                position = self._conn.execute(
+                    "SELECT COALESCE(MAX(position), -1) FROM shares"
+                ).fetchone()[0]
+                for share in shares:
+                    position += 1
+                    self._conn.execute(
+                        "INSERT INTO shares (id, position, data) VALUES (?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                        (share["id"], position, json.dumps(share))
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, share_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM shares WHERE id = ?", (share_id,))
+                self._conn.execute("DELETE FROM benchmarks WHERE share_id = ?", (share_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_benchmark(self, share_id: str, result: dict, keep: int) -> None:
+        # Keeps only the newest keep results of the share
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO benchmarks (share_id, data) VALUES (?, ?)", (share_id, json.dumps(result))
+                )
+                self._conn.execute(
+                    "DELETE FROM benchmarks WHERE share_id = ? AND id NOT IN "
+                    "(SELECT id FROM benchmarks WHERE share_id = ? ORDER BY id DESC LIMIT ?)",
+                    (share_id, share_id, keep)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def benchmarks(self, share_id: str) -> list[dict]:
+        # Oldest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM benchmarks WHERE share_id = ? ORDER BY id", (share_id,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def replace_all(self, shares: list[dict]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM shares")
+                self._conn.executemany(
+                    "INSERT INTO shares (id, position, data) VALUES (?, ?, ?)",
+                    [(s["id"], i, json.dumps(s)) for i, s in enumerate(shares)]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
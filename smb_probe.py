@@ -0,0 +1,132 @@
+import errno
+import os
+import socket
+import struct
+import time
+from dataclasses import dataclass
+
+SMB_PORT = 445
+
+# Dialect revision -> value for mount.cifs vers=
+DIALECTS = {
+    0x0202: "2.0",
+    0x0210: "2.1",
+    0x0300: "3.0",
+    0x0302: "3.02",
+    0x0311: "3.1.1",
+}
+
+_SMB2_MAGIC = b"\xfeSMB"
+_SMB1_MAGIC = b"\xffSMB"
+_PREAUTH_INTEGRITY_CAPABILITIES = 0x0001
+_SHA512 = 0x0001
+
+
+@dataclass
+class ProbeResult:
+    reachable: bool
+    latency_ms: float = 0.0
+    dialect: str = ""
+    error: str = ""
+
+
+def build_negotiate_request() -> bytes:
+    dialects = sorted(DIALECTS)
+    header = struct.pack(
+        "<4sHHIHHIIQIIQ16s",
+        _SMB2_MAGIC, 64, 0, 0,
+        0,          # NEGOTIATE
+        1, 0, 0,    # credits requested, flags, next command
+        0, 0, 0, 0,  # message id, reserved, tree id, session id
+        b"\0" * 16
+    )
+
+    # Negotiate contexts must start 8-byte aligned, counted from the SMB2 header
+    fixed_len = 36 + 2 * len(dialects)
+    context_offset = 64 + fixed_len
+    padding = (8 - context_offset % 8) % 8
+    context_offset += padding
+
+    body = struct.pack(
+        "<HHHHI16sIHH",
+        36, len(dialects),
+        1,          # signing enabled
+        0, 0,
+        os.urandom(16),
+        context_offset, 1, 0
+    )
+    body += b"".join(struct.pack("<H", d) for d in dialects)
+    body += b"\0" * padding
+
+    # SMB 3.1.1 requires a pre-auth integrity context in the request
+    salt = os.urandom(32)
+    context_data = struct.pack("<HHH", 1, len(salt), _SHA512) + salt
+    body += struct.pack("<HHI", _PREAUTH_INTEGRITY_CAPABILITIES, len(context_data), 0) + context_data
+
+    message = header + body
+    return struct.pack(">I", len(message)) + message
+
+
+def parse_negotiate_response(message: bytes) -> str:
+    if message[:4] == _SMB1_MAGIC:
+        return "1.0"
+    if len(message) < 64 + 6 or message[:4] != _SMB2_MAGIC:
+        raise ValueError("Not an SMB2 response")
+    status = struct.unpack_from("<I", message, 8)[0]
+    if status != 0:
+        raise ValueError(f"Negotiate failed with status 0x{status:08x}")
+    dialect = struct.unpack_from("<H", message, 64 + 4)[0]
+    return DIALECTS.get(dialect, "")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionResetError("Connection closed by server")
+        data += chunk
+    return data
+
+
+def _describe_error(e: OSError) -> str:
+    if isinstance(e, socket.gaierror):
+        return "Cannot resolve server"
+    if isinstance(e, (socket.timeout, TimeoutError)):
+        return "Connection timed out"
+    if isinstance(e, ConnectionRefusedError):
+        return "Connection refused"
+    if e.errno in (errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN):
+        return "Cannot reach server"
+    return f"Cannot reach server: {e.strerror or e}"
+
+
+def probe(host: str, port: int = SMB_PORT, timeout: float = 2.0) -> ProbeResult:
+    # Opens TCP 445 with a hard deadline and runs a single SMB2 NEGOTIATE,
+    # so dead hosts fail fast instead of costing an smbclient run
+    deadline = time.monotonic() + timeout
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError as e:
+        return ProbeResult(reachable=False, error=_describe_error(e))
+    except (UnicodeError, ValueError):
+        # Names the resolver cannot even encode (empty labels, NUL bytes)
+        return ProbeResult(reachable=False, error=f"Invalid server name: {host!r}")
+
+    with sock:
+        try:
+            sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            start = time.monotonic()
+            sock.sendall(build_negotiate_request())
+            length = struct.unpack(">I", _recv_exact(sock, 4))[0] & 0xFFFFFF
+            message = _recv_exact(sock, length)
+            latency_ms = (time.monotonic() - start) * 1000
+        except OSError:
+            # Something listens on 445 but does not speak SMB2 to us
+            return ProbeResult(reachable=True, error="No SMB2 response")
+
+    try:
+        dialect = parse_negotiate_response(message)
+    except ValueError as e:
+        return ProbeResult(reachable=True, latency_ms=latency_ms, error=str(e))
+    return ProbeResult(reachable=True, latency_ms=latency_ms, dialect=dialect)
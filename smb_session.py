@@ -0,0 +1,248 @@
+import hashlib
+import os
+import re
+import selectors
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+from job_scheduler import JobCancelled, current_job
+
+# smbclient prints "smb: \dir\> " whenever it is ready for the next command.
+# readline may surround it with terminal control sequences.
+_ESCAPES = rb"(?:\x1b\[[0-9;?]*[A-Za-z])*"
+PROMPT = re.compile(rb"smb: \\[^\n]*> " + _ESCAPES + rb"$")
+_ESCAPE = re.compile(rb"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+@contextmanager
+def auth_file(username: str, password: str):
+    # Yields (path, fd) of an smbclient authentication file that only
+    # exists in memory: a memfd, or a pipe where memfd_create is missing.
+    # Pass fd to the child with pass_fds; path names it inside the child,
+    # which keeps its own copy once started, so nothing is written to disk
+    # and nothing is left behind after a crash.
+    content = f"username={username}\npassword={password}\n".encode()
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("mounty-auth", os.MFD_CLOEXEC)
+        os.write(fd, content)
+        os.lseek(fd, 0, os.SEEK_SET)
+    else:
+        # Far below the pipe buffer, so the write cannot block
+        fd, write_fd = os.pipe()
+        os.write(write_fd, content)
+        os.close(write_fd)
+    try:
+        yield f"/proc/self/fd/{fd}", fd
+    finally:
+        os.close(fd)
+
+
+class SmbSessionError(Exception):
+    def __init__(self, output: str, returncode: int = None):
+        super().__init__(output.strip()[-200:] or f"Exit code: {returncode}")
+        self.output = output
+        self.returncode = returncode
+
+
+class SmbSession:
+    # One interactive smbclient process connected to a share. Commands are
+    # written to its stdin and their output is everything up to the next
+    # prompt.
+    COMMAND = "smbclient"
+
+    def __init__(self, server: str, share_name: str, username: str, password: str, timeout: float = 15):
+        self.server = server
+        self.share_name = share_name
+        self.username = username
+        self.password_digest = hashlib.sha256(password.encode()).hexdigest()
+        self.timeout = timeout
+        self.last_used = time.monotonic()
+        self._password = password
+        self._process = None
+        self._buffer = b""
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        # Without a tty smbclient only prints prompts when forced into
+        # interactive mode; the prompt is what delimits command output
+        env = dict(os.environ, CLI_FORCE_INTERACTIVE="yes", TERM="dumb")
+        with auth_file(self.username, self._password) as (path, fd):
+            self._process = subprocess.Popen(
+                [self.COMMAND, f"//{self.server}/{self.share_name}", "-A", path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                pass_fds=(fd,)
+            )
+        self._password = None
+        # Connection and authentication happen before the first prompt, and
+        # can take as long as the timeout against a server that went away;
+        # cancelling the job kills smbclient meanwhile
+        process = self._process
+        job = current_job()
+        if job:
+            job.attach_process(process)
+        try:
+            with tracing.span("smbclient-connect", f"{self.COMMAND} //{self.server}/{self.share_name}"):
+                self._read_until_prompt()
+        except SmbSessionError:
+            if job and job.cancelled:
+                raise JobCancelled() from None
+            raise
+        finally:
+            if job:
+                job.detach_process(process)
+
+    def run(self, command: str) -> str:
+        if not self.alive:
+            raise SmbSessionError("Session is closed")
+        job = current_job()
+        if job:
+            job.attach_process(self._process)
+        try:
+            with tracing.span("smbclient-command", command):
+                self._process.stdin.write(command.encode() + b"\n")
+                self._process.stdin.flush()
+                output = self._read_until_prompt()
+        except BrokenPipeError:
+            raise SmbSessionError(self._drain(), self._process.poll())
+        finally:
+            if job and self._process:
+                job.detach_process(self._process)
+            self.last_used = time.monotonic()
+
+        # readline echoes the command back before its output
+        first, _, rest = output.partition("\n")
+        return rest if first.strip() == command else output
+
+    def _read_until_prompt(self) -> str:
+        deadline = time.monotonic() + self.timeout
+        fd = self._process.stdout.fileno()
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while not PROMPT.search(self._buffer):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    self.close()
+                    raise subprocess.TimeoutExpired(self.COMMAND, self.timeout)
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    output = self._buffer.decode(errors="replace")
+                    self._buffer = b""
+                    raise SmbSessionError(output, self._process.wait())
+                self._buffer += chunk
+
+        match = PROMPT.search(self._buffer)
+        output = _ESCAPE.sub(b"", self._buffer[:match.start()]).decode(errors="replace")
+        output = output.replace("\r", "")
+        self._buffer = b""
+        return output
+
+    def _drain(self) -> str:
+        try:
+            rest = self._process.stdout.read()
+        except (OSError, ValueError):
+            rest = b""
+        output = (self._buffer + (rest or b"")).decode(errors="replace")
+        self._buffer = b""
+        return output
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"exit\n")
+                process.stdin.flush()
+                process.wait(timeout=2)
+        except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stdin.close()
+
+
+class SmbSessionPool:
+    # Keeps one authenticated smbclient per (server, share, user) around for
+    # idle_timeout seconds so back-to-back operations skip name resolution,
+    # negotiation and login.
+    def __init__(self, idle_timeout: float = 30):
+        self.idle_timeout = idle_timeout
+        self._sessions: dict[tuple, SmbSession] = {}
+        self._busy: set[tuple] = set()
+        self._lock = threading.Condition()
+        self._reaper = None
+
+    @contextmanager
+    def session(self, server: str, share_name: str, username: str, password: str, timeout: float = 15):
+        key = (server.lower(), share_name.lower(), username)
+        digest = hashlib.sha256(password.encode()).hexdigest()
+
+        with self._lock:
+            while key in self._busy:
+                self._lock.wait()
+            self._busy.add(key)
+            session = self._sessions.pop(key, None)
+
+        try:
+            if session and (not session.alive or session.password_digest != digest):
+                session.close()
+                session = None
+            if session is None:
+                session = SmbSession(server, share_name, username, password, timeout)
+                session.start()
+            yield session
+        except BaseException:
+            if session:
+                session.close()
+            session = None
+            raise
+        finally:
+            with self._lock:
+                self._busy.discard(key)
+                if session and session.alive:
+                    self._sessions[key] = session
+                    self._start_reaper()
+                self._lock.notify_all()
+
+    def _start_reaper(self) -> None:
+        if self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap, name="smb-session-reaper")
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(max(self.idle_timeout / 2, 1))
+            self.evict_idle()
+            with self._lock:
+                if not self._sessions:
+                    self._reaper = None
+                    return
+
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, session in self._sessions.items()
+                if now - session.last_used >= self.idle_timeout or not session.alive
+            ]
+            stale = [self._sessions.pop(key) for key in expired]
+        for session in stale:
+            session.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
@@ -0,0 +1,87 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from discovery import ServerDeduper, parse_avahi_line
+from job_scheduler import JobCancelled, JobScheduler, iter_lines_cancellable
+
+
+def avahi_line(name: str, hostname: str, address: str, protocol: str = "IPv4") -> str:
+    return f"=;eth0;{protocol};{name};_smb._tcp;local;{hostname};{address};445;"
+
+
+def python(code: str) -> list[str]:
+    return [sys.executable, "-u", "-c", code]
+
+
+def test_parse_avahi_line_unescapes_names():
+    info = parse_avahi_line(avahi_line("My\\032NAS", "nas.local", "192.168.1.5"))
+
+    assert info == {"name": "My NAS", "hostname": "nas.local", "address": "192.168.1.5", "protocol": "IPv4"}
+
+
+@pytest.mark.parametrize("line", [
+    "+;eth0;IPv4;nas;_smb._tcp;local",
+    "=;eth0;IPv4;nas;_smb._tcp;local;nas.local",
+    "=;eth0;IPv4;nas;_smb._tcp;local;nas.local;;445;",
+])
+def test_parse_avahi_line_skips_unresolved(line):
+    assert parse_avahi_line(line) is None
+
+
+def test_deduper_reports_each_server_once():
+    deduper = ServerDeduper()
+
+    assert deduper.add(parse_avahi_line(avahi_line("nas", "nas.local", "192.168.1.5")))[0] == "added"
+    # Same box seen on another interface, and under another address of the same family
+    assert deduper.add(parse_avahi_line(avahi_line("nas", "nas.local", "192.168.1.5"))) is None
+    assert deduper.add(parse_avahi_line(avahi_line("nas", "NAS.local", "10.0.0.5"))) is None
+    assert [s["address"] for s in deduper.results()] == ["192.168.1.5"]
+
+
+def test_deduper_prefers_ipv4_over_earlier_ipv6():
+    deduper = ServerDeduper()
+    deduper.add(parse_avahi_line(avahi_line("nas", "nas.local", "fe80::1%eth0", "IPv6")))
+
+    event, info = deduper.add(parse_avahi_line(avahi_line("nas", "nas.local", "192.168.1.5")))
+
+    assert event == "updated"
+    assert info["previous_address"] == "fe80::1%eth0"
+    assert [s["address"] for s in deduper.results()] == ["192.168.1.5"]
+
+
+def test_iter_lines_yields_lines_as_they_arrive():
+    lines = iter_lines_cancellable(python("print('one'); print('two'); print('three', end='')"), timeout=10)
+
+    assert list(lines) == ["one", "two", "three"]
+
+
+def test_iter_lines_times_out():
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        for _ in iter_lines_cancellable(python("print('one'); import time; time.sleep(30)"), timeout=0.5):
+            pass
+    assert time.monotonic() - start < 5
+
+
+def test_iter_lines_stops_when_job_is_cancelled():
+    scheduler = JobScheduler(dispatch=None)
+    started = threading.Event()
+    errors = []
+    done = threading.Event()
+
+    def browse():
+        for _ in iter_lines_cancellable(python("print('one'); import time; time.sleep(30)")):
+            started.set()
+
+    job = scheduler.submit(browse, callback=lambda result: done.set(),
+                           errback=lambda error: (errors.append(error), done.set()))
+    assert started.wait(5)
+    scheduler.cancel(job)
+
+    assert done.wait(5)
+    assert isinstance(errors[0], JobCancelled)
+    scheduler.shutdown()
@@ -0,0 +1,46 @@
+from fstab import FSTAB_END_MARKER, FSTAB_START_MARKER, Fstab, FstabEntry, splice_block
+
+
+def cifs(source: str, mount_point: str) -> FstabEntry:
+    return FstabEntry(source, mount_point, "cifs", "credentials=/x,_netdev")
+
+
+def mount_points(transaction) -> list[str]:
+    return [e.mount_point for e in transaction.fstab.entries]
+
+
+def test_remove_keeps_other_share_with_same_source():
+    fstab = Fstab([cifs("//nas/data", "/mnt/a"), cifs("//nas/data", "/mnt/b")])
+    transaction = fstab.transaction()
+
+    transaction.remove("/mnt/a")
+
+    assert mount_points(transaction) == ["/mnt/b"]
+
+
+def test_remove_does_not_match_source_prefix():
+    fstab = Fstab([cifs("//nas/data", "/mnt/data"), cifs("//nas/data2", "/mnt/data2")])
+    transaction = fstab.transaction()
+
+    transaction.remove("/mnt/data")
+
+    assert [e.source for e in transaction.fstab.entries] == ["//nas/data2"]
+    assert fstab.find_source("//NAS/data/") == [fstab.entries[0]]
+
+
+def test_unchanged_block_is_not_a_change():
+    entry = cifs("//nas/data", "/mnt/data")
+    transaction = Fstab([entry]).transaction()
+
+    transaction.add(cifs("//nas/data", "/mnt/data"))
+
+    assert transaction.changes
+    assert not transaction.changed
+
+
+def test_entries_with_spaces_round_trip():
+    entry = cifs("//nas/My Files", "/mnt/my files")
+    content = splice_block("UUID=1 / ext4 defaults 0 1\n", [entry.render()])
+
+    assert Fstab.parse(content).entries == [entry]
+    assert content.splitlines()[-3:] == [FSTAB_START_MARKER, entry.render(), FSTAB_END_MARKER]
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from job_scheduler import JobCancelled, JobScheduler, Priority, current_job
+
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_workers=1, per_host=1, dispatch=None)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def block(scheduler, **kwargs):
+    # Occupies a worker until the returned event is set
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(TIMEOUT)
+
+    scheduler.submit(blocker, **kwargs)
+    assert started.wait(TIMEOUT)
+    return release
+
+
+def test_user_jobs_run_before_background_jobs(scheduler):
+    order, done = [], queue.Queue()
+    release = block(scheduler)
+
+    scheduler.submit(order.append, "background", priority=Priority.BACKGROUND, callback=done.put)
+    scheduler.submit(order.append, "user", priority=Priority.USER, callback=done.put)
+    release.set()
+    done.get(timeout=TIMEOUT)
+    done.get(timeout=TIMEOUT)
+
+    assert order == ["user", "background"]
+
+
+def test_per_host_cap_lets_other_hosts_run():
+    scheduler = JobScheduler(max_workers=3, per_host=1, dispatch=None)
+    try:
+        release = block(scheduler, host="nas")
+        started = threading.Event()
+        done = queue.Queue()
+
+        scheduler.submit(started.set, host="NAS")
+        scheduler.submit(lambda: "other", host="backup", callback=done.put)
+
+        assert done.get(timeout=TIMEOUT) == "other"
+        assert not started.is_set()
+        release.set()
+        assert started.wait(TIMEOUT)
+    finally:
+        scheduler.shutdown()
+
+
+def test_same_key_runs_once_and_notifies_every_submitter(scheduler):
+    calls, first, second = [], queue.Queue(), queue.Queue()
+    release = block(scheduler)
+
+    def scan():
+        calls.append(1)
+        return True, "ok"
+
+    job = scheduler.submit(scan, key=("scan", "nas"), callback=first.put)
+    again = scheduler.submit(scan, key=("scan", "nas"), callback=second.put)
+    release.set()
+
+    assert again is job
+    assert first.get(timeout=TIMEOUT) == (True, "ok")
+    assert second.get(timeout=TIMEOUT) == (True, "ok")
+    assert calls == [1]
+
+
+def test_coalesced_submit_raises_queued_priority(scheduler):
+    order, done = [], queue.Queue()
+    release = block(scheduler)
+
+    scheduler.submit(order.append, "scan", key="scan", priority=Priority.BACKGROUND, callback=done.put)
+    scheduler.submit(order.append, "user", priority=Priority.USER, callback=done.put)
+    job = scheduler.submit(order.append, "scan", key="scan", priority=Priority.USER)
+    release.set()
+    done.get(timeout=TIMEOUT)
+    done.get(timeout=TIMEOUT)
+
+    assert job.priority == Priority.USER
+    assert order == ["scan", "user"]
+
+
+def test_key_is_free_again_after_the_job_finishes(scheduler):
+    done = queue.Queue()
+
+    first = scheduler.submit(lambda: 1, key="k", callback=done.put)
+    assert done.get(timeout=TIMEOUT) == 1
+    second = scheduler.submit(lambda: 2, key="k", callback=done.put)
+
+    assert second is not first
+    assert done.get(timeout=TIMEOUT) == 2
+
+
+def test_cancel_queued_job_reports_to_errback(scheduler):
+    ran, errors = [], queue.Queue()
+    release = block(scheduler)
+
+    job = scheduler.submit(ran.append, 1, callback=ran.append, errback=errors.put)
+    scheduler.cancel(job)
+    release.set()
+
+    assert isinstance(errors.get(timeout=TIMEOUT), JobCancelled)
+    assert job.finished
+    # Wait for the queue to drain before checking the job never ran
+    done = queue.Queue()
+    scheduler.submit(lambda: None, callback=done.put)
+    done.get(timeout=TIMEOUT)
+    assert ran == []
+
+
+def test_cancel_queued_job_without_errback_reports_failure(scheduler):
+    results = queue.Queue()
+    release = block(scheduler)
+
+    job = scheduler.submit(lambda: (True, "ok"), callback=results.put)
+    scheduler.cancel(job)
+    release.set()
+
+    assert results.get(timeout=TIMEOUT) == (False, "Cancelled")
+
+
+def test_cancel_running_job(scheduler):
+    started, results = threading.Event(), queue.Queue()
+
+    def wait_for_cancel():
+        started.set()
+        deadline = time.monotonic() + TIMEOUT
+        while not current_job().cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return True, "finished"
+
+    job = scheduler.submit(wait_for_cancel, callback=results.put)
+    assert started.wait(TIMEOUT)
+    scheduler.cancel(job)
+
+    assert results.get(timeout=TIMEOUT) == (False, "Cancelled")
+
+
+def test_exception_is_reported(scheduler):
+    results, errors = queue.Queue(), queue.Queue()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.submit(fail, callback=results.put)
+    scheduler.submit(fail, callback=results.put, errback=errors.put)
+
+    assert results.get(timeout=TIMEOUT) == (False, "Error: boom")
+    assert isinstance(errors.get(timeout=TIMEOUT), RuntimeError)
+    assert results.empty()
+
+
+def test_callbacks_go_through_dispatch():
+    # The UI passes GLib.idle_add so callbacks run on the main loop
+    dispatched = queue.Queue()
+    scheduler = JobScheduler(max_workers=1, dispatch=lambda fn, *args: dispatched.put((fn, args)))
+    results = []
+    try:
+        scheduler.submit(lambda: "x", callback=results.append)
+        fn, args = dispatched.get(timeout=TIMEOUT)
+        assert results == []
+        assert fn(*args) is False
+        assert results == ["x"]
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,120 @@
+import pytest
+
+from mount_options import (
+    MountOptionError,
+    describe,
+    format_options,
+    format_overrides,
+    parse_overrides,
+    resolve,
+    validate,
+)
+from smb_probe import parse_negotiate_response
+
+
+def test_smb1_dialect_from_probe_pins_vers_1_0():
+    dialect = parse_negotiate_response(b"\xffSMB" + b"\0" * 60)
+
+    options = resolve("default", {}, dialect)
+
+    assert options == {"vers": "1.0"}
+    assert format_options(options) == "vers=1.0"
+
+
+def test_smb1_rejects_multichannel():
+    with pytest.raises(MountOptionError, match="multichannel"):
+        resolve("default", {"multichannel": True}, "1.0")
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"noperm": True}, "Unknown mount option"),
+    ({"cache": "fast"}, "cache must be one of"),
+    ({"vers": "4"}, "vers must be one of"),
+    ({"rsize": 4097}, "multiple of 4096"),
+    ({"wsize": 2048}, "between"),
+    ({"rsize": 32 * 1024 * 1024}, "between"),
+    ({"rsize": "65536"}, "whole number"),
+    ({"actimeo": True}, "whole number"),
+    ({"multichannel": "yes"}, "is a flag"),
+    ({"max_channels": 4}, "needs multichannel"),
+    ({"multichannel": True, "max_channels": 17}, "between"),
+    ({"multichannel": True, "vers": "2.1"}, "SMB 3.0 or newer"),
+])
+def test_validate_rejects(options, message):
+    with pytest.raises(MountOptionError, match=message):
+        validate(options)
+
+
+def test_validate_accepts_multichannel_on_smb3():
+    validate({"vers": "3.1.1", "multichannel": True, "max_channels": 4, "rsize": 4 * 1024 * 1024})
+
+
+def test_resolve_merges_profile_dialect_and_overrides():
+    options = resolve("interactive", {"actimeo": 5, "multichannel": True}, "3.0")
+
+    assert options == {"cache": "strict", "actimeo": 5, "nosharesock": True, "vers": "3.0", "multichannel": True}
+    assert format_options(options) == "vers=3.0,cache=strict,actimeo=5,multichannel,nosharesock"
+
+
+def test_resolve_override_false_drops_profile_flag():
+    options = resolve("interactive", {"nosharesock": False})
+
+    assert "nosharesock" not in options
+
+
+def test_resolve_override_vers_beats_dialect():
+    assert resolve("default", {"vers": "3.0"}, "3.1.1") == {"vers": "3.0"}
+
+
+def test_resolve_validates_the_merged_result():
+    with pytest.raises(MountOptionError, match="SMB 3.0 or newer"):
+        resolve("default", {"multichannel": True}, "2.1")
+    with pytest.raises(MountOptionError, match="Unknown performance profile"):
+        resolve("turbo", {})
+
+
+def test_custom_profile_only_has_overrides():
+    assert resolve("custom", {"cache": "none"}) == {"cache": "none"}
+
+
+def test_parse_overrides():
+    overrides = parse_overrides("cache=loose, rsize=4M,wsize=512k,multichannel,no-nosharesock")
+
+    assert overrides == {
+        "cache": "loose",
+        "rsize": 4 * 1024 * 1024,
+        "wsize": 512 * 1024,
+        "multichannel": True,
+        "nosharesock": False,
+    }
+
+
+@pytest.mark.parametrize("text, message", [
+    ("bogus=1", "Unknown mount option"),
+    ("no-cache", "Unknown mount option"),
+    ("nosharesock=1", "is a flag"),
+    ("cache=", "needs a value"),
+    ("rsize=lots", "whole number"),
+    ("actimeo=1k", "whole number"),
+    ("max_channels=2", "needs multichannel"),
+])
+def test_parse_overrides_rejects(text, message):
+    with pytest.raises(MountOptionError, match=message):
+        parse_overrides(text)
+
+
+def test_format_overrides_round_trips():
+    overrides = {"rsize": 1024 * 1024, "cache": "loose", "nosharesock": False}
+
+    text = format_overrides(overrides)
+
+    assert text == "cache=loose,rsize=1048576,no-nosharesock"
+    assert parse_overrides(text) == overrides
+    assert format_overrides({}) == ""
+
+
+def test_describe():
+    assert describe("default") == "Default"
+    assert describe("small_files") == "Many Small Files (cache=loose,actimeo=30)"
+    assert describe("interactive", {"nosharesock": False}) == "Low-Latency Interactive (cache=strict,actimeo=1)"
+    assert describe("custom", {"max_channels": 2}) == "Custom (invalid: max_channels needs multichannel)"
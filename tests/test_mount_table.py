@@ -0,0 +1,104 @@
+from mount_table import MountTable, is_below, normalize_mount_point, normalize_unc
+
+
+MOUNTINFO = """\
+22 1 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:12 - proc proc rw
+29 1 8:2 / / rw,relatime shared:1 - ext4 /dev/sda2 rw,errors=remount-ro
+101 29 0:52 / /mnt/my\\040share rw,relatime shared:60 master:3 - cifs //nas/My\\040Data rw,vers=3.1.1,cache=strict
+102 29 0:53 / /mnt/tab\\011and\\134slash rw,relatime - cifs //nas/odd rw,vers=3.0
+103 29 0:54 / /mnt/plain rw,relatime - cifs \\\\NAS\\Plain\\ rw
+104 29 0:55 / /mnt/auto rw,relatime shared:70 - autofs systemd-1 rw,fd=42,pgrp=1
+"""
+
+
+def table() -> MountTable:
+    return MountTable.parse(MOUNTINFO)
+
+
+def test_octal_escapes_are_decoded():
+    mounts = table()
+
+    entry = mounts.get("/mnt/my share")
+    assert entry.source == "//nas/My Data"
+    assert entry.mount_id == 101
+    assert entry.parent_id == 29
+    assert mounts.is_mounted("/mnt/tab\tand\\slash")
+
+
+def test_optional_fields_do_not_shift_columns():
+    entry = table().get("/mnt/my share")
+
+    assert entry.fs_type == "cifs"
+    assert entry.is_cifs
+    assert entry.options == "rw,relatime"
+    assert entry.super_options == "rw,vers=3.1.1,cache=strict"
+
+
+def test_no_optional_fields():
+    entry = table().get("/mnt/tab\tand\\slash")
+
+    assert entry.fs_type == "cifs"
+    assert entry.source == "//nas/odd"
+    assert entry.super_options == "rw,vers=3.0"
+
+
+def test_malformed_lines_are_skipped():
+    mounts = MountTable.parse("garbage\n1 2 3 4 5 6 - cifs\nx 1 0:1 / /mnt rw - ext4 /dev/sda1 rw\n")
+
+    assert mounts.entries == []
+
+
+def test_autofs_trigger_is_armed_not_mounted():
+    mounts = table()
+
+    assert mounts.is_armed("/mnt/auto")
+    assert not mounts.is_mounted("/mnt/auto")
+    assert not mounts.is_armed("/mnt/plain")
+
+
+def test_find_source_normalizes_unc():
+    mounts = table()
+
+    assert [e.mount_point for e in mounts.find_source("//NAS/my data/")] == ["/mnt/my share"]
+    assert [e.mount_point for e in mounts.find_source("//nas/plain")] == ["/mnt/plain"]
+    assert mounts.find_source("//nas/my") == []
+
+
+def test_lookup_normalizes_mount_point():
+    mounts = table()
+
+    assert mounts.is_mounted("/mnt/plain/")
+    assert mounts.is_mounted("//mnt/./plain")
+
+
+def test_stacked_mount_wins():
+    mounts = MountTable.parse(
+        "101 29 0:52 / /mnt/x rw - cifs //nas/a rw\n"
+        "105 101 0:56 / /mnt/x rw - cifs //nas/b rw\n"
+    )
+
+    assert mounts.get("/mnt/x").source == "//nas/b"
+
+
+def test_diff_reports_changed_mount_points():
+    old = table()
+    new = MountTable.parse("\n".join(
+        line for line in MOUNTINFO.splitlines() if "/mnt/plain" not in line and "autofs" not in line
+    ).replace("101 29", "201 29"))
+
+    assert old.diff(new) == {"/mnt/plain", "/mnt/auto", "/mnt/my share"}
+    assert old.diff(table()) == set()
+
+
+def test_read_missing_file_returns_empty_table(tmp_path):
+    assert MountTable.read(str(tmp_path / "missing")).entries == []
+
+
+def test_path_helpers():
+    assert normalize_mount_point("//mnt//data/") == "/mnt/data"
+    assert normalize_mount_point("") == ""
+    assert normalize_unc("\\\\NAS\\Data\\") == "//nas/data"
+    assert is_below("/mnt/data/sub", "/mnt/data")
+    assert not is_below("/mnt/data2", "/mnt/data")
+    assert not is_below("/mnt/data", "/mnt/data/")
+    assert is_below("/mnt", "/")
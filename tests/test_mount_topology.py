@@ -0,0 +1,143 @@
+import threading
+
+from mount_topology import MountTree
+
+
+TIMEOUT = 5
+
+PATHS = ["/mnt/media", "/mnt/projects/archive/old", "/mnt/projects", "/mnt/projects/archive", "/mnt/projects/src"]
+
+
+def tree(paths=PATHS) -> MountTree:
+    return MountTree(paths, mount_point=lambda path: path)
+
+
+class Recorder:
+    def __init__(self, fail=()):
+        self.fail = fail
+        self.events = []
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def action(self, path):
+        with self._lock:
+            self.events.append(("start", path))
+        if path in self.fail:
+            result = (False, "Permission denied")
+        else:
+            result = (True, "ok")
+        with self._lock:
+            self.events.append(("end", path))
+        return result
+
+    def callback(self, path, result):
+        self.results[path] = result
+
+    def index(self, event, path):
+        return self.events.index((event, path))
+
+
+def test_parent_and_children():
+    mounts = tree()
+
+    assert mounts.parent == [None, 3, None, 2, 2]
+    assert mounts.children[2] == [3, 4]
+    assert mounts.children[0] == []
+    assert mounts.depth(1) == 2
+
+
+def test_levels_list_parents_first():
+    assert tree().levels() == [
+        ["/mnt/media", "/mnt/projects"],
+        ["/mnt/projects/archive", "/mnt/projects/src"],
+        ["/mnt/projects/archive/old"],
+    ]
+
+
+def test_sibling_prefix_is_not_a_parent():
+    mounts = tree(["/mnt/data", "/mnt/data2", "/mnt/data/sub/"])
+
+    assert mounts.parent == [None, None, 0]
+
+
+def test_duplicate_mount_point_is_not_its_own_parent():
+    mounts = tree(["/mnt/data", "/mnt/data/", "/mnt/data/x"])
+
+    assert mounts.parent == [None, None, 0]
+
+
+def test_run_parent_first():
+    recorder = Recorder()
+
+    tree().run(recorder.action, 4, recorder.callback)
+
+    assert set(recorder.results) == set(PATHS)
+    for child, parent in [("/mnt/projects/archive", "/mnt/projects"),
+                          ("/mnt/projects/src", "/mnt/projects"),
+                          ("/mnt/projects/archive/old", "/mnt/projects/archive")]:
+        assert recorder.index("end", parent) < recorder.index("start", child)
+
+
+def test_run_children_first():
+    recorder = Recorder()
+
+    tree().run(recorder.action, 4, recorder.callback, children_first=True)
+
+    assert set(recorder.results) == set(PATHS)
+    for child, parent in [("/mnt/projects/archive", "/mnt/projects"),
+                          ("/mnt/projects/src", "/mnt/projects"),
+                          ("/mnt/projects/archive/old", "/mnt/projects/archive")]:
+        assert recorder.index("end", child) < recorder.index("start", parent)
+
+
+def test_failed_parent_skips_its_subtree():
+    recorder = Recorder(fail={"/mnt/projects"})
+
+    tree().run(recorder.action, 4, recorder.callback)
+
+    assert recorder.results["/mnt/projects"] == (False, "Permission denied")
+    for path in ("/mnt/projects/archive", "/mnt/projects/archive/old", "/mnt/projects/src"):
+        assert recorder.results[path] == (False, "Skipped: /mnt/projects failed to mount")
+        assert ("start", path) not in recorder.events
+    assert recorder.results["/mnt/media"] == (True, "ok")
+
+
+def test_failed_child_keeps_parent_mounted():
+    recorder = Recorder(fail={"/mnt/projects/archive/old"})
+
+    tree().run(recorder.action, 4, recorder.callback, children_first=True)
+
+    for path in ("/mnt/projects/archive", "/mnt/projects"):
+        assert recorder.results[path] == (False, "Skipped: /mnt/projects/archive/old is still mounted")
+        assert ("start", path) not in recorder.events
+    assert recorder.results["/mnt/projects/src"] == (True, "ok")
+
+
+def test_exception_is_reported_as_failure():
+    results = {}
+
+    def action(path):
+        raise OSError("boom")
+
+    tree(["/mnt/a", "/mnt/a/b"]).run(action, 2, results.__setitem__)
+
+    assert results == {"/mnt/a": (False, "Error: boom"), "/mnt/a/b": (False, "Skipped: /mnt/a failed to mount")}
+
+
+def test_independent_subtrees_run_in_parallel():
+    started = {path: threading.Event() for path in ("/mnt/a", "/mnt/b")}
+    results = {}
+
+    def action(path):
+        started[path].set()
+        # Only succeeds if the other subtree is being worked on at the same time
+        other = "/mnt/b" if path == "/mnt/a" else "/mnt/a"
+        return started[other].wait(TIMEOUT), path
+
+    tree(["/mnt/a", "/mnt/b"]).run(action, 2, results.__setitem__)
+
+    assert results == {"/mnt/a": (True, "/mnt/a"), "/mnt/b": (True, "/mnt/b")}
+
+
+def test_run_with_no_items():
+    tree([]).run(lambda path: (True, ""), 4, lambda *args: None)
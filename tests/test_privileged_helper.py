@@ -0,0 +1,133 @@
+import os
+import threading
+
+import pytest
+
+from fstab import FSTAB_END_MARKER, FSTAB_START_MARKER, Fstab, FstabEntry
+from privileged_helper import handle_ops
+
+SYSTEM_LINE = "UUID=1234 / ext4 defaults 0 1"
+
+
+@pytest.fixture
+def fstab_path(tmp_path):
+    path = tmp_path / "fstab"
+    path.write_text(SYSTEM_LINE + "\n")
+    return str(path)
+
+
+def entry(name: str) -> FstabEntry:
+    return FstabEntry(f"//nas/{name}", f"/mnt/{name}", "cifs", "credentials=/x,_netdev")
+
+
+def update(fstab_path: str, add=(), remove=()) -> dict:
+    transaction = Fstab.read(fstab_path).transaction()
+    for mount_point in remove:
+        transaction.remove(mount_point)
+    for item in add:
+        transaction.add(item)
+    return handle_ops([{"op": "update_fstab", "changes": transaction.changes}], fstab_path)[0]
+
+
+def test_update_fstab_adds_block_and_keeps_other_lines(fstab_path):
+    result = update(fstab_path, add=[entry("media")])
+
+    assert result["ok"], result
+    assert "duration_ms" in result
+    lines = open(fstab_path).read().splitlines()
+    assert lines[0] == SYSTEM_LINE
+    assert lines[lines.index(FSTAB_START_MARKER) + 1] == entry("media").render()
+    assert FSTAB_END_MARKER in lines
+
+
+def test_update_fstab_removes_only_the_given_mount_point(fstab_path):
+    update(fstab_path, add=[entry("media"), entry("backup")])
+
+    result = update(fstab_path, remove=["/mnt/media/"])
+
+    assert result["ok"], result
+    assert [e.mount_point for e in Fstab.read(fstab_path).entries] == ["/mnt/backup"]
+
+
+def test_concurrent_updates_keep_every_entry(fstab_path):
+    # Each thread stages its change against the fstab it read; the helper
+    # must apply it to the current file, not write the stale block back
+    barrier = threading.Barrier(8)
+    results = []
+
+    def add(i):
+        transaction = Fstab.read(fstab_path).transaction()
+        transaction.add(entry(f"share{i}"))
+        barrier.wait()
+        results.append(handle_ops([{"op": "update_fstab", "changes": transaction.changes}], fstab_path)[0])
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result["ok"] for result in results)
+    assert len(Fstab.read(fstab_path).entries) == 8
+    assert open(fstab_path).read().startswith(SYSTEM_LINE)
+    # No lock or temporary files are left next to fstab
+    assert os.listdir(os.path.dirname(fstab_path)) == ["fstab"]
+
+
+@pytest.mark.parametrize("change", [
+    {"add": f"//nas/x /mnt/x cifs defaults 0 0\n{SYSTEM_LINE}"},
+    {"add": FSTAB_END_MARKER},
+    {"add": "# not an entry"},
+    {"remove": {"mount_point": "relative"}},
+    {"remove": "/mnt/x"},
+    {"replace": "everything"},
+])
+def test_update_fstab_rejects_invalid_changes(fstab_path, change):
+    result = handle_ops([{"op": "update_fstab", "changes": [change]}], fstab_path)[0]
+
+    assert not result["ok"]
+    assert open(fstab_path).read() == SYSTEM_LINE + "\n"
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "mkdir", "path": "/etc/mounty"},
+    {"op": "mount", "source": "//nas/x", "target": "/usr/bin", "options": ""},
+    {"op": "umount", "target": "/"},
+    {"op": "update_fstab", "changes": [{"add": "//nas/x /boot cifs defaults 0 0"}]},
+])
+def test_system_directories_are_refused(fstab_path, op):
+    result = handle_ops([op], fstab_path)[0]
+
+    assert not result["ok"]
+    assert "system directory" in result["error"]
+
+
+def test_symlink_to_system_directory_is_refused(fstab_path, tmp_path):
+    (tmp_path / "link").symlink_to("/etc")
+
+    result = handle_ops([{"op": "mkdir", "path": str(tmp_path / "link" / "mounty")}], fstab_path)[0]
+
+    assert not result["ok"]
+
+
+def test_mkdir_creates_mount_point(fstab_path, tmp_path):
+    path = tmp_path / "mnt" / "nas"
+
+    result = handle_ops([{"op": "mkdir", "path": str(path)}], fstab_path)[0]
+
+    assert result["ok"], result
+    assert path.is_dir()
+
+
+def test_failed_op_stops_the_batch_unless_unchecked(fstab_path, tmp_path):
+    ops = [
+        {"op": "no-such-op"},
+        {"op": "mkdir", "path": str(tmp_path / "first")},
+    ]
+    assert len(handle_ops(ops, fstab_path)) == 1
+    assert not (tmp_path / "first").exists()
+
+    ops[0]["check"] = False
+    results = handle_ops(ops, fstab_path)
+    assert [result["ok"] for result in results] == [False, True]
+    assert (tmp_path / "first").is_dir()
@@ -0,0 +1,49 @@
+import threading
+
+from job_scheduler import JobCancelled, JobScheduler
+from share_benchmark import PHASES, SCRATCH_PREFIX, BenchmarkSettings, run_benchmark
+
+SMALL = BenchmarkSettings(file_size_mb=2, block_size_kb=256, small_files=20, workers=4, listing_runs=2)
+
+
+def test_run_benchmark_measures_every_phase(tmp_path):
+    progress = []
+
+    result = run_benchmark(str(tmp_path), SMALL, lambda phase, fraction: progress.append((phase, fraction)))
+
+    for name in ("write_mb_s", "read_mb_s", "create_per_s", "stat_per_s", "delete_per_s"):
+        assert getattr(result, name) > 0, name
+    assert result.list_p50_ms <= result.list_p95_ms
+    assert result.duration_s > 0
+    assert [phase for phase, _ in PHASES] == list(dict.fromkeys(phase for phase, _ in progress))
+    fractions = [fraction for _, fraction in progress]
+    assert fractions == sorted(fractions) and fractions[-1] <= 1.0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cancelled_benchmark_removes_scratch_directory(tmp_path):
+    scheduler = JobScheduler(dispatch=None)
+    outcome = []
+    done = threading.Event()
+    scratch = []
+    submitted = threading.Event()
+
+    def on_progress(phase, fraction):
+        # Cancel part-way through, once small files exist on disk
+        if phase == "create" and not scratch:
+            scratch.extend(tmp_path.glob(f"{SCRATCH_PREFIX}*"))
+            submitted.wait(5)
+            scheduler.cancel(job)
+
+    job = scheduler.submit(
+        run_benchmark, str(tmp_path), SMALL, on_progress,
+        callback=lambda result: (outcome.append(result), done.set()),
+        errback=lambda error: (outcome.append(error), done.set()),
+    )
+    submitted.set()
+
+    assert done.wait(30)
+    assert isinstance(outcome[0], JobCancelled)
+    assert scratch and not scratch[0].exists()
+    assert list(tmp_path.iterdir()) == []
+    scheduler.shutdown()
@@ -0,0 +1,123 @@
+import sys
+
+import pytest
+
+from fstab import Fstab, FstabEntry, splice_block
+from privileged_helper import HELPER_PATH
+from share_manager import Share, ShareManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # Runs the real helper unprivileged against a temporary fstab and an
+    # empty mount table
+    fstab_path = tmp_path / "fstab"
+    fstab_path.write_text("UUID=1 / ext4 defaults 0 1\n")
+    mountinfo_path = tmp_path / "mountinfo"
+    mountinfo_path.write_text("")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr(ShareManager, "FSTAB_PATH", str(fstab_path))
+    monkeypatch.setattr(ShareManager, "MOUNTINFO_PATH", str(mountinfo_path))
+    monkeypatch.setattr(ShareManager, "HELPER_COMMAND", [sys.executable, HELPER_PATH, "--fstab", str(fstab_path)])
+    manager = ShareManager()
+    yield manager
+    manager.close()
+
+
+def share(share_id: str, share_name: str, mount_point: str, automounted: bool = True) -> Share:
+    return Share(share_id, "nas", share_name, "user", "secret", mount_point, automounted=automounted)
+
+
+def write_block(manager: ShareManager, entries: list[tuple[str, str]]) -> None:
+    path = manager.FSTAB_PATH
+    lines = [FstabEntry(source, mount_point, "cifs", "_netdev").render() for source, mount_point in entries]
+    with open(path) as f:
+        content = f.read()
+    with open(path, 'w') as f:
+        f.write(splice_block(content, lines))
+
+
+def test_disabling_automount_keeps_other_share_with_same_source(manager):
+    first = share("a", "data", "/mnt/a")
+    second = share("b", "data", "/mnt/b")
+    manager.add_share(first)
+    manager.add_share(second)
+    # /mnt/old is left over from before first moved to /mnt/a
+    write_block(manager, [("//nas/data", "/mnt/a"), ("//nas/data", "/mnt/b"), ("//nas/data", "/mnt/old")])
+
+    success, message = manager.set_automount([first], False)
+
+    assert success, message
+    assert [e.mount_point for e in Fstab.read(manager.FSTAB_PATH).entries] == ["/mnt/b"]
+    assert manager.get_share("b").automounted
+
+
+def test_disabling_automount_keeps_share_with_longer_name(manager):
+    data = share("a", "data", "/mnt/data")
+    data2 = share("b", "data2", "/mnt/data2")
+    manager.add_share(data)
+    manager.add_share(data2)
+    write_block(manager, [("//nas/data", "/mnt/data"), ("//nas/data2", "/mnt/data2")])
+
+    success, message = manager.set_automount([data], False)
+
+    assert success, message
+    assert [e.source for e in Fstab.read(manager.FSTAB_PATH).entries] == ["//nas/data2"]
+
+
+def test_enabling_automount_again_leaves_fstab_alone(manager, monkeypatch):
+    media = share("a", "media", "/mnt/media", automounted=False)
+    manager.add_share(media)
+    # Nothing under /mnt/media on this machine: keep activation out of it
+    monkeypatch.setattr(manager, "_activation_ops", lambda *args: [])
+    success, message = manager.set_automount([media], True)
+    assert success, message
+    before = open(manager.FSTAB_PATH).read()
+
+    calls = []
+    monkeypatch.setattr(manager, "run_privileged", lambda ops: calls.append(ops) or (True, ""))
+    success, message = manager.set_automount([media], True)
+
+    assert success, message
+    assert not any(op["op"] == "update_fstab" for ops in calls for op in ops)
+    assert open(manager.FSTAB_PATH).read() == before
+
+
+def test_scan_results_are_cached(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(manager, "_scan_shares", lambda *args: calls.append(args) or (True, [{"name": "data"}]))
+
+    first = manager.scan_shares("NAS", "user", "secret")
+    second = manager.scan_shares("nas", "user", "secret")
+
+    assert first == second == (True, [{"name": "data"}])
+    assert len(calls) == 1
+    # A different password must not be served the cached listing
+    manager.scan_shares("nas", "user", "other")
+    assert len(calls) == 2
+
+
+def test_unreachable_server_is_cached_briefly(manager, monkeypatch):
+    now = [1000.0]
+    manager._scan_cache.clock = lambda: now[0]
+    calls = []
+    monkeypatch.setattr(manager, "_scan_shares", lambda *args: calls.append(args) or (False, "Cannot reach server"))
+
+    manager.scan_shares("nas")
+    now[0] += manager.SCAN_CACHE_NEGATIVE_TTL - 1
+    assert manager.scan_shares("nas") == (False, "Cannot reach server")
+    assert len(calls) == 1
+
+    now[0] += 1
+    manager.scan_shares("nas")
+    assert len(calls) == 2
+
+
+def test_other_scan_errors_are_not_cached(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(manager, "_scan_shares", lambda *args: calls.append(args) or (False, "Access denied"))
+
+    manager.scan_shares("nas", "user", "wrong")
+    manager.scan_shares("nas", "user", "wrong")
+
+    assert len(calls) == 2
@@ -0,0 +1,109 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from smb_probe import DIALECTS, build_negotiate_request, parse_negotiate_response, probe
+
+
+def negotiate_response(dialect: int, status: int = 0) -> bytes:
+    header = struct.pack("<4sHHIHH", b"\xfeSMB", 64, 0, status, 0, 1) + b"\0" * 48
+    body = struct.pack("<HHH", 65, 1, dialect) + b"\0" * 58
+    return header + body
+
+
+def parse_request(packet: bytes) -> list[int]:
+    # Returns the dialects offered, checking the framing on the way
+    length = struct.unpack(">I", packet[:4])[0]
+    message = packet[4:]
+    assert len(message) == length
+    assert message[:4] == b"\xfeSMB"
+    assert struct.unpack_from("<H", message, 12)[0] == 0  # NEGOTIATE
+    structure_size, count = struct.unpack_from("<HH", message, 64)
+    assert structure_size == 36
+    context_offset = struct.unpack_from("<I", message, 64 + 28)[0]
+    assert context_offset % 8 == 0
+    return list(struct.unpack_from(f"<{count}H", message, 64 + 36))
+
+
+@pytest.fixture
+def server():
+    # Answers one connection with whatever the test put in replies
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    state = {"reply": b"", "request": b""}
+
+    def serve():
+        conn, _ = listener.accept()
+        with conn:
+            length = struct.unpack(">I", conn.recv(4, socket.MSG_WAITALL))[0]
+            state["request"] = struct.pack(">I", length) + conn.recv(length, socket.MSG_WAITALL)
+            if state["reply"]:
+                conn.sendall(struct.pack(">I", len(state["reply"])) + state["reply"])
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield listener.getsockname()[1], state
+    listener.close()
+    thread.join(1)
+
+
+def test_request_offers_every_dialect():
+    assert parse_request(build_negotiate_request()) == sorted(DIALECTS)
+
+
+@pytest.mark.parametrize("dialect", sorted(DIALECTS))
+def test_response_round_trip(dialect):
+    assert parse_negotiate_response(negotiate_response(dialect)) == DIALECTS[dialect]
+
+
+def test_smb1_response():
+    assert parse_negotiate_response(b"\xffSMB" + b"\0" * 60) == "1.0"
+
+
+@pytest.mark.parametrize("message", [b"", b"HTTP/1.1 400 Bad Request\r\n", negotiate_response(0x0311, status=0xC0000022)])
+def test_unusable_responses(message):
+    with pytest.raises(ValueError):
+        parse_negotiate_response(message)
+
+
+def test_probe_negotiates_with_server(server):
+    port, state = server
+    state["reply"] = negotiate_response(0x0311)
+
+    result = probe("127.0.0.1", port=port, timeout=5)
+
+    assert result.reachable
+    assert result.dialect == "3.1.1"
+    assert not result.error
+    assert parse_request(state["request"]) == sorted(DIALECTS)
+
+
+def test_probe_of_server_that_hangs_up(server):
+    port, state = server
+
+    result = probe("127.0.0.1", port=port, timeout=5)
+
+    assert result.reachable
+    assert result.error == "No SMB2 response"
+
+
+def test_probe_of_closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    result = probe("127.0.0.1", port=port, timeout=5)
+
+    assert not result.reachable
+    assert result.error == "Connection refused"
+
+
+@pytest.mark.parametrize("host", ["a..b", "x" * 300])
+def test_probe_of_invalid_host_name(host):
+    result = probe(host, timeout=1)
+
+    assert not result.reachable
+    assert result.error
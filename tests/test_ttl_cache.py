@@ -0,0 +1,71 @@
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entry_expires_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_for_negative_results():
+    clock = FakeClock()
+    cache = TTLCache(300, clock=clock)
+    cache.set("ok", (True, []))
+    cache.set("down", (False, "Cannot reach server"), ttl=30)
+
+    clock.now += 30
+    assert cache.get("down") is None
+    assert cache.get("ok") == (True, [])
+
+
+def test_set_refreshes_expiry():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("a", 1)
+    clock.now += 8
+    cache.set("a", 2)
+    clock.now += 8
+
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(10, max_size=2, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_invalidate():
+    cache = TTLCache(10, clock=FakeClock())
+    cache.set(("nas", "user"), 1)
+    cache.set(("nas", ""), 2)
+    cache.set(("backup", "user"), 3)
+
+    cache.invalidate(lambda key: key[0] == "nas")
+    assert cache.get(("nas", "user")) is None
+    assert cache.get(("nas", "")) is None
+    assert cache.get(("backup", "user")) == 3
+
+    cache.invalidate()
+    assert len(cache) == 0
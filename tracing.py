@@ -0,0 +1,201 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+TRACE_MAX_BYTES = 1024 * 1024
+TRACE_BACKUPS = 3
+
+# Error classes, from the most to the least specific. The first whose
+# markers appear in a command's output wins.
+ERROR_CLASSES = [
+    ("timeout", ("timed out", "timeout", "nt_status_io_timeout")),
+    ("auth", ("nt_status_logon_failure", "nt_status_access_denied", "permission denied",
+              "not authorized", "authorization failed", "error(13)")),
+    ("not_found", ("nt_status_bad_network_name", "no such file", "can't find", "error(2)")),
+    ("unreachable", ("host is down", "no route to host", "nt_status_host_unreachable",
+                     "cannot reach server", "network is unreachable", "error(112)", "error(113)")),
+    ("resolve", ("name or service not known", "cannot resolve", "could not resolve")),
+    ("refused", ("connection refused", "nt_status_connection_refused")),
+    ("busy", ("target is busy", "device or resource busy", "error(16)")),
+    ("not_mounted", ("not mounted",)),
+    ("protocol", ("no smb2 response", "not an smb2 response", "negotiate failed",
+                  "protocol negotiation failed")),
+]
+
+
+def classify_error(text: str, exit_code: Optional[int] = None) -> str:
+    # Turns command output into one of a few error classes so spans can be
+    # grouped; "" means success
+    if not text and not exit_code:
+        return ""
+    lower = (text or "").lower()
+    for name, markers in ERROR_CLASSES:
+        if any(marker in lower for marker in markers):
+            return name
+    return "error"
+
+
+@dataclass
+class Span:
+    op: str
+    command: str = ""
+    share_id: str = ""
+    start: float = 0.0
+    duration_ms: float = 0.0
+    exit_code: Optional[int] = None
+    error: str = ""
+    # Last part of the error output, for errors that classify as "error"
+    detail: str = ""
+
+    def fail(self, text: str, exit_code: Optional[int] = None) -> None:
+        self.exit_code = exit_code
+        self.error = classify_error(text, exit_code) or "error"
+        self.detail = (text or "").strip()[-200:]
+
+
+class Tracer:
+    # Appends one JSON line per finished span. The file is rotated to
+    # trace.jsonl.1, .2, ... once it grows past max_bytes; GUI, CLI and
+    # mountyd may all append to the same file.
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = TRACE_MAX_BYTES,
+                 backups: int = TRACE_BACKUPS):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def configure(self, path: Path) -> None:
+        with self._lock:
+            self.path = Path(path)
+
+    def record(self, span: Span) -> None:
+        if self.path is None:
+            return
+        line = json.dumps(asdict(span)) + "\n"
+        with self._lock:
+            try:
+                if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except OSError:
+                # Tracing must never break the operation being traced
+                pass
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+
+    @contextmanager
+    def span(self, op: str, command: str = "", share_id: Optional[str] = None):
+        # Times the block. Callers fill in exit_code/error on the yielded
+        # span; exceptions escaping the block are classified automatically.
+        span = Span(op=op, command=command, share_id=share_id or current_share_id(), start=time.time())
+        started = time.perf_counter()
+        try:
+            yield span
+        except GeneratorExit:
+            # A generator traced from inside was closed early by its consumer
+            raise
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            # Matched by name: job_scheduler imports this module
+            if type(e).__name__ == "JobCancelled":
+                span.error = "cancelled"
+            elif isinstance(e, FileNotFoundError) and op not in FILE_OPS:
+                span.error = "missing_command"
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.record(span)
+
+    def load(self, limit: int = 1000) -> list[Span]:
+        # Most recent spans last, reading into the rotated file if the
+        # current one has fewer than limit lines
+        spans = []
+        if self.path is None:
+            return spans
+        paths = [self.path] + [self.path.with_name(f"{self.path.name}.{i}") for i in range(1, self.backups + 1)]
+        for path in paths:
+            try:
+                with open(path, 'r') as f:
+                    lines = f.readlines()
+            except OSError:
+                break
+            batch = []
+            for line in lines[-(limit - len(spans)):]:
+                try:
+                    batch.append(Span(**json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+            spans = batch + spans
+            if len(spans) >= limit:
+                break
+        return spans[-limit:]
+
+
+# Ops that touch local files rather than running a command
+FILE_OPS = {"read_mountinfo", "read_fstab", "write_credentials", "store_load", "store_write"}
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(spans: list[Span]) -> dict[str, dict]:
+    # op -> {"count", "errors", "p50_ms", "p95_ms", "max_ms"}
+    by_op: dict[str, list[Span]] = {}
+    for span in spans:
+        by_op.setdefault(span.op, []).append(span)
+    summary = {}
+    for op, op_spans in sorted(by_op.items()):
+        durations = sorted(s.duration_ms for s in op_spans)
+        summary[op] = {
+            "count": len(op_spans),
+            "errors": sum(1 for s in op_spans if s.error),
+            "p50_ms": round(_percentile(durations, 0.5), 1),
+            "p95_ms": round(_percentile(durations, 0.95), 1),
+            "max_ms": round(durations[-1], 1),
+        }
+    return summary
+
+
+_context = threading.local()
+
+
+def current_share_id() -> str:
+    return getattr(_context, "share_id", "")
+
+
+@contextmanager
+def share_context(share_id: str):
+    # Spans started in this thread inside the block carry share_id
+    previous = current_share_id()
+    _context.share_id = share_id
+    try:
+        yield
+    finally:
+        _context.share_id = previous
+
+
+def for_share(method):
+    # Decorator for ShareManager methods whose first argument is a Share
+    @functools.wraps(method)
+    def wrapper(self, share, *args, **kwargs):
+        with share_context(share.id):
+            return method(self, share, *args, **kwargs)
+    return wrapper
+
+
+tracer = Tracer()
+span = tracer.span
@@ -0,0 +1,114 @@
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Gtk, Adw
+
+from share_manager import AUTOMOUNT_BACKENDS, AutomountSettings, ShareManager
+
+
+class AutomountDialog(Adw.Dialog):
+    # How automount shares are written to fstab. Saving rewrites the
+    # entries of every automount share in one privileged batch.
+    def __init__(self, parent: Gtk.Window, share_manager: ShareManager):
+        super().__init__()
+
+        self.parent_window = parent
+        self.share_manager = share_manager
+        self.settings = share_manager.load_automount_settings()
+
+        self.set_title("Automount Settings")
+        self.set_content_width(480)
+
+        self._build_ui()
+        self._on_backend_changed(self.backend_row, None)
+
+    def _build_ui(self):
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.set_child(main_box)
+
+        header = Adw.HeaderBar()
+        header.set_show_end_title_buttons(False)
+        header.set_show_start_title_buttons(False)
+
+        cancel_btn = Gtk.Button(label="Cancel")
+        cancel_btn.connect("clicked", lambda _: self.close())
+        header.pack_start(cancel_btn)
+
+        self.save_btn = Gtk.Button(label="Save")
+        self.save_btn.add_css_class("suggested-action")
+        self.save_btn.connect("clicked", self._on_save)
+        header.pack_end(self.save_btn)
+
+        main_box.append(header)
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=24)
+        content.set_margin_start(24)
+        content.set_margin_end(24)
+        content.set_margin_top(24)
+        content.set_margin_bottom(24)
+        main_box.append(content)
+
+        backend_group = Adw.PreferencesGroup()
+        backend_group.set_title("Mount Automount Shares")
+        content.append(backend_group)
+
+        self.backend_row = Adw.ComboRow()
+        self.backend_row.set_title("When")
+        self.backend_row.set_model(Gtk.StringList.new(["At boot", "On first access (systemd)"]))
+        self.backend_row.set_selected(AUTOMOUNT_BACKENDS.index(self.settings.backend))
+        self.backend_row.connect("notify::selected", self._on_backend_changed)
+        backend_group.add(self.backend_row)
+
+        self.timeouts_group = Adw.PreferencesGroup()
+        self.timeouts_group.set_title("On-Demand Timeouts")
+        self.timeouts_group.set_description(
+            "Boot no longer waits for any share; each one is mounted when first opened"
+        )
+        content.append(self.timeouts_group)
+
+        self.idle_row = self._spin_row(
+            "Unmount When Idle For", "Seconds; 0 keeps shares mounted", 0, 86400, self.settings.idle_timeout
+        )
+        self.mount_timeout_row = self._spin_row(
+            "Mount Timeout", "Seconds to wait for the server", 1, 600, self.settings.mount_timeout
+        )
+        self.device_timeout_row = self._spin_row(
+            "Device Timeout", "Seconds to wait for the network", 1, 600, self.settings.device_timeout
+        )
+
+    def _spin_row(self, title: str, subtitle: str, lower: int, upper: int, value: int) -> Adw.SpinRow:
+        row = Adw.SpinRow.new_with_range(lower, upper, 1)
+        row.set_title(title)
+        row.set_subtitle(subtitle)
+        row.set_value(value)
+        self.timeouts_group.add(row)
+        return row
+
+    def _on_backend_changed(self, row, pspec):
+        self.timeouts_group.set_sensitive(AUTOMOUNT_BACKENDS[row.get_selected()] == "systemd")
+
+    def _on_save(self, button):
+        settings = AutomountSettings(
+            backend=AUTOMOUNT_BACKENDS[self.backend_row.get_selected()],
+            idle_timeout=int(self.idle_row.get_value()),
+            mount_timeout=int(self.mount_timeout_row.get_value()),
+            device_timeout=int(self.device_timeout_row.get_value()),
+        )
+        if settings == self.settings:
+            self.close()
+            return
+
+        self.save_btn.set_sensitive(False)
+        self.parent_window.scheduler.submit(
+            self.share_manager.apply_automount_settings, settings,
+            key=("automount-settings",),
+            callback=lambda result: self._on_save_complete(*result)
+        )
+
+    def _on_save_complete(self, success: bool, message: str):
+        self.save_btn.set_sensitive(True)
+        self.parent_window.show_toast(message)
+        if success:
+            self.parent_window.refresh_shares()
+            self.close()
+        return False
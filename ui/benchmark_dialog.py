@@ -0,0 +1,209 @@
+import time
+
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Gtk, Adw, GLib
+
+from mount_options import PROFILE_LABELS
+from share_benchmark import PHASES, BenchmarkResult, BenchmarkSettings
+from share_manager import Share, ShareManager
+
+
+class BenchmarkDialog(Adw.Dialog):
+    # Runs share_benchmark on a mounted share and lists earlier results of
+    # the same share side by side, so mount profiles can be compared
+    COLUMNS = [
+        ("When", None),
+        ("Profile", None),
+        ("Write", "write_mb_s"),
+        ("Read", "read_mb_s"),
+        ("Create/s", "create_per_s"),
+        ("Stat/s", "stat_per_s"),
+        ("Delete/s", "delete_per_s"),
+        ("List", "list_p50_ms"),
+    ]
+    PHASE_LABELS = {
+        "write": "Writing",
+        "read": "Reading",
+        "create": "Creating small files",
+        "list": "Listing directory",
+        "stat": "Reading file attributes",
+        "delete": "Deleting small files",
+    }
+
+    def __init__(self, parent: Gtk.Window, share_manager: ShareManager, share: Share):
+        super().__init__()
+
+        self.parent_window = parent
+        self.share_manager = share_manager
+        self.share = share
+        self.job = None
+
+        self.set_title("Benchmark")
+        self.set_content_width(640)
+        self.set_content_height(560)
+
+        self._build_ui()
+        self.connect("closed", self._on_closed)
+        self._show_results()
+
+    def _build_ui(self):
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.set_child(main_box)
+
+        header = Adw.HeaderBar()
+        main_box.append(header)
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        content.set_margin_start(24)
+        content.set_margin_end(24)
+        content.set_margin_top(12)
+        content.set_margin_bottom(24)
+        main_box.append(content)
+
+        settings_group = Adw.PreferencesGroup()
+        settings_group.set_title(self.share.unc_path)
+        settings_group.set_description(
+            f"Runs in a temporary folder on {self.share.mount_point}, which is removed afterwards"
+        )
+        content.append(settings_group)
+
+        defaults = BenchmarkSettings()
+        self.file_size_row = Adw.SpinRow.new_with_range(1, 4096, 16)
+        self.file_size_row.set_title("Sequential File Size")
+        self.file_size_row.set_subtitle("Megabytes written, then read back")
+        self.file_size_row.set_value(defaults.file_size_mb)
+        settings_group.add(self.file_size_row)
+
+        self.small_files_row = Adw.SpinRow.new_with_range(10, 10000, 50)
+        self.small_files_row.set_title("Small Files")
+        self.small_files_row.set_subtitle("Created, listed, checked and deleted in parallel")
+        self.small_files_row.set_value(defaults.small_files)
+        settings_group.add(self.small_files_row)
+
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        button_box.set_halign(Gtk.Align.CENTER)
+
+        self.run_btn = Gtk.Button(label="Run Benchmark")
+        self.run_btn.add_css_class("pill")
+        self.run_btn.add_css_class("suggested-action")
+        self.run_btn.connect("clicked", self._on_run)
+        button_box.append(self.run_btn)
+
+        self.cancel_btn = Gtk.Button(label="Cancel")
+        self.cancel_btn.add_css_class("pill")
+        self.cancel_btn.set_visible(False)
+        self.cancel_btn.connect("clicked", lambda _: self._cancel())
+        button_box.append(self.cancel_btn)
+        content.append(button_box)
+
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_show_text(True)
+        self.progress_bar.set_visible(False)
+        content.append(self.progress_bar)
+
+        results_label = Gtk.Label(label="Results")
+        results_label.add_css_class("heading")
+        results_label.set_xalign(0)
+        content.append(results_label)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_vexpand(True)
+        self.results_grid = Gtk.Grid()
+        self.results_grid.set_column_spacing(16)
+        self.results_grid.set_row_spacing(4)
+        scrolled.set_child(self.results_grid)
+        content.append(scrolled)
+
+    def _show_results(self):
+        while child := self.results_grid.get_first_child():
+            self.results_grid.remove(child)
+
+        results = self.share_manager.get_benchmarks(self.share)
+        if not results:
+            empty = Gtk.Label(label="No results yet")
+            empty.add_css_class("dim-label")
+            self.results_grid.attach(empty, 0, 0, 1, 1)
+            return
+
+        for column, (heading, _) in enumerate(self.COLUMNS):
+            label = Gtk.Label(label=heading, xalign=0 if column < 2 else 1)
+            label.add_css_class("caption")
+            self.results_grid.attach(label, column, 0, 1, 1)
+
+        for row, result in enumerate(reversed(results), start=1):
+            for column, value in enumerate(self._row_values(result)):
+                label = Gtk.Label(label=value, xalign=0 if column < 2 else 1)
+                if column == 1:
+                    label.set_tooltip_text(result.options or None)
+                self.results_grid.attach(label, column, row, 1, 1)
+
+    def _row_values(self, result: BenchmarkResult) -> list[str]:
+        values = []
+        for heading, name in self.COLUMNS:
+            if heading == "When":
+                values.append(time.strftime("%Y-%m-%d %H:%M", time.localtime(result.started)))
+            elif heading == "Profile":
+                values.append(PROFILE_LABELS.get(result.profile, result.profile))
+            elif name.endswith("_mb_s"):
+                values.append(f"{getattr(result, name):.1f} MB/s")
+            elif name.endswith("_ms"):
+                values.append(f"{getattr(result, name):.1f} ms")
+            else:
+                values.append(f"{getattr(result, name):.0f}")
+        return values
+
+    def _on_run(self, button):
+        settings = BenchmarkSettings(
+            file_size_mb=int(self.file_size_row.get_value()),
+            small_files=int(self.small_files_row.get_value()),
+        )
+        self._set_running(True)
+        self.progress_bar.set_fraction(0)
+        self.progress_bar.set_text(self.PHASE_LABELS[PHASES[0][0]])
+
+        self.job = self.parent_window.scheduler.submit(
+            self.share_manager.benchmark_share, self.share, settings, self._on_progress,
+            key=("benchmark", self.share.id),
+            callback=lambda result: self._on_complete(*result)
+        )
+
+    def _on_progress(self, phase: str, fraction: float):
+        # Called on the worker thread
+        GLib.idle_add(self._update_progress, phase, fraction)
+
+    def _update_progress(self, phase: str, fraction: float):
+        self.progress_bar.set_fraction(fraction)
+        self.progress_bar.set_text(self.PHASE_LABELS[phase])
+        return False
+
+    def _on_complete(self, success: bool, result):
+        if self.job is None:
+            # Cancelled from the dialog, which has already been reset
+            return False
+        self.job = None
+        self._set_running(False)
+        if success:
+            self._show_results()
+        else:
+            self.parent_window.show_toast(result)
+        return False
+
+    def _set_running(self, running: bool):
+        self.run_btn.set_visible(not running)
+        self.cancel_btn.set_visible(running)
+        self.progress_bar.set_visible(running)
+        self.file_size_row.set_sensitive(not running)
+        self.small_files_row.set_sensitive(not running)
+
+    def _cancel(self):
+        # The benchmark removes its scratch folder before the job ends
+        if self.job is not None:
+            self.parent_window.scheduler.cancel(self.job)
+            self.job = None
+        self._set_running(False)
+
+    def _on_closed(self, dialog):
+        self._cancel()
@@ -0,0 +1,122 @@
+import time
+
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+from gi.repository import Gtk, Pango
+
+import tracing
+
+
+class DebugPage(Gtk.Box):
+    # Hidden page (Ctrl+Shift+D) listing recent trace spans from every
+    # Mounty process and p50/p95 latency per operation
+    RECENT_LIMIT = 200
+    SUMMARY_LIMIT = 2000
+
+    def __init__(self, main_window):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        self.main_window = main_window
+        self.set_margin_start(12)
+        self.set_margin_end(12)
+        self.set_margin_top(8)
+        self.set_margin_bottom(12)
+
+        top_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        title = Gtk.Label(label="Operation Timings")
+        title.add_css_class("heading")
+        title.set_xalign(0)
+        title.set_hexpand(True)
+        top_row.append(title)
+
+        self.path_label = Gtk.Label()
+        self.path_label.add_css_class("caption")
+        self.path_label.set_ellipsize(Pango.EllipsizeMode.START)
+        self.path_label.set_selectable(True)
+        top_row.append(self.path_label)
+
+        refresh_btn = Gtk.Button()
+        refresh_btn.set_icon_name("view-refresh-symbolic")
+        refresh_btn.set_tooltip_text("Reload Trace")
+        refresh_btn.connect("clicked", lambda _: self.refresh())
+        top_row.append(refresh_btn)
+        self.append(top_row)
+
+        self.summary_grid = Gtk.Grid()
+        self.summary_grid.set_column_spacing(24)
+        self.summary_grid.set_row_spacing(4)
+        self.summary_grid.add_css_class("card")
+        self.summary_grid.set_margin_bottom(4)
+        self.append(self.summary_grid)
+
+        recent_label = Gtk.Label(label="Recent Spans")
+        recent_label.add_css_class("heading")
+        recent_label.set_xalign(0)
+        self.append(recent_label)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_vexpand(True)
+        self.recent_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        scrolled.set_child(self.recent_box)
+        self.append(scrolled)
+
+    def refresh(self):
+        path = tracing.tracer.path
+        self.path_label.set_label(str(path) if path else "Tracing disabled")
+        # The trace file can be a few megabytes; parse it off the main loop
+        self.main_window.scheduler.submit(
+            tracing.tracer.load, self.SUMMARY_LIMIT,
+            key=("debug-trace",),
+            callback=self._show,
+            errback=lambda error: self._show([])
+        )
+
+    def _show(self, spans: list[tracing.Span]):
+        while child := self.summary_grid.get_first_child():
+            self.summary_grid.remove(child)
+        while child := self.recent_box.get_first_child():
+            self.recent_box.remove(child)
+
+        headings = ["Operation", "Count", "Errors", "p50", "p95", "Max"]
+        for column, heading in enumerate(headings):
+            label = Gtk.Label(label=heading, xalign=0 if column == 0 else 1)
+            label.add_css_class("caption")
+            self.summary_grid.attach(label, column, 0, 1, 1)
+
+        for row, (op, stats) in enumerate(tracing.summarize(spans).items(), start=1):
+            values = [
+                op, str(stats["count"]), str(stats["errors"]),
+                f"{stats['p50_ms']:.1f} ms", f"{stats['p95_ms']:.1f} ms", f"{stats['max_ms']:.1f} ms",
+            ]
+            for column, value in enumerate(values):
+                label = Gtk.Label(label=value, xalign=0 if column == 0 else 1)
+                if column == 2 and stats["errors"]:
+                    label.add_css_class("error")
+                self.summary_grid.attach(label, column, row, 1, 1)
+
+        if not spans:
+            empty = Gtk.Label(label="No spans recorded yet")
+            empty.add_css_class("dim-label")
+            empty.set_xalign(0)
+            self.recent_box.append(empty)
+            return
+
+        for span in reversed(spans[-self.RECENT_LIMIT:]):
+            when = time.strftime("%H:%M:%S", time.localtime(span.start))
+            text = f"{when}  {span.op:<18} {span.duration_ms:>9.1f} ms"
+            if span.share_id:
+                text += f"  [{span.share_id}]"
+            if span.error:
+                text += f"  {span.error} (exit {span.exit_code})"
+            text += f"  {span.command}"
+            label = Gtk.Label(label=text)
+            label.add_css_class("fstab-entry")
+            if span.error:
+                label.add_css_class("error")
+            label.set_xalign(0)
+            label.set_selectable(True)
+            label.set_ellipsize(Pango.EllipsizeMode.END)
+            if span.detail:
+                label.set_tooltip_text(span.detail)
+            self.recent_box.append(label)
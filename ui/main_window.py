@@ -1,27 +1,144 @@
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, Gio
+from gi.repository import Gtk, Adw, Gio, GLib, GObject
 
-from share_manager import ShareManager
+from health_monitor import HealthMonitor
+from job_scheduler import JobCancelled, JobScheduler, Priority
+from mount_table import MountWatcher, normalize_mount_point
+from daemon_client import open_share_manager
+from ui.share_list import ShareFilter, ShareList, ShareSort
 from ui.share_row import ShareRow
-from ui.share_dialog import ShareDialog
 
 
 class MainWindow(Adw.ApplicationWindow):
+    # Emitted once mount status and fstab state have been filled in after
+    # startup; used by benchmarks/startup.py
+    __gsignals__ = {
+        "populated": (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+    
     def __init__(self, app: Adw.Application):
         super().__init__(application=app)
         
-        self.share_manager = ShareManager()
+        # Thin client of mountyd when it is running
+        self.share_manager = open_share_manager()
+        self.scheduler = JobScheduler(dispatch=GLib.idle_add)
+        self.share_list = ShareList(self.share_manager)
+        self._fstab_lines = None
+        self.mount_watcher = None
+        self.health_monitor = None
+        self.selected_ids: set[str] = set()
+        self._bulk_running = False
         
         self.set_title("Mounty")
         self.set_default_size(900, 750)
         self.set_size_request(900, 750)  # Minimum size
         self.set_resizable(False)  # Fixed size, no maximize
         
+        self._build_actions()
         self._build_ui()
         self._load_css()
-        self.refresh_shares()
+        self.connect("close-request", self._on_close_request)
+        
+        # Rows appear straight away with a placeholder status; mount state
+        # and fstab are read off the main thread so the first frame is not
+        # held up by I/O
+        self.share_list.sync(self.share_manager.shares)
+        self._update_list_page()
+        self.scheduler.submit(
+            self._load_initial_state,
+            key=("initial-state",),
+            callback=lambda result: self._on_initial_state(*result),
+            errback=self._on_initial_state_failed
+        )
+    
+    def _load_initial_state(self):
+        return (
+            self.share_manager.get_mount_snapshot(),
+            self.share_manager.get_fstab_entries(),
+            bool(self.share_manager.get_session_shares()),
+        )
+    
+    def _on_initial_state(self, mount_table, fstab_entries: list[str], restore: bool):
+        self._start_monitoring()
+        self.share_list.update_all_status(mount_table)
+        self._show_fstab_entries(fstab_entries)
+        
+        if restore:
+            self._run_bulk("Restoring mounts", self.share_manager.restore_session, Priority.BACKGROUND)
+        self.emit("populated")
+    
+    def _on_initial_state_failed(self, error: Exception):
+        # Rows keep their placeholder status until the watcher reports a
+        # change; mounts from the last session are not restored on a guess
+        if isinstance(error, JobCancelled):
+            # Only happens when the window is closing
+            return False
+        self._start_monitoring()
+        self.show_toast(f"Could not read mount state: {error}")
+        self.emit("populated")
+        return False
+    
+    def _start_monitoring(self):
+        self.mount_watcher = MountWatcher(
+            lambda changed, table: GLib.idle_add(self._on_mounts_changed, changed, table),
+            self.share_manager.MOUNTINFO_PATH
+        )
+        self.mount_watcher.start()
+        
+        self.health_monitor = HealthMonitor(
+            self.share_manager,
+            lambda share_id, health: GLib.idle_add(self.share_list.set_health, share_id, health),
+            auto_recover=self.share_manager.load_session()["auto_recover"],
+            recover_callback=lambda share_id, ok, message: GLib.idle_add(
+                self._on_recovered, share_id, ok, message
+            ),
+        )
+        self.health_monitor.start()
+        
+        subscribe = getattr(self.share_manager, "subscribe", None)
+        if subscribe is not None:
+            # Shares edited from mounty-cli or another window show up here
+            subscribe(lambda event: GLib.idle_add(self._on_daemon_event, event))
+    
+    def _build_actions(self):
+        for name, label, method in (
+            ("mount-all", "Mounting", self.share_manager.mount_all),
+            ("unmount-all", "Unmounting", self.share_manager.unmount_all),
+            ("mount-selected", "Mounting", self._mount_selected),
+            ("automount-selected", "Enabling automount",
+             lambda progress: self._set_automount_selected(True, progress)),
+            ("remove-automount-selected", "Disabling automount",
+             lambda progress: self._set_automount_selected(False, progress)),
+        ):
+            action = Gio.SimpleAction.new(name, None)
+            action.connect("activate", lambda _a, _p, label=label, method=method: self._run_bulk(label, method))
+            self.add_action(action)
+        
+        restore = self.share_manager.load_session()["restore_on_launch"]
+        restore_action = Gio.SimpleAction.new_stateful(
+            "restore-session", None, GLib.Variant.new_boolean(restore)
+        )
+        restore_action.connect("change-state", self._on_restore_session_changed)
+        self.add_action(restore_action)
+        
+        settings_action = Gio.SimpleAction.new("automount-settings", None)
+        settings_action.connect("activate", lambda *_: self._on_automount_settings())
+        self.add_action(settings_action)
+        
+        auto_recover = self.share_manager.load_session()["auto_recover"]
+        recover_action = Gio.SimpleAction.new_stateful(
+            "auto-recover", None, GLib.Variant.new_boolean(auto_recover)
+        )
+        recover_action.connect("change-state", self._on_auto_recover_changed)
+        self.add_action(recover_action)
+        
+        # Not in the menu: a page for diagnosing slow operations
+        debug_action = Gio.SimpleAction.new("toggle-debug", None)
+        debug_action.connect("activate", lambda *_: self._toggle_debug_page())
+        self.add_action(debug_action)
+        self.get_application().set_accels_for_action("win.toggle-debug", ["<Ctrl><Shift>d"])
     
     def _build_ui(self):
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
@@ -47,68 +164,158 @@ class MainWindow(Adw.ApplicationWindow):
         menu_btn.set_tooltip_text("Menu")
         
         menu = Gio.Menu()
-        menu.append("About Mounty", "app.about")
+        bulk_section = Gio.Menu()
+        bulk_section.append("Mount All", "win.mount-all")
+        bulk_section.append("Mount Selected", "win.mount-selected")
+        bulk_section.append("Unmount All", "win.unmount-all")
+        menu.append_section(None, bulk_section)
+        automount_section = Gio.Menu()
+        automount_section.append("Automount Selected", "win.automount-selected")
+        automount_section.append("Remove Automount for Selected", "win.remove-automount-selected")
+        automount_section.append("Automount Settings…", "win.automount-settings")
+        menu.append_section(None, automount_section)
+        session_section = Gio.Menu()
+        session_section.append("Restore Mounts on Launch", "win.restore-session")
+        session_section.append("Reconnect Stale Mounts Automatically", "win.auto-recover")
+        menu.append_section(None, session_section)
+        about_section = Gio.Menu()
+        about_section.append("About Mounty", "app.about")
+        menu.append_section(None, about_section)
         menu_btn.set_menu_model(menu)
         header.pack_end(menu_btn)
         
         main_box.append(header)
+        
+        self.progress_revealer = Gtk.Revealer()
+        progress_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        progress_box.set_margin_start(12)
+        progress_box.set_margin_end(12)
+        progress_box.set_margin_top(8)
+        progress_box.set_margin_bottom(8)
+        self.progress_label = Gtk.Label()
+        self.progress_label.add_css_class("caption")
+        self.progress_label.set_xalign(0)
+        progress_box.append(self.progress_label)
+        self.progress_bar = Gtk.ProgressBar()
+        progress_box.append(self.progress_bar)
+        self.progress_revealer.set_child(progress_box)
+        main_box.append(self.progress_revealer)
+        
+        self.page_stack = Gtk.Stack()
+        self.page_stack.set_vexpand(True)
+        main_box.append(self.page_stack)
+        shares_page = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        self.page_stack.add_named(shares_page, "shares")
 
+        filter_bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        filter_bar.set_margin_start(12)
+        filter_bar.set_margin_end(12)
+        filter_bar.set_margin_top(8)
+        filter_bar.set_margin_bottom(4)
+        
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search shares")
+        self.search_entry.set_hexpand(True)
+        self.search_entry.connect(
+            "search-changed", lambda entry: self.share_list.set_search(entry.get_text())
+        )
+        filter_bar.append(self.search_entry)
+        
+        self._filter_modes = [ShareFilter.ALL, ShareFilter.MOUNTED, ShareFilter.NOT_MOUNTED, ShareFilter.AUTOMOUNT]
+        filter_dropdown = Gtk.DropDown.new_from_strings(["All Shares", "Mounted", "Not Mounted", "Automount"])
+        filter_dropdown.set_tooltip_text("Filter")
+        filter_dropdown.connect(
+            "notify::selected",
+            lambda d, _p: self.share_list.set_filter_mode(self._filter_modes[d.get_selected()])
+        )
+        filter_bar.append(filter_dropdown)
+        
+        self._sort_modes = [ShareSort.SERVER, ShareSort.STATUS, ShareSort.AUTOMOUNT]
+        sort_dropdown = Gtk.DropDown.new_from_strings(["Sort by Server", "Sort by Status", "Sort by Automount"])
+        sort_dropdown.set_tooltip_text("Sort")
+        sort_dropdown.connect(
+            "notify::selected",
+            lambda d, _p: self.share_list.set_sort_mode(self._sort_modes[d.get_selected()])
+        )
+        filter_bar.append(sort_dropdown)
+        
+        shares_page.append(filter_bar)
+        
         self.toast_overlay = Adw.ToastOverlay()
-        main_box.append(self.toast_overlay)
+        shares_page.append(self.toast_overlay)
         self.toast_overlay.set_vexpand(True)
         
-        scrolled = Gtk.ScrolledWindow()
-        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-        scrolled.set_vexpand(True)
-        self.toast_overlay.set_child(scrolled)
+        self.list_stack = Gtk.Stack()
+        self.toast_overlay.set_child(self.list_stack)
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", lambda _f, list_item: list_item.set_child(ShareRow(self.share_manager, self)))
+        factory.connect("bind", lambda _f, list_item: list_item.get_child().bind(list_item.get_item()))
+        factory.connect("unbind", lambda _f, list_item: list_item.get_child().unbind())
         
-        clamp = Adw.Clamp()
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.share_list.model), factory=factory)
+        self.list_view.add_css_class("share-list")
+        self.list_view.set_margin_top(6)
+        self.list_view.set_margin_bottom(6)
+        
+        # ClampScrollable keeps the ListView directly scrollable, so only
+        # the visible rows are ever instantiated
+        clamp = Adw.ClampScrollable()
         clamp.set_maximum_size(800)
         clamp.set_tightening_threshold(600)
-        scrolled.set_child(clamp)
+        clamp.set_child(self.list_view)
         
-        self.content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-        self.content_box.set_margin_top(12)
-        self.content_box.set_margin_bottom(12)
-        clamp.set_child(self.content_box)
-        
-        self.share_list = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-        self.content_box.append(self.share_list)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_vexpand(True)
+        scrolled.set_child(clamp)
+        self.list_stack.add_named(scrolled, "list")
         
         self.empty_state = Adw.StatusPage()
         self.empty_state.set_icon_name("folder-remote-symbolic")
         self.empty_state.set_title("No Shares")
         self.empty_state.set_description("Click the + button to add a network share")
-        self.empty_state.set_visible(False)
-        self.content_box.append(self.empty_state)
+        self.list_stack.add_named(self.empty_state, "empty")
+        
+        no_results = Adw.StatusPage()
+        no_results.set_icon_name("system-search-symbolic")
+        no_results.set_title("No Matching Shares")
+        self.list_stack.add_named(no_results, "no-results")
+        
+        self.share_list.model.connect("items-changed", lambda *_: self._update_list_page())
+        
+        self.content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.content_box.set_margin_bottom(12)
+        shares_page.append(self.content_box)
         
         self._build_fstab_section()
+        self.debug_page = None
     
     def _build_fstab_section(self):
         separator = Gtk.Separator()
-        separator.set_margin_top(24)
         separator.set_margin_bottom(12)
         separator.set_margin_start(12)
         separator.set_margin_end(12)
         self.content_box.append(separator)
         
-        fstab_header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
-        fstab_header.set_margin_start(12)
-        fstab_header.set_margin_end(12)
-        
         fstab_label = Gtk.Label(label="Automount Entries (fstab)")
         fstab_label.add_css_class("heading")
-        fstab_label.set_xalign(0)
-        fstab_label.set_hexpand(True)
-        fstab_header.append(fstab_label)
         
-        self.content_box.append(fstab_header)
+        fstab_expander = Gtk.Expander()
+        fstab_expander.set_label_widget(fstab_label)
+        fstab_expander.set_margin_start(12)
+        fstab_expander.set_margin_end(12)
+        self.content_box.append(fstab_expander)
+        
+        fstab_scrolled = Gtk.ScrolledWindow()
+        fstab_scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        fstab_scrolled.set_propagate_natural_height(True)
+        fstab_scrolled.set_max_content_height(200)
+        fstab_expander.set_child(fstab_scrolled)
         
         self.fstab_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
-        self.fstab_box.set_margin_start(12)
-        self.fstab_box.set_margin_end(12)
         self.fstab_box.set_margin_top(8)
-        self.content_box.append(self.fstab_box)
+        fstab_scrolled.set_child(self.fstab_box)
     
     def _load_css(self):
         css = b"""
@@ -148,6 +355,9 @@ class MainWindow(Adw.ApplicationWindow):
             border-radius: 6px;
         }
         
+        .share-list, .share-list > row { background: none; }
+        .share-list > row { padding: 0; }
+        
         .loading-overlay {
             background-color: alpha(@window_bg_color, 0.7);
             border-radius: 12px;
@@ -164,29 +374,146 @@ class MainWindow(Adw.ApplicationWindow):
     
     def refresh_shares(self):
         self.share_manager.load_shares()
+        self.share_list.sync(self.share_manager.shares, self.share_manager.get_mount_snapshot())
+        self._update_list_page()
+        self._refresh_fstab_entries()
+    
+    def refresh_status(self, mount_points: list[str]):
+        mount_table = self.share_manager.get_mount_snapshot()
+        self.share_list.update_status({normalize_mount_point(mp) for mp in mount_points}, mount_table)
+    
+    def _update_list_page(self):
+        if len(self.share_list) == 0:
+            self.list_stack.set_visible_child_name("empty")
+        elif self.share_list.model.get_n_items() == 0:
+            self.list_stack.set_visible_child_name("no-results")
+        else:
+            self.list_stack.set_visible_child_name("list")
+    
+    def _on_daemon_event(self, event: dict):
+        if event.get("event") == "shares-changed":
+            self.refresh_shares()
+        return False
+    
+    def _on_mounts_changed(self, changed: set[str], mount_table):
+        self.share_manager.set_mount_snapshot(mount_table)
+        self.share_list.update_status(changed, mount_table)
+        if self.health_monitor:
+            self.health_monitor.check_now()
+        return False
+    
+    def _on_recovered(self, share_id: str, success: bool, message: str):
+        share = self.share_manager.get_share(share_id)
+        if success and share:
+            self.show_toast(f"Reconnected {share.unc_path}")
+        return False
+    
+    def is_share_selected(self, share) -> bool:
+        return share.id in self.selected_ids
+    
+    def set_share_selected(self, share, selected: bool):
+        if selected:
+            self.selected_ids.add(share.id)
+        else:
+            self.selected_ids.discard(share.id)
+    
+    def _mount_selected(self, progress_callback):
+        shares = [s for s in map(self.share_manager.get_share, self.selected_ids) if s]
+        return self.share_manager.mount_shares(shares, progress_callback)
+    
+    def _set_automount_selected(self, enabled: bool, progress_callback):
+        # One fstab write and one authorization for the whole selection
+        shares = [
+            s for s in map(self.share_manager.get_share, self.selected_ids)
+            if s and s.automounted != enabled
+        ]
+        if not shares:
+            return {}
+        result = self.share_manager.set_automount(shares, enabled)
+        progress_callback(len(shares), len(shares), None, result)
+        return {share.id: result for share in shares}
+    
+    def _on_restore_session_changed(self, action, value):
+        action.set_state(value)
+        self.share_manager.set_restore_on_launch(value.get_boolean())
+    
+    def _on_auto_recover_changed(self, action, value):
+        action.set_state(value)
+        self.share_manager.set_auto_recover(value.get_boolean())
+        if self.health_monitor:
+            self.health_monitor.auto_recover = value.get_boolean()
+            self.health_monitor.check_now()
+    
+    def _run_bulk(self, label: str, method, priority: Priority = Priority.USER):
+        if self._bulk_running:
+            self.show_toast("Another bulk operation is already running")
+            return
+        self._bulk_running = True
+        self.progress_label.set_text(f"{label}...")
+        self.progress_bar.set_fraction(0)
+        self.progress_revealer.set_reveal_child(True)
         
-        while child := self.share_list.get_first_child():
-            self.share_list.remove(child)
+        def on_progress(done, total, share, result):
+            GLib.idle_add(self._on_bulk_progress, label, done, total)
         
-        if self.share_manager.shares:
-            self.empty_state.set_visible(False)
-            self.share_list.set_visible(True)
-            
-            for share in self.share_manager.shares:
-                row = ShareRow(share, self.share_manager, self)
-                self.share_list.append(row)
-        else:
-            self.empty_state.set_visible(True)
-            self.share_list.set_visible(False)
+        self.scheduler.submit(
+            method, on_progress,
+            key=("bulk",),
+            priority=priority,
+            callback=lambda results: self._on_bulk_complete(label, results),
+            errback=lambda error: self._on_bulk_failed(label, error)
+        )
+    
+    def _on_bulk_progress(self, label: str, done: int, total: int):
+        self.progress_label.set_text(f"{label} {done}/{total}")
+        self.progress_bar.set_fraction(done / total)
+        return False
+    
+    def _on_bulk_complete(self, label: str, results: dict):
+        self._bulk_running = False
+        self.progress_revealer.set_reveal_child(False)
         
-        self._refresh_fstab_entries()
+        # Bulk actions can change automount flags and fstab, not just mounts
+        self.refresh_shares()
+        
+        failed = [msg for ok, msg in results.values() if not ok]
+        if not results:
+            self.show_toast("Nothing to do")
+        elif failed:
+            self.show_toast(f"{len(failed)} of {len(results)} failed: {failed[0]}")
+        else:
+            self.show_toast(f"{len(results)} share{'s' if len(results) != 1 else ''} done")
+        return False
+    
+    def _on_bulk_failed(self, label: str, error: Exception):
+        self._bulk_running = False
+        self.progress_revealer.set_reveal_child(False)
+        self.refresh_shares()
+        if not isinstance(error, JobCancelled):
+            self.show_toast(f"{label} failed: {error}")
+        return False
+    
+    def _on_close_request(self, window):
+        self.share_manager.remember_mounted_shares()
+        if self.mount_watcher:
+            self.mount_watcher.stop()
+        if self.health_monitor:
+            self.health_monitor.stop()
+        self.scheduler.shutdown()
+        self.share_manager.close()
+        return False
     
     def _refresh_fstab_entries(self):
+        self._show_fstab_entries(self.share_manager.get_fstab_entries())
+    
+    def _show_fstab_entries(self, entries: list[str]):
+        if entries == self._fstab_lines:
+            return
+        self._fstab_lines = entries
+        
         while child := self.fstab_box.get_first_child():
             self.fstab_box.remove(child)
         
-        entries = self.share_manager.get_fstab_entries()
-        
         if entries:
             for entry in entries:
                 label = Gtk.Label(label=entry)
@@ -201,7 +528,24 @@ class MainWindow(Adw.ApplicationWindow):
             no_entries.set_xalign(0)
             self.fstab_box.append(no_entries)
     
+    def _toggle_debug_page(self):
+        if self.page_stack.get_visible_child_name() == "debug":
+            self.page_stack.set_visible_child_name("shares")
+            return
+        if self.debug_page is None:
+            from ui.debug_page import DebugPage
+            self.debug_page = DebugPage(self)
+            self.page_stack.add_named(self.debug_page, "debug")
+        self.debug_page.refresh()
+        self.page_stack.set_visible_child_name("debug")
+    
+    def _on_automount_settings(self):
+        from ui.automount_dialog import AutomountDialog
+        dialog = AutomountDialog(self, self.share_manager)
+        dialog.present(self)
+    
     def _on_add_clicked(self, button):
+        from ui.share_dialog import ShareDialog
         dialog = ShareDialog(self, self.share_manager)
         dialog.present(self)
     
@@ -3,8 +3,10 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, GLib
 
-import threading
-
+from job_scheduler import Priority
+from mount_options import (
+    PROFILE_LABELS, PROFILES, MountOptionError, format_options, format_overrides, parse_overrides, resolve
+)
 from share_manager import Share, ShareManager
 
 
@@ -17,15 +19,23 @@ class ShareDialog(Adw.Dialog):
         self.share = share
         self.is_edit = share is not None
         self.stack = None
+        self._jobs = []
+        self._server_expanders = {}
+        self._scan_all_active = False
+        self._auth_failed = []
+        self._status_rows = []
 
         self.set_title("Edit Share" if self.is_edit else "Add Share")
         self.set_content_width(480)
         self.set_content_height(680)
 
         self._build_ui()
+        self.connect("closed", self._on_closed)
 
         if self.is_edit:
             self._populate_fields()
+            if self.share.automounted:
+                self._lock_automount_fields()
         elif self.stack:
             self._start_discovery()
 
@@ -88,6 +98,7 @@ class ShareDialog(Adw.Dialog):
         server_group = Adw.PreferencesGroup()
         server_group.set_title("Server Connection")
         server_group.set_description("Enter the server hostname/IP and share name separately")
+        self.server_group = server_group
 
         self.server_entry = Adw.EntryRow()
         self.server_entry.set_title("Server Address")
@@ -117,6 +128,7 @@ class ShareDialog(Adw.Dialog):
 
         mount_group = Adw.PreferencesGroup()
         mount_group.set_title("Mount Point")
+        self.mount_group = mount_group
 
         self.mount_entry = Adw.EntryRow()
         self.mount_entry.set_title("Local Path")
@@ -133,6 +145,26 @@ class ShareDialog(Adw.Dialog):
         mount_group.add(self.mount_entry)
         content.append(mount_group)
 
+        performance_group = Adw.PreferencesGroup()
+        performance_group.set_title("Performance")
+        performance_group.set_description("Used for both one-time mounts and automount")
+
+        self.profile_row = Adw.ComboRow()
+        self.profile_row.set_title("Profile")
+        self.profile_row.set_model(Gtk.StringList.new([PROFILE_LABELS[name] for name in PROFILES]))
+        self.profile_row.connect("notify::selected", lambda *_: self._update_profile_subtitle())
+        performance_group.add(self.profile_row)
+
+        self.options_entry = Adw.EntryRow()
+        self.options_entry.set_title("Extra Options")
+        self.options_entry.set_tooltip_text(
+            "Overrides on top of the profile, e.g. rsize=4M,multichannel,max_channels=4 or no-nosharesock"
+        )
+        performance_group.add(self.options_entry)
+
+        content.append(performance_group)
+        self._update_profile_subtitle()
+
         test_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
         test_box.set_halign(Gtk.Align.CENTER)
         test_box.set_margin_top(12)
@@ -185,11 +217,32 @@ class ShareDialog(Adw.Dialog):
         manual_group.add(self.browse_server_entry)
         self.browse_content.append(manual_group)
 
+        self._build_bulk_auth_group()
+
         # Network servers group
         self.servers_group = Adw.PreferencesGroup()
         self.servers_group.set_title("Network Servers")
         self.browse_content.append(self.servers_group)
 
+        self.scan_all_btn = Gtk.Button(label="Scan All")
+        self.scan_all_btn.set_tooltip_text("List shares on every server at once")
+        self.scan_all_btn.set_valign(Gtk.Align.CENTER)
+        self.scan_all_btn.add_css_class("flat")
+        self.scan_all_btn.set_sensitive(False)
+        self.scan_all_btn.connect("clicked", self._on_scan_all)
+
+        refresh_btn = Gtk.Button()
+        refresh_btn.set_icon_name("view-refresh-symbolic")
+        refresh_btn.set_tooltip_text("Forget cached share lists and rediscover")
+        refresh_btn.set_valign(Gtk.Align.CENTER)
+        refresh_btn.add_css_class("flat")
+        refresh_btn.connect("clicked", self._on_refresh_browse)
+
+        header_suffix = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+        header_suffix.append(refresh_btn)
+        header_suffix.append(self.scan_all_btn)
+        self.servers_group.set_header_suffix(header_suffix)
+
         # Discovery status row (spinner + label)
         self.discovery_status_row = Adw.ActionRow()
         self.discovery_status_row.set_title("Discovering servers...")
@@ -205,6 +258,43 @@ class ShareDialog(Adw.Dialog):
 
         return scrolled
 
+    def _build_bulk_auth_group(self):
+        # Shown after "Scan All" when some servers refused anonymous access,
+        # so one set of credentials can be tried against all of them
+        self.bulk_auth_group = Adw.PreferencesGroup()
+        self.bulk_auth_group.set_title("Authentication Required")
+        self.bulk_auth_group.set_visible(False)
+
+        self.bulk_auth_user = Adw.EntryRow()
+        self.bulk_auth_user.set_title("Username")
+        self.bulk_auth_group.add(self.bulk_auth_user)
+
+        self.bulk_auth_pass = Adw.PasswordEntryRow()
+        self.bulk_auth_pass.set_title("Password")
+        self.bulk_auth_group.add(self.bulk_auth_pass)
+
+        self.bulk_auth_connect = Adw.ActionRow()
+        self.bulk_auth_connect.set_title("Connect All")
+        self.bulk_auth_connect.set_activatable(True)
+        connect_icon = Gtk.Image.new_from_icon_name("network-server-symbolic")
+        connect_icon.set_valign(Gtk.Align.CENTER)
+        self.bulk_auth_connect.add_suffix(connect_icon)
+        self.bulk_auth_connect.connect("activated", self._on_bulk_auth_connect)
+        self.bulk_auth_group.add(self.bulk_auth_connect)
+
+        self.browse_content.append(self.bulk_auth_group)
+
+    def _submit(self, fn, *args, **kwargs):
+        job = self.parent_window.scheduler.submit(fn, *args, **kwargs)
+        self._jobs = [j for j in self._jobs if not j.finished] + [job]
+        return job
+
+    def _on_closed(self, dialog):
+        # Kill any smbclient/avahi-browse still working for this dialog
+        for job in self._jobs:
+            self.parent_window.scheduler.cancel(job)
+        self._jobs = []
+
     def _on_stack_page_changed(self, stack, pspec):
         is_manual = stack.get_visible_child_name() == "manual"
         self.save_btn.set_visible(is_manual)
@@ -218,32 +308,70 @@ class ShareDialog(Adw.Dialog):
     def _start_discovery(self):
         self.discovery_spinner.start()
 
-        def do_discover():
-            success, result = self.share_manager.discover_servers()
-            GLib.idle_add(self._on_discovery_complete, success, result)
+        def on_server(event, info):
+            GLib.idle_add(self._on_server_discovered, event, info)
 
-        thread = threading.Thread(target=do_discover)
-        thread.daemon = True
-        thread.start()
+        self._submit(
+            self.share_manager.discover_servers, on_server,
+            key=("discover",),
+            priority=Priority.BACKGROUND,
+            callback=lambda result: self._on_discovery_complete(*result)
+        )
+
+    def _on_server_discovered(self, event, info):
+        if event == "updated":
+            expander = self._server_expanders.pop(info["previous_address"], None)
+            if expander and not expander._loaded:
+                # Prefer the IPv4 address once it resolves
+                expander._server_address = info["address"]
+                expander.set_title(f"{info['name']} ({info['address']})")
+                self._server_expanders[info["address"]] = expander
+                return False
+            if expander:
+                self._server_expanders[info["previous_address"]] = expander
+                return False
+
+        if info["address"] not in self._server_expanders:
+            self._add_server_expander(info["address"], info["name"])
+        return False
 
     def _on_discovery_complete(self, success, result):
         self.discovery_spinner.stop()
         self.servers_group.remove(self.discovery_status_row)
 
-        if success:
-            for server_info in result:
-                self._add_server_expander(server_info["address"], server_info["name"])
-        else:
+        if not success:
             status_row = Adw.ActionRow()
             status_row.set_title(result)
             status_row.add_css_class("dim-label")
             self.servers_group.add(status_row)
+            self._status_rows.append(status_row)
 
         return False
 
+    def _on_refresh_browse(self, button):
+        if self.discovery_status_row.get_parent():
+            return  # Discovery still running
+
+        self.share_manager.invalidate_scan_cache()
+        for job in self._jobs:
+            self.parent_window.scheduler.cancel(job)
+        self._jobs = []
+
+        for row in list(self._server_expanders.values()) + self._status_rows:
+            self.servers_group.remove(row)
+        self._status_rows = []
+        self._server_expanders = {}
+        self._auth_failed = []
+        self._scan_all_active = False
+        self._update_bulk_auth_group()
+        self.scan_all_btn.set_sensitive(False)
+
+        self.servers_group.add(self.discovery_status_row)
+        self._start_discovery()
+
     def _on_browse_manual_server(self, button):
         address = self.browse_server_entry.get_text().strip()
-        if not address:
+        if not address or address in self._server_expanders:
             return
         self._add_server_expander(address, address)
         self.browse_server_entry.set_text("")
@@ -263,12 +391,26 @@ class ShareDialog(Adw.Dialog):
 
         expander.connect("notify::expanded", self._on_server_expanded)
         self.servers_group.add(expander)
+        self._server_expanders[address] = expander
+        self.scan_all_btn.set_sensitive(not self._scan_all_active)
+
+        if self._scan_all_active:
+            self._scan_expander(expander, bulk=True)
 
     def _on_server_expanded(self, expander, pspec):
         if not expander.get_expanded() or expander._loaded:
             return
-        expander._loaded = True
+        self._scan_expander(expander)
 
+    def _on_scan_all(self, button):
+        self._scan_all_active = True
+        self.scan_all_btn.set_sensitive(False)
+        for expander in self._server_expanders.values():
+            if not expander._loaded:
+                self._scan_expander(expander, bulk=True)
+
+    def _scan_expander(self, expander, bulk=False, username=None, password=None):
+        expander._loaded = True
         address = expander._server_address
 
         # Add spinner row
@@ -280,26 +422,30 @@ class ShareDialog(Adw.Dialog):
         spinner_row.add_prefix(spinner)
         expander.add_row(spinner_row)
 
-        # Check for existing credentials from saved shares
-        username, password = "", ""
-        for s in self.share_manager.shares:
-            if s.server == address:
-                username, password = s.username, s.password
-                break
-
-        def do_scan():
-            success, result = self.share_manager.scan_shares(address, username, password)
-            GLib.idle_add(self._on_scan_complete, expander, spinner_row, success, result, username, password)
-
-        thread = threading.Thread(target=do_scan)
-        thread.daemon = True
-        thread.start()
+        if username is None:
+            # Check for existing credentials from saved shares
+            username, password = self.share_manager.find_credentials(address)
+
+        self._submit(
+            self.share_manager.scan_shares, address, username, password,
+            key=("scan", address, username),
+            host=address,
+            callback=lambda result: self._on_scan_complete(
+                expander, spinner_row, *result, username, password, bulk
+            )
+        )
 
-    def _on_scan_complete(self, expander, spinner_row, success, result, username, password):
+    def _on_scan_complete(self, expander, spinner_row, success, result, username, password, bulk=False):
         expander.remove(spinner_row)
 
         if success:
             self._show_shares_in_expander(expander, result, username, password)
+        elif result == "auth_error" and bulk:
+            expander.set_subtitle("Authentication required")
+            expander._loaded = False
+            if expander not in self._auth_failed:
+                self._auth_failed.append(expander)
+            self._update_bulk_auth_group()
         elif result == "auth_error":
             self._show_auth_form(expander)
         else:
@@ -310,9 +456,28 @@ class ShareDialog(Adw.Dialog):
 
         return False
 
+    def _update_bulk_auth_group(self):
+        count = len(self._auth_failed)
+        self.bulk_auth_group.set_visible(count > 0)
+        self.bulk_auth_group.set_description(
+            f"{count} server{'s' if count != 1 else ''} refused anonymous access"
+        )
+
+    def _on_bulk_auth_connect(self, row):
+        user = self.bulk_auth_user.get_text().strip()
+        pwd = self.bulk_auth_pass.get_text()
+        expanders, self._auth_failed = self._auth_failed, []
+        self._update_bulk_auth_group()
+        for expander in expanders:
+            self._scan_expander(expander, bulk=True, username=user, password=pwd)
+
     def _show_shares_in_expander(self, expander, shares, username, password):
         address = expander._server_address
 
+        if expander in self._auth_failed:
+            self._auth_failed.remove(expander)
+            self._update_bulk_auth_group()
+
         # Remove any existing credential widgets
         if expander._cred_widgets:
             for w in expander._cred_widgets:
@@ -376,13 +541,12 @@ class ShareDialog(Adw.Dialog):
             expander.add_row(spinner_row)
             expander._cred_widgets.append(spinner_row)
 
-            def do_scan():
-                success, result = self.share_manager.scan_shares(address, user, pwd)
-                GLib.idle_add(on_connect_complete, success, result, user, pwd, spinner_row)
-
-            thread = threading.Thread(target=do_scan)
-            thread.daemon = True
-            thread.start()
+            self._submit(
+                self.share_manager.scan_shares, address, user, pwd,
+                key=("scan", address, user),
+                host=address,
+                callback=lambda result: on_connect_complete(*result, user, pwd, spinner_row)
+            )
 
         def on_connect_complete(success, result, user, pwd, spinner_row):
             expander.remove(spinner_row)
@@ -423,6 +587,24 @@ class ShareDialog(Adw.Dialog):
         self.username_entry.set_text(self.share.username)
         self.password_entry.set_text(self.share.password)
         self.mount_entry.set_text(self.share.mount_point)
+        if self.share.profile in PROFILES:
+            self.profile_row.set_selected(list(PROFILES).index(self.share.profile))
+        self.options_entry.set_text(format_overrides(self.share.mount_options))
+
+    def _lock_automount_fields(self):
+        # The fstab entry of an automounted share is keyed by its source and
+        # mount point; credentials and performance options can still change
+        # and are written to fstab again on save
+        for group in (self.server_group, self.mount_group):
+            group.set_sensitive(False)
+        self.mount_group.set_description("Disable automount to change the server, share or mount point")
+
+    def _selected_profile(self) -> str:
+        return list(PROFILES)[self.profile_row.get_selected()]
+
+    def _update_profile_subtitle(self):
+        options = format_options(PROFILES[self._selected_profile()])
+        self.profile_row.set_subtitle(options or "Kernel defaults")
 
     def _on_browse_folder(self, button):
         dialog = Gtk.FileDialog()
@@ -455,6 +637,7 @@ class ShareDialog(Adw.Dialog):
 
         server = self._sanitize_server(self.server_entry.get_text().strip())
         share_name = self._sanitize_share_name(self.share_entry.get_text().strip())
+        smb_dialect = self.share.smb_dialect if self.is_edit and server == self.share.server else ""
 
         return Share(
             id=share_id,
@@ -463,7 +646,10 @@ class ShareDialog(Adw.Dialog):
             username=self.username_entry.get_text().strip(),
             password=self.password_entry.get_text(),
             mount_point=self.mount_entry.get_text().strip(),
-            automounted=automounted
+            automounted=automounted,
+            smb_dialect=smb_dialect,
+            profile=self._selected_profile(),
+            mount_options=parse_overrides(self.options_entry.get_text())
         )
 
     def _sanitize_server(self, server: str) -> str:
@@ -490,28 +676,16 @@ class ShareDialog(Adw.Dialog):
             return False, "Mount point is required"
         if not self.mount_entry.get_text().strip().startswith('/'):
             return False, "Mount point must be an absolute path"
+        try:
+            resolve(self._selected_profile(), parse_overrides(self.options_entry.get_text()))
+        except MountOptionError as e:
+            return False, f"Invalid mount options: {e}"
         return True, ""
 
     def _check_mount_conflicts(self) -> tuple[str, str]:
         mount_point = self.mount_entry.get_text().strip().rstrip('/')
         current_id = self.share.id if self.is_edit else None
-
-        for share in self.share_manager.shares:
-            if share.id == current_id:
-                continue
-
-            existing_mount = share.mount_point.rstrip('/')
-            if existing_mount == mount_point:
-                is_mounted = self.share_manager.is_mounted(share)
-
-                if is_mounted:
-                    return 'error', f"Mount point already in use and currently mounted ({share.unc_path})"
-                elif share.automounted:
-                    return 'error', f"Mount point has automount enabled ({share.unc_path})"
-                else:
-                    return 'warning', f"Another share uses this mount point ({share.unc_path})"
-
-        return 'ok', ""
+        return self.share_manager.check_mount_conflict(mount_point, current_id)
 
     def _set_status(self, message: str, is_error: bool = False, is_warning: bool = False):
         self.status_label.set_text(message)
@@ -539,13 +713,12 @@ class ShareDialog(Adw.Dialog):
 
         share = self._get_share_from_fields()
 
-        def do_test():
-            success, message = self.share_manager.test_share(share)
-            GLib.idle_add(self._on_test_complete, success, message)
-
-        thread = threading.Thread(target=do_test)
-        thread.daemon = True
-        thread.start()
+        self._submit(
+            self.share_manager.test_share, share,
+            key=("test", share.unc_path, share.username),
+            host=share.server,
+            callback=lambda result: self._on_test_complete(*result)
+        )
 
     def _on_test_complete(self, success: bool, message: str):
         self.test_btn.set_sensitive(True)
@@ -572,13 +745,12 @@ class ShareDialog(Adw.Dialog):
         self.test_spinner.start()
         self.status_label.set_text("Testing connection before saving...")
 
-        def do_test_and_save():
-            success, message = self.share_manager.test_share(share)
-            GLib.idle_add(self._on_save_test_complete, success, message, share)
-
-        thread = threading.Thread(target=do_test_and_save)
-        thread.daemon = True
-        thread.start()
+        self._submit(
+            self.share_manager.test_share, share,
+            key=("save-test", share.id),
+            host=share.server,
+            callback=lambda result: self._on_save_test_complete(*result, share)
+        )
 
     def _on_save_test_complete(self, success: bool, message: str, share: Share):
         self.save_btn.set_sensitive(True)
@@ -589,7 +761,18 @@ class ShareDialog(Adw.Dialog):
             return False
 
         if self.is_edit:
+            fstab_changed = (
+                (share.profile, share.mount_options, share.username, share.password)
+                != (self.share.profile, self.share.mount_options, self.share.username, self.share.password)
+            )
             self.share_manager.update_share(share)
+            if share.automounted and fstab_changed:
+                # The fstab entry carries the options and credentials file too
+                self.parent_window.scheduler.submit(
+                    self.share_manager.set_automount, [share], True,
+                    key=("automount", share.id),
+                    callback=lambda result: self.parent_window.show_toast(result[1])
+                )
         else:
             self.share_manager.add_share(share)
 
@@ -0,0 +1,217 @@
+import dataclasses
+from typing import Optional
+
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, Gio, GObject
+
+from health_monitor import MountHealth
+from mount_table import MountTable, normalize_mount_point
+from share_manager import Share, ShareManager, ShareStatus
+
+
+class ShareItem(GObject.Object):
+    # List model item for one share. Rows are recycled, so anything a row
+    # needs to render (including whether an action is in flight) lives here.
+    __gtype_name__ = "MountyShareItem"
+
+    def __init__(self, share: Share, status: Optional[ShareStatus] = None, mount_entry=None,
+                 armed: bool = False):
+        super().__init__()
+        self.share = share
+        # None until the first mount table snapshot has been applied
+        self.status = status
+        self.mount_entry = mount_entry
+        # A systemd automount point is set up at the mount point
+        self.armed = armed
+        self.loading = False
+        # Reported by the HealthMonitor while the share is mounted
+        self.health = MountHealth.UNKNOWN
+        # Actions mutate the live Share in place, so diffs compare against
+        # a copy of what was last rendered
+        self._rendered = dataclasses.replace(share)
+
+    def update(self, share: Share, status: Optional[ShareStatus], mount_entry, armed: bool = False) -> bool:
+        changed = (
+            (share, status, mount_entry, armed)
+            != (self._rendered, self.status, self.mount_entry, self.armed)
+        )
+        self.share = share
+        self._rendered = dataclasses.replace(share)
+        self.status = status
+        self.mount_entry = mount_entry
+        self.armed = armed
+        return changed
+
+
+class ShareFilter:
+    ALL = "all"
+    MOUNTED = "mounted"
+    NOT_MOUNTED = "not-mounted"
+    AUTOMOUNT = "automount"
+
+
+class ShareSort:
+    SERVER = "server"
+    STATUS = "status"
+    AUTOMOUNT = "automount"
+
+
+_STATUS_ORDER = {
+    ShareStatus.MISMATCHED: 0,
+    ShareStatus.MOUNTED: 1,
+    ShareStatus.ERROR: 2,
+    ShareStatus.CONNECTED: 3,
+    ShareStatus.DISCONNECTED: 4,
+}
+
+
+class ShareList:
+    # Gio.ListStore of ShareItems with a filter and a sort model on top.
+    # sync() diffs by share id so only items that actually changed emit
+    # items-changed; the filter and sorter then re-check just those.
+    def __init__(self, share_manager: ShareManager):
+        self.share_manager = share_manager
+        self.store = Gio.ListStore(item_type=ShareItem)
+        self._items: dict[str, ShareItem] = {}
+        self._items_by_mount_point: dict[str, list[ShareItem]] = {}
+
+        self.search_text = ""
+        self.filter_mode = ShareFilter.ALL
+        self.sort_mode = ShareSort.SERVER
+
+        self.filter = Gtk.CustomFilter.new(self._match)
+        self.filter_model = Gtk.FilterListModel(model=self.store, filter=self.filter)
+        self.sorter = Gtk.CustomSorter.new(self._compare)
+        self.model = Gtk.SortListModel(model=self.filter_model, sorter=self.sorter)
+
+    def __len__(self) -> int:
+        return self.store.get_n_items()
+
+    def _status(self, share: Share, mount_table: MountTable):
+        status = self.share_manager.get_share_status(share, mount_table)
+        entry = None
+        if status == ShareStatus.MISMATCHED:
+            entry = self.share_manager.get_mount_entry(share, mount_table)
+        return status, entry, self.share_manager.is_automount_armed(share, mount_table)
+
+    def _emit_changed(self, item: ShareItem) -> None:
+        found, position = self.store.find(item)
+        if found:
+            self.store.items_changed(position, 1, 1)
+
+    def sync(self, shares: list[Share], mount_table: Optional[MountTable] = None) -> None:
+        # Without a mount table new items start as placeholders and
+        # existing ones keep their last known status
+        wanted = {share.id for share in shares}
+        for position in reversed(range(self.store.get_n_items())):
+            item = self.store.get_item(position)
+            if item.share.id not in wanted:
+                self.store.remove(position)
+                del self._items[item.share.id]
+
+        new_items = []
+        for share in shares:
+            item = self._items.get(share.id)
+            if mount_table is not None:
+                status, entry, armed = self._status(share, mount_table)
+            elif item is not None:
+                status, entry, armed = item.status, item.mount_entry, item.armed
+            else:
+                status, entry, armed = None, None, False
+            if item is None:
+                item = ShareItem(share, status, entry, armed)
+                self._items[share.id] = item
+                new_items.append(item)
+            elif item.update(share, status, entry, armed):
+                self._emit_changed(item)
+        if new_items:
+            self.store.splice(self.store.get_n_items(), 0, new_items)
+
+        self._items_by_mount_point = {}
+        for item in self._items.values():
+            key = normalize_mount_point(item.share.mount_point)
+            self._items_by_mount_point.setdefault(key, []).append(item)
+
+    def update_status(self, mount_points, mount_table: MountTable) -> None:
+        for mount_point in mount_points:
+            for item in self._items_by_mount_point.get(mount_point, []):
+                status, entry, armed = self._status(item.share, mount_table)
+                if item.update(item.share, status, entry, armed):
+                    self._emit_changed(item)
+
+    def update_all_status(self, mount_table: MountTable) -> None:
+        self.update_status(list(self._items_by_mount_point), mount_table)
+    
+    def set_health(self, share_id: str, health: MountHealth) -> None:
+        item = self._items.get(share_id)
+        if item is not None and item.health != health:
+            item.health = health
+            self._emit_changed(item)
+    
+    def refresh_item(self, item: ShareItem) -> None:
+        # Re-renders the item wherever it is currently shown
+        if self._items.get(item.share.id) is item:
+            self._emit_changed(item)
+
+    def set_search(self, text: str) -> None:
+        old, self.search_text = self.search_text, text.strip().casefold()
+        if self.search_text == old:
+            return
+        if old in self.search_text:
+            change = Gtk.FilterChange.MORE_STRICT
+        elif self.search_text in old:
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self.filter.changed(change)
+
+    def set_filter_mode(self, mode: str) -> None:
+        if mode == self.filter_mode:
+            return
+        if self.filter_mode == ShareFilter.ALL:
+            change = Gtk.FilterChange.MORE_STRICT
+        elif mode == ShareFilter.ALL:
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self.filter_mode = mode
+        self.filter.changed(change)
+
+    def set_sort_mode(self, mode: str) -> None:
+        if mode != self.sort_mode:
+            self.sort_mode = mode
+            self.sorter.changed(Gtk.SorterChange.DIFFERENT)
+
+    def _match(self, item: ShareItem, *_args) -> bool:
+        share = item.share
+        if self.filter_mode == ShareFilter.MOUNTED and item.status not in (ShareStatus.MOUNTED, ShareStatus.MISMATCHED):
+            return False
+        if self.filter_mode == ShareFilter.NOT_MOUNTED and item.status in (ShareStatus.MOUNTED, ShareStatus.MISMATCHED):
+            return False
+        if self.filter_mode == ShareFilter.AUTOMOUNT and not share.automounted:
+            return False
+        if not self.search_text:
+            return True
+        return (
+            self.search_text in share.unc_path.casefold()
+            or self.search_text in share.mount_point.casefold()
+            or self.search_text in share.username.casefold()
+        )
+
+    def _sort_key(self, item: ShareItem) -> tuple:
+        share = item.share
+        name = (share.server.lower(), share.share_name.lower(), share.mount_point)
+        if self.sort_mode == ShareSort.STATUS:
+            return (_STATUS_ORDER.get(item.status, len(_STATUS_ORDER)),) + name
+        if self.sort_mode == ShareSort.AUTOMOUNT:
+            return (not share.automounted,) + name
+        return name
+
+    def _compare(self, a: ShareItem, b: ShareItem, *_args) -> int:
+        key_a, key_b = self._sort_key(a), self._sort_key(b)
+        if key_a < key_b:
+            return Gtk.Ordering.SMALLER
+        if key_a > key_b:
+            return Gtk.Ordering.LARGER
+        return Gtk.Ordering.EQUAL
@@ -1,18 +1,23 @@
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib, Pango
+from gi.repository import Gtk, Adw, Pango
 
-from share_manager import Share, ShareManager
+from health_monitor import MountHealth
+from share_manager import ShareManager, ShareStatus
+from ui.share_list import ShareItem
 
 
 class ShareRow(Gtk.Box):
-    def __init__(self, share: Share, share_manager: ShareManager, main_window):
+    # Recycled by the ListView: built once, then bound to whichever
+    # ShareItem scrolls into view
+    def __init__(self, share_manager: ShareManager, main_window):
         super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=8)
         
-        self.share = share
+        self.item = None
         self.share_manager = share_manager
         self.main_window = main_window
+        self._binding = False
         
         self.add_css_class("card")
         self.set_margin_start(12)
@@ -21,7 +26,37 @@ class ShareRow(Gtk.Box):
         self.set_margin_bottom(6)
         
         self._build_ui()
-        self._update_status()
+    
+    @property
+    def share(self):
+        return self.item.share
+    
+    def bind(self, item: ShareItem):
+        self.item = item
+        share = item.share
+        
+        self._binding = True
+        self.select_check.set_active(self.main_window.is_share_selected(share))
+        self._binding = False
+        
+        self.share_label.set_label(share.unc_path)
+        self.mount_label.set_label(share.mount_point)
+        self.automount_badge.set_visible(share.automounted)
+        
+        self.automount_btn.remove_css_class("flat")
+        self.automount_btn.remove_css_class("suggested-action")
+        if share.automounted:
+            self.automount_btn.set_label("Remove Automount")
+            self.automount_btn.add_css_class("flat")
+        else:
+            self.automount_btn.set_label("Enable Automount")
+            self.automount_btn.add_css_class("suggested-action")
+        
+        self.update_status()
+        self._set_loading(item.loading)
+    
+    def unbind(self):
+        self.item = None
     
     def _build_ui(self):
         self.overlay = Gtk.Overlay()
@@ -36,22 +71,27 @@ class ShareRow(Gtk.Box):
 
         top_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
         
-        share_label = Gtk.Label(label=self.share.unc_path)
-        share_label.set_xalign(0)
-        share_label.add_css_class("heading")
-        share_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
-        share_label.set_hexpand(True)
-        top_row.append(share_label)
+        self.select_check = Gtk.CheckButton()
+        self.select_check.set_tooltip_text("Select for bulk actions")
+        self.select_check.connect("toggled", self._on_select_toggled)
+        top_row.append(self.select_check)
+        
+        self.share_label = Gtk.Label()
+        self.share_label.set_xalign(0)
+        self.share_label.add_css_class("heading")
+        self.share_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+        self.share_label.set_hexpand(True)
+        top_row.append(self.share_label)
         
         arrow = Gtk.Label(label="→")
         arrow.add_css_class("dim-label")
         top_row.append(arrow)
         
-        mount_label = Gtk.Label(label=self.share.mount_point)
-        mount_label.set_xalign(1)
-        mount_label.add_css_class("caption")
-        mount_label.set_ellipsize(Pango.EllipsizeMode.START)
-        top_row.append(mount_label)
+        self.mount_label = Gtk.Label()
+        self.mount_label.set_xalign(1)
+        self.mount_label.add_css_class("caption")
+        self.mount_label.set_ellipsize(Pango.EllipsizeMode.START)
+        top_row.append(self.mount_label)
         
         self.content.append(top_row)
 
@@ -66,11 +106,10 @@ class ShareRow(Gtk.Box):
         self.status_label.set_hexpand(True)
         status_row.append(self.status_label)
 
-        if self.share.automounted:
-            badge = Gtk.Label(label="Automount")
-            badge.add_css_class("badge")
-            badge.add_css_class("success")
-            status_row.append(badge)
+        self.automount_badge = Gtk.Label(label="Automount")
+        self.automount_badge.add_css_class("badge")
+        self.automount_badge.add_css_class("success")
+        status_row.append(self.automount_badge)
         
         self.content.append(status_row)
 
@@ -85,7 +124,6 @@ class ShareRow(Gtk.Box):
         
         self.edit_btn = Gtk.Button(label="Edit")
         self.edit_btn.add_css_class("tinted-button")
-        self.edit_btn.set_sensitive(not self.share.automounted)
         self.edit_btn.connect("clicked", self._on_edit)
         button_row.append(self.edit_btn)
 
@@ -98,18 +136,18 @@ class ShareRow(Gtk.Box):
         self.mount_btn.add_css_class("tinted-button")
         self.mount_btn.connect("clicked", self._on_mount_toggle)
         button_row.append(self.mount_btn)
+
+        self.benchmark_btn = Gtk.Button(label="Benchmark")
+        self.benchmark_btn.add_css_class("tinted-button")
+        self.benchmark_btn.set_tooltip_text("Measure throughput and file operation speed")
+        self.benchmark_btn.connect("clicked", self._on_benchmark)
+        button_row.append(self.benchmark_btn)
         
         spacer = Gtk.Box()
         spacer.set_hexpand(True)
         button_row.append(spacer)
         
         self.automount_btn = Gtk.Button()
-        if self.share.automounted:
-            self.automount_btn.set_label("Remove Automount")
-            self.automount_btn.add_css_class("flat")
-        else:
-            self.automount_btn.set_label("Enable Automount")
-            self.automount_btn.add_css_class("suggested-action")
         self.automount_btn.connect("clicked", self._on_automount_toggle)
         button_row.append(self.automount_btn)
         
@@ -136,48 +174,110 @@ class ShareRow(Gtk.Box):
         
         self.overlay.add_overlay(self.loading_box)
     
-    def _update_status(self):
-        is_mounted = self.share_manager.is_mounted(self.share)
+    def update_status(self):
+        status = self.item.status
+        self.mount_btn.set_sensitive(self._can_toggle_mount())
+        self.benchmark_btn.set_visible(
+            status == ShareStatus.MOUNTED and self.item.health in (MountHealth.UNKNOWN, MountHealth.HEALTHY)
+        )
+        
+        if status is None:
+            self.status_icon.remove_css_class("success")
+            self.status_icon.remove_css_class("warning")
+            self.status_icon.set_from_icon_name("content-loading-symbolic")
+            self.status_label.set_text("Checking status…")
+            self.status_label.set_tooltip_text(None)
+            self.mount_btn.set_label("Mount")
+            return
         
-        if is_mounted:
+        self.status_icon.remove_css_class("success")
+        self.status_icon.remove_css_class("warning")
+        self.status_icon.remove_css_class("error")
+        self.status_label.set_tooltip_text(None)
+        
+        if status == ShareStatus.MOUNTED and self.item.health == MountHealth.STALE:
+            self.status_icon.set_from_icon_name("network-error-symbolic")
+            self.status_icon.add_css_class("warning")
+            self.status_label.set_text("Stale - the server dropped the connection")
+            self.status_label.set_tooltip_text("Reconnect to mount the share again")
+            self.mount_btn.set_label("Reconnect")
+        elif status == ShareStatus.MOUNTED and self.item.health == MountHealth.HUNG:
+            self.status_icon.set_from_icon_name("network-error-symbolic")
+            self.status_icon.add_css_class("error")
+            self.status_label.set_text("Not responding - file access will hang")
+            self.status_label.set_tooltip_text(
+                "Reconnect detaches the hung mount and mounts the share again"
+            )
+            self.mount_btn.set_label("Reconnect")
+        elif status == ShareStatus.MOUNTED:
             self.status_icon.set_from_icon_name("emblem-ok-symbolic")
             self.status_icon.add_css_class("success")
-            self.status_label.set_text("Mounted")
+            if self.item.armed:
+                self.status_label.set_text("Mounted on demand")
+                self.status_label.set_tooltip_text("systemd unmounts the share again once it is idle")
+            else:
+                self.status_label.set_text("Mounted")
             self.mount_btn.set_label("Unmount")
+        elif status == ShareStatus.MISMATCHED:
+            entry = self.item.mount_entry
+            self.status_icon.set_from_icon_name("dialog-warning-symbolic")
+            self.status_icon.add_css_class("warning")
+            self.status_label.set_text(f"Mount point in use by {entry.source}")
+            self.status_label.set_tooltip_text(
+                f"Expected {self.share.unc_path} ({entry.fs_type}) at {entry.mount_point}. "
+                "Mounty leaves mounts it did not make alone; unmount it yourself to use this share."
+            )
+            self.mount_btn.set_label("Mount")
+        elif self.item.armed:
+            self.status_icon.set_from_icon_name("alarm-symbolic")
+            self.status_label.set_text("Automount armed - mounts on first access")
+            self.status_label.set_tooltip_text(f"Opening {self.share.mount_point} mounts the share")
+            self.mount_btn.set_label("Mount")
         else:
             self.status_icon.set_from_icon_name("window-close-symbolic")
-            self.status_icon.remove_css_class("success")
             self.status_label.set_text("Not mounted")
             self.mount_btn.set_label("Mount")
     
+    def _on_select_toggled(self, check):
+        if self._binding or self.item is None:
+            return
+        self.main_window.set_share_selected(self.share, check.get_active())
+    
     def _show_message(self, message: str, is_error: bool = False):
         self.main_window.show_toast(message)
     
     def _set_loading(self, loading: bool):
+        self.item.loading = loading
         self.loading_box.set_visible(loading)
         self.spinner.set_spinning(loading)
         
         self.test_btn.set_sensitive(not loading)
-        self.edit_btn.set_sensitive(not loading and not self.share.automounted)
+        self.edit_btn.set_sensitive(not loading)
         self.duplicate_btn.set_sensitive(not loading)
-        self.mount_btn.set_sensitive(not loading)
+        self.mount_btn.set_sensitive(self._can_toggle_mount())
+        self.benchmark_btn.set_sensitive(not loading)
         self.automount_btn.set_sensitive(not loading)
         self.remove_btn.set_sensitive(not loading)
     
+    def _finish(self, item: ShareItem):
+        # The row may have been recycled for another share by the time a
+        # job completes, so the result goes to the item rather than to self
+        item.loading = False
+        self.main_window.share_list.refresh_item(item)
+    
     def _on_test(self, button):
+        item = self.item
         self._set_loading(True)
         
-        def do_test():
-            success, message = self.share_manager.test_share(self.share)
-            GLib.idle_add(self._on_test_complete, success, message)
-        
-        import threading
-        thread = threading.Thread(target=do_test)
-        thread.daemon = True
-        thread.start()
+        self.main_window.scheduler.submit(
+            self.share_manager.test_share, item.share,
+            key=("test", item.share.id),
+            host=item.share.server,
+            callback=lambda result: self._on_test_complete(item, *result)
+        )
     
-    def _on_test_complete(self, success: bool, message: str):
-        self._set_loading(False)
+    def _on_test_complete(self, item: ShareItem, success: bool, message: str):
+        self._finish(item)
         self._show_message(message, is_error=not success)
         return False
     
@@ -195,45 +295,59 @@ class ShareRow(Gtk.Box):
         dialog.password_entry.set_text(self.share.password)
         dialog.present(self.main_window)
 
+    def _on_benchmark(self, button):
+        from ui.benchmark_dialog import BenchmarkDialog
+        dialog = BenchmarkDialog(self.main_window, self.share_manager, self.share)
+        dialog.present(self.main_window)
+
+    def _can_toggle_mount(self) -> bool:
+        # Like unmount_shares, never touches another filesystem sitting at
+        # the share's mount point
+        return not self.item.loading and self.item.status not in (None, ShareStatus.MISMATCHED)
+    
     def _on_mount_toggle(self, button):
+        item = self.item
+        if not self._can_toggle_mount():
+            return
         self._set_loading(True)
-        is_mounted = self.share_manager.is_mounted(self.share)
-        
-        def do_mount():
-            if is_mounted:
-                success, message = self.share_manager.unmount_share(self.share)
-            else:
-                success, message = self.share_manager.mount_share(self.share)
-            GLib.idle_add(self._on_mount_complete, success, message)
         
-        import threading
-        thread = threading.Thread(target=do_mount)
-        thread.daemon = True
-        thread.start()
+        if item.status == ShareStatus.MOUNTED and item.health in (MountHealth.STALE, MountHealth.HUNG):
+            action = self.share_manager.remount_share
+        elif item.status == ShareStatus.MOUNTED:
+            action = self.share_manager.unmount_share
+        else:
+            action = self.share_manager.mount_share
+        
+        self.main_window.scheduler.submit(
+            action, item.share,
+            key=("mount", item.share.id),
+            host=item.share.server,
+            callback=lambda result: self._on_mount_complete(item, *result)
+        )
     
-    def _on_mount_complete(self, success: bool, message: str):
-        self._set_loading(False)
-        self._update_status()
+    def _on_mount_complete(self, item: ShareItem, success: bool, message: str):
+        self._finish(item)
+        self.main_window.refresh_status([item.share.mount_point])
         self._show_message(message, is_error=not success)
         return False
     
     def _on_automount_toggle(self, button):
+        item = self.item
         self._set_loading(True)
         
-        def do_automount():
-            if self.share.automounted:
-                success, message = self.share_manager.remove_from_fstab(self.share)
-            else:
-                success, message = self.share_manager.add_to_fstab(self.share)
-            GLib.idle_add(self._on_automount_complete, success, message)
+        if item.share.automounted:
+            action = self.share_manager.remove_from_fstab
+        else:
+            action = self.share_manager.add_to_fstab
         
-        import threading
-        thread = threading.Thread(target=do_automount)
-        thread.daemon = True
-        thread.start()
+        self.main_window.scheduler.submit(
+            action, item.share,
+            key=("automount", item.share.id),
+            callback=lambda result: self._on_automount_complete(item, *result)
+        )
     
-    def _on_automount_complete(self, success: bool, message: str):
-        self._set_loading(False)
+    def _on_automount_complete(self, item: ShareItem, success: bool, message: str):
+        self._finish(item)
         
         if success:
             self.main_window.refresh_shares()
@@ -256,26 +370,24 @@ class ShareRow(Gtk.Box):
         dialog.add_response("remove", "Remove")
         dialog.set_response_appearance("remove", Adw.ResponseAppearance.DESTRUCTIVE)
         dialog.set_default_response("cancel")
-        dialog.connect("response", self._on_remove_response)
+        dialog.connect("response", self._on_remove_response, self.item)
         dialog.present(self.main_window)
     
-    def _on_remove_response(self, dialog, response):
+    def _on_remove_response(self, dialog, response, item: ShareItem):
         if response != "remove":
             return
         
-        self._set_loading(True)
-        
-        def do_remove():
-            success, message = self.share_manager.remove_share(self.share)
-            GLib.idle_add(self._on_remove_complete, success, message)
+        item.loading = True
+        self.main_window.share_list.refresh_item(item)
         
-        import threading
-        thread = threading.Thread(target=do_remove)
-        thread.daemon = True
-        thread.start()
+        self.main_window.scheduler.submit(
+            self.share_manager.remove_share, item.share,
+            key=("remove", item.share.id),
+            callback=lambda result: self._on_remove_complete(item, *result)
+        )
     
-    def _on_remove_complete(self, success: bool, message: str):
-        self._set_loading(False)
+    def _on_remove_complete(self, item: ShareItem, success: bool, message: str):
+        self._finish(item)
         
         if success:
             self.main_window.refresh_shares()